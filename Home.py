@@ -5,28 +5,42 @@ import os
 import uuid 
 import random
 import json
+import time
 
 from urllib.parse import quote
-from dotenv import load_dotenv
 from datetime import datetime 
-from pymongo import MongoClient
 
-load_dotenv()
+import counters
+import game_journal
+import player_ids
+import ratings
+import timing
+from database import derived_frame, enable_copy_on_write, ensure_indexes, get_db, load_frames, load_game, load_game_list
+from warmup import start_warmup
+from data_version import bump_version, collection_version, get_versions
+from simulator import build_model, matchup_counts, run_counts, simulate
+from team_builder import player_strength, split_teams
+from win_probability import TABLE_COLLECTION, current_table, live_probability, rebuild_in_background
+import write_queue
+from game_state import GameConflict, load_game_state, save_game_state
+
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
-# Load MongoDB URI from .env or environment variables
-load_dotenv()
-MONGO_URI = os.getenv('MONGO_URI')  
+timing.start_rerun("Home")
+enable_copy_on_write()
 
 # Connect to MongoDB Atlas
-client = MongoClient(MONGO_URI)
-db = client['blitzballstats'] 
+db = get_db()
+start_warmup()
+index_problems = ensure_indexes()
 
 
 # Page Title
 st.set_page_config(
     page_title ="Wiffle Ball Stats"
 )
+for problem in index_problems:
+    st.warning(problem)
 
 
 # MongoDB collections
@@ -37,27 +51,30 @@ atbats_col = db["atbats"]
 
 # Define expected columns
 expected_player_fields = [
-    "name", "team", "games_played", "at_bats", "hits", "singles", "doubles",
+    "player_id", "name", "team", "games_played", "at_bats", "hits", "singles", "doubles",
     "triples", "home_runs", "walks", "rbi", "strikeouts", "batting_average",
     "obp", "slugging", "innings_pitched", "era", "bb"
 ]
 
 expected_game_fields = [
     "game_id", "date", "team1", "team2", "team1_players", "team2_players",
-    "status", "team1_score", "team2_score", "ended_innings"
+    "team1_ids", "team2_ids", "player_ids",
+    "status", "team1_score", "team2_score", "ended_innings", "state"
 ]
 
 expected_atbat_fields = [
-    "game_id", "inning", "batter", "pitcher", "strikes", "balls",
+    "atbat_id", "game_id", "inning", "batter", "pitcher", "batter_id", "pitcher_id", "strikes", "balls",
     "runners_on", "outcome", "outs_recorded", "rbi"
 ]
 
-# Load from MongoDB
-players = pd.DataFrame(list(players_col.find()))
-games = pd.DataFrame(list(games_col.find()))
-atbats = pd.DataFrame(list(atbats_col.find()))
+# Load from MongoDB (cached until the data version changes). Games are only
+# listed here; each section loads the one game it works on.
+timing.phase("fetch")
+players = load_frames("players")
+games = load_game_list()
 
 # Ensure all expected columns exist in each DataFrame
+timing.phase("frame")
 for col in expected_player_fields:
     if col not in players.columns:
         players[col] = None
@@ -66,14 +83,53 @@ for col in expected_game_fields:
     if col not in games.columns:
         games[col] = None
 
-for col in expected_atbat_fields:
-    if col not in atbats.columns:
-        atbats[col] = None
 
 
+def load_scoped_game(game_id):
+    # The selected game's document and at-bats only, cached per game version
+    timing.phase("fetch")
+    game, game_atbats = load_game(game_id)
+    for col in expected_atbat_fields:
+        if col not in game_atbats.columns:
+            game_atbats[col] = None
+    timing.phase("render")
+    return game, game_atbats
+
+
+
+
+# Identical submissions this close together are treated as a double tap
+DOUBLE_TAP_SECONDS = 3
+
+# Simulated games behind each pregame projection, and their fixed seed
+PROJECTION_GAMES = 20000
+PROJECTION_SEED = 0
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def project_game(team1, team2, atbats_version):
+    # The league's at-bats are only read (as shared count tables) when a
+    # projection isn't cached for these rosters and this data version
+    matchups = derived_frame("matchup_counts", matchup_counts, ("atbats",))
+    runs = derived_frame("run_counts", run_counts, ("atbats",))
+    model = build_model(matchups, runs, list(team1), list(team2))
+    return simulate(model, PROJECTION_GAMES, seed=PROJECTION_SEED)
+
+
+# Write-behind queue: at-bats are saved locally first and uploaded in the background
+@st.cache_resource
+def get_write_behind():
+    queue = write_queue.WriteQueue()
+    worker = write_queue.FlushWorker(get_db(), queue)
+    worker.start()
+    return queue, worker
+
+
+atbat_queue, flush_worker = get_write_behind()
 
 
 # Title
+timing.phase("render")
 st.title("Wiffle Ball Stat Tracker")
 
 
@@ -85,15 +141,34 @@ with st.form("add_player_form"):
 
     if submitted:
         if new_name.strip() != "" and new_name not in players['name'].values:
-            new_player = {"name": new_name}
-            players_col.insert_one({ "name": new_name })
-            players = pd.DataFrame(list(players_col.find()))
+            player_ids.insert_player(db, new_name)
+            bump_version(db, "players")
+            players = load_frames("players")
             st.success(f"Player '{new_name}' added.")
         elif new_name in players['name'].values:
             st.warning("Player already exists.")
         else:
             st.error("Name cannot be empty.")
 
+# Renames follow the player's id through every game and at-bat
+if not players.empty:
+    with st.form("rename_player_form"):
+        rename_from = st.selectbox("Rename Player", players["name"].tolist())
+        rename_to = st.text_input("New Name", "")
+        renamed = st.form_submit_button("✏️ Rename Player")
+
+        if renamed:
+            rename_id = player_ids.player_index(players).get(rename_from)
+            if rename_id is None:
+                st.warning(f"'{rename_from}' has no player id yet. Run `python migrate.py`, then rename them.")
+            else:
+                try:
+                    player_ids.rename_player(db, rename_id, rename_to)
+                    players = load_frames("players")
+                    st.success(f"Renamed '{rename_from}' to '{rename_to.strip()}'.")
+                except ValueError as exc:
+                    st.error(str(exc))
+
 
 from urllib.parse import quote
 
@@ -132,13 +207,47 @@ with st.expander("📋 Current Players"):
 #----- Section: Start a New Game----- #
 st.header("Start Game:")
 with st.expander("Start a New Game", expanded = False):
+    # Balanced teams from the players at the field, filled into the team
+    # pickers below (strongest hitters first)
+    available = st.multiselect("Players Here Today", options=players["name"].tolist(), key="available_players")
+    keep_apart = st.multiselect(
+        "Keep Apart",
+        options=[(first, second) for i, first in enumerate(available) for second in available[i + 1:]],
+        format_func=lambda pair: f"{pair[0]} / {pair[1]}",
+        key="keep_apart"
+    )
+    balance_by = st.radio("Balance By", ["Ratings", "Career OPS/ERA"], horizontal=True, key="balance_by")
+    if st.button("⚖️ Balance Teams"):
+        if balance_by == "Ratings":
+            # Rating points over SCALE, so the gap reads on the same order as
+            # the OPS/ERA z-scores
+            by_player = {name: (rating - ratings.INITIAL_RATING) / ratings.SCALE
+                         for name, rating in ratings.current_ratings(players).items()}
+        else:
+            strengths = derived_frame("player_strength", player_strength, ("atbats",))
+            by_player = dict(zip(strengths["Player"], strengths["Strength"]))
+        try:
+            balanced1, balanced2, gap = split_teams({name: by_player.get(name, 0.0) for name in available}, apart=keep_apart)
+            st.session_state.team1, st.session_state.team2 = balanced1, balanced2
+            st.info(f"Strength gap between the teams: `{gap:+.2f}`")
+        except ValueError as exc:
+            st.error(str(exc))
+
     # Select teams from existing players
     team1 = st.multiselect("Select Team 1 Players", options=players["name"].tolist(), key="team1")
     team2 = st.multiselect("Select Team 2 Players", options=players["name"].tolist(), key="team2")
 
-    # Date and game ID
+    # Pregame projection for the rosters as picked (in batting order)
+    if team1 and team2 and not set(team1) & set(team2):
+        projection = project_game(tuple(team1), tuple(team2), collection_version(get_versions(db), "atbats"))
+        st.markdown(
+            f"**Projection**: Team 1 wins `{projection['team1_win']:.0%}` · Team 2 wins `{projection['team2_win']:.0%}` · "
+            f"Expected runs `{projection['team1_runs']:.1f}` – `{projection['team2_runs']:.1f}`"
+        )
+        st.caption(f"From {projection['games']:,} simulated games of these batting orders against each other")
+
+    # Date (the game ID is allocated atomically when the game starts)
     game_date = st.date_input("Game Date")
-    game_id = f"Game_{len(games) + 1}"
 
     # Start button
     if st.button("⚾ Start Game"):
@@ -148,16 +257,15 @@ with st.expander("Start a New Game", expanded = False):
             st.error("A player cannot be on both teams.")
         else:
             new_game = {
-                "game_id": game_id,
                 "date": str(game_date),
-                "team1": ", ".join(team1),
-                "team2": ", ".join(team2),
-                "team1_players": ",".join(team1),
-                "team2_players": ", ".join(team2),
-                "status": "active"
+                **player_ids.roster_fields(team1, team2, player_ids.player_index(players)),
+                "status": "active",
+                "ended_innings": [],
+                "rev": 0
             }
-            games_col.insert_one(new_game)
-            games = pd.DataFrame(list(games_col.find()))
+            game_id = counters.insert_game(db, new_game)
+            bump_version(db, "games", game_id=game_id)
+            games = load_game_list()
 
             st.success(f"✅ Game {game_id} started and saved!")
 
@@ -170,37 +278,34 @@ if active_games.empty:
 else:
     with st.expander("Record At-Bat", expanded=False):
         with st.form("atbat_form"):
-            current_game = st.selectbox("Select Game", active_games["game_id"])
-            current_game_row = active_games[active_games["game_id"] == current_game].iloc[0]
-            def parse_ended_innings(val):
-                if pd.isna(val) or val == "":
-                    return []
-                return val.split(";")
-
-            ended_innings = parse_ended_innings(current_game_row.get("ended_innings", ""))
-
-            current_game_atbats = atbats[atbats["game_id"] == current_game]
-            all_innings = [f"{half} {i}" for i in range(1, 7) for half in ["Top", "Bottom"]]
-            available_innings = [inn for inn in all_innings if inn not in ended_innings]
-            if not available_innings:
-                st.warning("All innings have been ended for this game.")
-                st.stop()
-            selected_inning = st.selectbox("Inning", available_innings)
-            half_inning, inning_number = selected_inning.split()
-            inning_number = int(inning_number)
-
-            # Extract team players
-            current_game_row = games[games["game_id"] == current_game].iloc[0]
-            team1_players = [p.strip() for p in str(current_game_row["team1"]).split(",") if p.strip()]
-            team2_players = [p.strip() for p in str(current_game_row["team2"]).split(",") if p.strip()]
+            current_game = st.selectbox("Select Game", active_games["game_id"], key="scoring_game")
+            current_game_row, current_game_atbats = load_scoped_game(current_game)
+
+            # Live game state: inning, outs and score come from the snapshot,
+            # plus any at-bats still waiting in the local upload queue
+            game_state = load_game_state(current_game_row, current_game_atbats)
+            recorded_ids = set(current_game_atbats["_id"]) if "_id" in current_game_atbats.columns else set()
+            pending_for_game = write_queue.pending_items(atbat_queue, current_game)
+            write_queue.apply_pending(game_state, pending_for_game, recorded_ids)
+            current_inning = game_state.inning_label
+            team1_players, team2_players = game_state.team1, game_state.team2
+            st.markdown(
+                f"**{current_inning}** · **Outs**: `{game_state.outs}` · "
+                f"**Score**: Team 1 `{game_state.team1_score}` – Team 2 `{game_state.team2_score}`"
+            )
 
             # Prefix names with team label
             team1_options = [f"Team 1 - {p}" for p in team1_players]
             team2_options = [f"Team 2 - {p}" for p in team2_players]
             all_options = team1_options + team2_options
 
-            # Select batter and pitcher
-            batter_label = st.selectbox("Select Batter", all_options)
+            # Select batter and pitcher, defaulting to the next batter due up
+            next_batter = game_state.next_batter()
+            batter_index = 0
+            if next_batter is not None:
+                team_label = "Team 1" if game_state.batting_team == "team1" else "Team 2"
+                batter_index = all_options.index(f"{team_label} - {next_batter}")
+            batter_label = st.selectbox("Select Batter", all_options, index=batter_index)
             pitcher_label = st.selectbox("Select Pitcher", all_options)
 
             # Extract actual names
@@ -246,19 +351,49 @@ else:
             st.markdown(f"**Outs recorded on this play**: `{outs_on_play}`")
             st.markdown(f"**RBIs recorded on this play**: `{rbis}`")
             # Add Checkbox to end this inning
-            end_inning = st.checkbox("End this half-inning after recording this at-bat")
+            end_inning = st.checkbox("End this half-inning after recording this at-bat (ends automatically at 3 outs)")
             submit_atbat = st.form_submit_button("Record At-Bat")
 
+            # Idempotency key for the at-bat this form records; it only rotates
+            # after a successful submit, so reruns reuse it
+            if "atbat_id" not in st.session_state:
+                st.session_state.atbat_id = uuid.uuid4().hex
+
+            # Where the game stood when this scorer last saw the form; a change
+            # made by anyone else since then is a conflict, not an at-bat
+            seen = st.session_state.get("scoring_seen", {})
+            position = (current_inning, game_state.atbats)
+
             if submit_atbat:
-                if batter == pitcher:
+                atbat = None
+                submission = (current_game, current_inning, batter, pitcher, strikes, balls, runners_on, outcome, rbis, end_inning)
+                last_submission = st.session_state.get("last_atbat_submission")
+                if (
+                    last_submission
+                    and last_submission["values"] == submission
+                    and time.time() - last_submission["at"] < DOUBLE_TAP_SECONDS
+                ):
+                    # A double tap resubmits the same form: keep the first write only
+                    st.info("This at-bat was already recorded.")
+                    submit_atbat = end_inning = False
+                elif seen.get("game") == current_game and seen.get("position") != position:
+                    st.warning(
+                        f"⚠️ Another scorer updated `{current_game}` while you were entering this play. "
+                        f"It is now **{current_inning}** with `{game_state.outs}` out(s) — check the batter and resubmit."
+                    )
+                    end_inning = False
+                elif batter == pitcher:
                     st.error("⚠️ Batter and pitcher cannot be the same player.")
                 else:
-                    outs_on_play = 1 if outcome in ["Ground Out", "Pop Out", "Line Out", "Strike Out", "Sacrifice Fly", "Fielder's Choice"] else 0
+                    ids = player_ids.player_index(players)
                     atbat = {
+                        "atbat_id": st.session_state.atbat_id,
                         "game_id": current_game,
-                        "inning": f"{half_inning} {inning_number}",
+                        "inning": current_inning,
                         "batter": batter,
                         "pitcher": pitcher,
+                        "batter_id": ids.get(batter),
+                        "pitcher_id": ids.get(pitcher),
                         "strikes": strikes,
                         "balls": balls,
                         "runners_on": runners_on,
@@ -266,39 +401,85 @@ else:
                         "outs_recorded": outs_on_play,
                         "rbi": rbis
                     }
-                    atbats_col.insert_one(atbat)
-                    atbats = pd.DataFrame(list(atbats_col.find()))
-                    st.success("✅ At-bat recorded!")
-                #End the inning and update games.csv
-                if end_inning:
-                    if selected_inning not in ended_innings:
-                        ended_innings.append(selected_inning)
-                        ended_str = ";".join(ended_innings)
-                        games_col.update_one({"game_id": current_game}, {"$set": {"ended_innings": ended_str}})
-                        games = pd.DataFrame(list(games_col.find()))
-                        st.success(f"✅ Inning '{selected_inning}' has been ended and locked. Refresh")
-
-
-
-    # ----- Undo Last At Bats/Games Button -----
-    with st.expander("Undo Last At-Bat"):
-        st.subheader("Undo Last At-Bat")
-
-        if not current_game_atbats.empty:
-            last_atbat = current_game_atbats.iloc[-1]
-            with st.form("undo_last_atbat_form"):
-                st.write(f"Last at-bat: `{last_atbat['batter']}` vs `{last_atbat['pitcher']}` | Outcome: `{last_atbat['outcome']}`")
-                confirm_last = st.checkbox("Confirm Undo Last At-Bat")
-                submitted = st.form_submit_button("Undo Last At-Bat")
-                if submitted and confirm_last:
-                    last_id = current_game_atbats.iloc[-1]["_id"]
-                    atbats_col.delete_one({"_id": last_id})
-                    atbats = pd.DataFrame(list(atbats_col.find()))
-                    st.success("✅ Last at-bat has been removed.")
-                elif submitted and not confirm_last:
-                    st.warning("Please confirm before undoing.")
-        else:
-            st.info("No at-bats recorded for this game yet.")
+                if atbat is not None or end_inning:
+                    # Committed to the local queue; the worker uploads it to MongoDB
+                    item = write_queue.new_item(
+                        current_game, current_inning, team1_players, team2_players,
+                        atbat=atbat, end_inning=end_inning
+                    )
+                    atbat_queue.enqueue(current_game, item)
+                    flush_worker.wake()
+                    write_queue.apply_pending(game_state, [item], recorded_ids)
+                    st.session_state.last_atbat_submission = {"values": submission, "at": time.time()}
+                    if atbat is not None:
+                        st.session_state.atbat_id = uuid.uuid4().hex
+                        st.success("✅ At-bat recorded!")
+                if game_state.inning_label != current_inning:
+                    st.success(f"✅ Inning '{current_inning}' has been ended and locked.")
+
+            # Win probability for where the game stands now, including this
+            # submission; runners carry over from the latest at-bat
+            latest = [item["atbat"] for item in pending_for_game if item["atbat"] is not None]
+            if submit_atbat and atbat is not None:
+                latest.append(atbat)
+            elif not latest and not current_game_atbats.empty:
+                latest.append(current_game_atbats.iloc[-1].to_dict())
+            team1_chance = live_probability(current_table(db), game_state, latest[-1] if latest else None)
+            st.markdown(f"**Win Probability**: Team 1 `{team1_chance:.0%}` · Team 2 `{1 - team1_chance:.0%}`")
+            st.session_state.scoring_seen = {
+                "game": current_game, "position": (game_state.inning_label, game_state.atbats)
+            }
+
+        # ----- Pending uploads -----
+        pending_count = atbat_queue.count()
+        if pending_count:
+            st.info(f"📡 {pending_count} write(s) waiting to upload.")
+            with st.expander("Pending Uploads"):
+                pending_rows = atbat_queue.peek(limit=100)
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Game": row["game_id"],
+                        "Inning": row["item"]["inning"],
+                        "Batter": (row["item"]["atbat"] or {}).get("batter", "—"),
+                        "Outcome": (row["item"]["atbat"] or {}).get("outcome", "End inning"),
+                        "Attempts": row["attempts"],
+                        "Last Error": row["last_error"],
+                    }
+                    for row in pending_rows
+                ]), hide_index=True, use_container_width=True)
+                if flush_worker.last_error:
+                    st.warning(f"Upload is retrying: {flush_worker.last_error}")
+                if st.button("Retry Upload Now"):
+                    flush_worker.wake()
+
+        # Writes that kept failing on their own were set aside so the rest
+        # could upload; the scorer decides what happens to them
+        dead_count = atbat_queue.dead_count()
+        if dead_count:
+            st.error(f"⚠️ {dead_count} write(s) failed to upload and were set aside.")
+            with st.expander("Failed Uploads"):
+                dead_rows = atbat_queue.dead_letters(limit=100)
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Game": row["game_id"],
+                        "Inning": row["item"]["inning"],
+                        "Batter": (row["item"]["atbat"] or {}).get("batter", "—"),
+                        "Outcome": (row["item"]["atbat"] or {}).get("outcome", "End inning"),
+                        "Attempts": row["attempts"],
+                        "Error": row["last_error"],
+                    }
+                    for row in dead_rows
+                ]), hide_index=True, use_container_width=True)
+                retry_col, discard_col = st.columns(2)
+                if retry_col.button("Retry Failed Uploads"):
+                    atbat_queue.requeue([row["id"] for row in dead_rows])
+                    flush_worker.wake()
+                    st.success(f"✅ {len(dead_rows)} write(s) queued for upload again.")
+                if discard_col.button("Discard Failed Uploads"):
+                    write_queue.discard(db, atbat_queue, dead_rows)
+                    st.success(f"✅ {len(dead_rows)} failed write(s) discarded.")
+
+
 
 # ---- End Current Game Button ---- #
 with st.expander("End Current Game"):
@@ -309,21 +490,135 @@ with st.expander("End Current Game"):
         st.info("No active games to end.")
     else:
         current_game = st.selectbox("Select Game to End", active_games["game_id"])
+        end_game_row, end_game_atbats = load_scoped_game(current_game)
+        end_game_state = load_game_state(end_game_row, end_game_atbats)
+        team1_score, team2_score = end_game_state.score()
+        st.markdown(f"**Final Score**: Team 1 `{team1_score}` – Team 2 `{team2_score}`")
         confirm_end = st.checkbox(f"Confirm end of `{current_game}`")
-        team1_score = st.number_input("Enter Team 1 Score", min_value=0, max_value=99, step=1)
-        team2_score = st.number_input("Enter Team 2 Score", min_value=0, max_value=99, step=1)
-
-        if confirm_end and st.button("End Game"):
-            games_col.update_one(
-                {"game_id": current_game},
-                {"$set": {
-                    "status": "completed",
-                    "team1_score": team1_score,
-                    "team2_score": team2_score
-                }}
+
+        # Wait for queued at-bats so the final score and journal order are right
+        end_game_pending = write_queue.pending_items(atbat_queue, current_game)
+        if end_game_pending:
+            st.warning(f"{len(end_game_pending)} write(s) for this game are still uploading.")
+
+        if confirm_end and st.button("End Game", disabled=bool(end_game_pending)):
+            game_journal.ensure_journal(
+                db, current_game, end_game_state.team1, end_game_state.team2,
+                end_game_atbats.to_dict("records"), end_game_state.ended_innings
             )
-            games = pd.DataFrame(list(games_col.find()))
-            st.success(f"✅  `{current_game}` has been marked as completed.")
+            # Only end the game at the position whose score was shown above
+            end_rev = end_game_row.get("rev")
+            try:
+                history = game_journal.record(
+                    db, current_game, end_game_state.team1, end_game_state.team2, game_journal.END_GAME,
+                    expected_seq=None if end_rev is None else end_rev + 1
+                )
+                save_game_state(db, history["state"], rev=history["head"])
+                final_state = history["state"]
+                rating_changes = ratings.record_game(
+                    db, current_game, end_game_row.get("date"), final_state.team1, final_state.team2,
+                    final_state.team1_score, final_state.team2_score
+                )
+                # Stored so live win probabilities never rebuild from the
+                # whole history on a scorer's rerun; built off this one too
+                rebuild_in_background(db)
+                games = load_game_list()
+                st.success(f"✅  `{current_game}` has been marked as completed.")
+                if rating_changes:
+                    team1_change = rating_changes[final_state.team1[0]] if final_state.team1 else 0
+                    st.info(f"Ratings updated: Team 1 `{team1_change:+.1f}` · Team 2 `{-team1_change:+.1f}` each")
+            except GameConflict:
+                st.warning("⚠️ Another scorer updated this game while you were ending it. Check the final score and try again.")
+
+
+# ----- Undo / Redo From the Game Journal -----
+with st.expander("Undo / Redo"):
+    st.subheader("Undo / Redo")
+
+    if games.empty:
+        st.info("No games recorded yet.")
+    else:
+        # Most recent games first so a just-ended game can still be reopened
+        journal_game = st.selectbox("Select Game", games["game_id"].iloc[::-1], key="journal_game")
+        journal_row, journal_atbats = load_scoped_game(journal_game)
+        journal_state = load_game_state(journal_row, journal_atbats)
+        journal_pending = write_queue.pending_items(atbat_queue, journal_game)
+        history = game_journal.load_history(db, journal_game, journal_state.team1, journal_state.team2)
+
+        # Journal position this scorer was shown; undo and corrections only
+        # apply if nobody else has appended since
+        journal_seen = st.session_state.get("journal_seen", {})
+        seen_head = journal_seen.get("head") if journal_seen.get("game") == journal_game else None
+        conflict_message = "⚠️ Another scorer updated this game since it was shown here. Review the latest event and try again."
+        last_event = game_journal.last_effective_event(db, journal_game, history)
+
+        if last_event is not None:
+            st.write(f"Last event: {game_journal.describe_event(last_event)}")
+        elif history["head"] == 0 and not journal_atbats.empty:
+            # Imported by migrate.py (or the game's next write), not on this read
+            st.info("This game was recorded before the journal existed. Run `python migrate.py` to enable undo for it.")
+        else:
+            st.info("No events recorded for this game yet.")
+        st.write(f"Undo depth available: `{len(history['stack'])}` · Redo available: `{len(history['redo'])}`")
+
+        steps = st.number_input("Number of events", min_value=1, max_value=max(1, len(history["stack"]), len(history["redo"])), value=1, step=1)
+        confirm_journal = st.checkbox("Confirm undo / redo")
+        undo_col, redo_col = st.columns(2)
+        undo_clicked = undo_col.button("↩️ Undo", disabled=not history["stack"] or bool(journal_pending))
+        redo_clicked = redo_col.button("↪️ Redo", disabled=not history["redo"] or bool(journal_pending))
+        if journal_pending:
+            st.warning(f"{len(journal_pending)} write(s) for this game are still uploading.")
+
+        if (undo_clicked or redo_clicked) and not confirm_journal:
+            st.warning("Please confirm before undoing or redoing.")
+        elif undo_clicked or redo_clicked:
+            operation = game_journal.undo if undo_clicked else game_journal.redo
+            try:
+                changed, history = operation(
+                    db, journal_game, journal_state.team1, journal_state.team2,
+                    steps=int(steps), expected_head=seen_head
+                )
+                save_game_state(db, history["state"], "atbats", rev=history["head"], rewind=True)
+                # Undoing the end of a game takes its rating changes back; redoing it rates it again
+                ratings.sync_game(db, journal_game, journal_row.get("date"), history["state"])
+                games = load_game_list()
+                verb = "Undid" if undo_clicked else "Redid"
+                for event in changed:
+                    st.success(f"✅ {verb}: {game_journal.describe_event(event)}")
+            except GameConflict:
+                history = game_journal.load_history(db, journal_game, journal_state.team1, journal_state.team2)
+                st.warning(conflict_message)
+
+        # Correct the most recent at-bat without undoing everything after it
+        if last_event is not None and last_event["type"] == game_journal.ATBAT:
+            current = game_journal.effective_atbat(db, journal_game, history, last_event)
+            with st.form("correct_atbat_form"):
+                st.write("Correct last at-bat:")
+                outcomes = [
+                    "Single", "Double", "Triple", "Home Run", "Ground Out", "Pop Out", "Line Out",
+                    "Strike Out", "Walk", "Fielder's Choice", "Sacrifice Fly", "Double Play", "Triple Play"
+                ]
+                new_outcome = st.selectbox(
+                    "Outcome", outcomes,
+                    index=outcomes.index(current["outcome"]) if current.get("outcome") in outcomes else 0
+                )
+                new_outs = st.selectbox("Outs Recorded", [0, 1, 2, 3], index=int(current.get("outs_recorded") or 0))
+                new_rbi = st.number_input("Runs Batted In (RBIs)", min_value=0, max_value=4, value=int(current.get("rbi") or 0))
+                if st.form_submit_button("Save Correction"):
+                    changes = {"outcome": new_outcome, "outs_recorded": new_outs, "rbi": int(new_rbi)}
+                    try:
+                        if seen_head is not None and seen_head != history["head"]:
+                            raise GameConflict(journal_game)
+                        history = game_journal.correct_atbat(
+                            db, journal_game, journal_state.team1, journal_state.team2, history, last_event, changes
+                        )
+                        save_game_state(db, history["state"], "atbats", rev=history["head"], rewind=True)
+                        games = load_game_list()
+                        st.success("✅ At-bat corrected.")
+                    except GameConflict:
+                        st.warning(conflict_message)
+
+        st.session_state.journal_seen = {"game": journal_game, "head": history["head"]}
 
 
 
@@ -342,13 +637,17 @@ with st.expander("Reset All Data"):
             # Perform the data reset
             players = pd.DataFrame(columns=players.columns)
             games = pd.DataFrame(columns=games.columns)
-            atbats = pd.DataFrame(columns=atbats.columns)
             players_col.delete_many({})
             games_col.delete_many({})
             atbats_col.delete_many({})
+            db[game_journal.EVENTS_COLLECTION].delete_many({})
+            db[game_journal.SNAPSHOTS_COLLECTION].delete_many({})
+            db[TABLE_COLLECTION].delete_many({})
+            db[ratings.HISTORY_COLLECTION].delete_many({})
+            counters.reset_counter(db, counters.GAME_COUNTER)
+            counters.reset_counter(db, player_ids.PLAYER_COUNTER)
+            atbat_queue.clear()
+            bump_version(db, "players", "games", "atbats", TABLE_COLLECTION, ratings.HISTORY_COLLECTION)
             st.success("✅ Data has been reset.")
 
-
-
-
-
+timing.end_rerun()
@@ -0,0 +1,185 @@
+# Columnar fetch path for large collections.
+#
+# pd.DataFrame(list(cursor)) decodes every document into a Python dict before
+# pandas reassembles the columns. This path reads raw BSON batches instead and
+# decodes only the fields named in an explicit schema straight into columns:
+# through pymongoarrow (Arrow tables) when it is installed, otherwise through a
+# small raw-BSON decoder here. Either way numeric columns come out as NumPy
+# arrays, and cursor batch size and projection are tunable.
+import importlib.util
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+
+FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "5000"))
+
+# Column types: "int", "float", "string", "objectid"
+ATBAT_SCHEMA = {
+    "_id": "objectid",
+    "atbat_id": "string",
+    "game_id": "string",
+    "inning": "string",
+    "batter": "string",
+    "pitcher": "string",
+    "batter_id": "int",
+    "pitcher_id": "int",
+    "strikes": "int",
+    "balls": "int",
+    "runners_on": "int",
+    "outcome": "string",
+    "outs_recorded": "int",
+    "rbi": "int",
+}
+
+_INT32 = struct.Struct("<i")
+_INT64 = struct.Struct("<q")
+_DOUBLE = struct.Struct("<d")
+
+
+# ---- pymongoarrow ----
+def _arrow_schema(schema):
+    import pyarrow as pa
+    from pymongoarrow.api import Schema
+    from pymongoarrow.types import ObjectIdType
+
+    types = {"int": pa.int64(), "float": pa.float64(), "string": pa.string(), "objectid": ObjectIdType()}
+    return Schema({name: types[kind] for name, kind in schema.items()})
+
+
+def decode_batches_arrow(batches, schema):
+    # pymongoarrow's C++ decoder, fed the same raw batches as the fallback,
+    # so it works with any source of BSON batches (including the local store)
+    import pyarrow as pa
+    from pymongoarrow.context import PyMongoArrowContext
+
+    arrow_schema = _arrow_schema(schema)
+    tables = []
+    for batch in batches:
+        context = PyMongoArrowContext(arrow_schema)
+        context.process_bson_stream(batch)
+        tables.append(context.finish())
+    if not tables:
+        return PyMongoArrowContext(arrow_schema).finish()
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def arrow_to_frame(table, schema):
+    frame = table.to_pandas()
+    if "_id" in frame.columns:
+        # Plain ObjectIds (not pymongoarrow's extension dtype) so the frame
+        # pickles into st.cache_data and compares like the dict path
+        frame["_id"] = frame["_id"].astype(object)
+    # Integer columns with gaps come back as float64, matching the dict path;
+    # columns no document has are left out the same way
+    return frame[[name for name in schema if table.column(name).null_count < len(frame) or not len(frame)]]
+
+
+def have_pymongoarrow():
+    # Checked without importing, so pyarrow only loads when it's used
+    return importlib.util.find_spec("pymongoarrow") is not None
+
+
+# ---- Raw BSON decoding ----
+def _skip_cstring(data, pos):
+    return data.index(b"\x00", pos) + 1
+
+
+def _read_value(data, kind, pos, wanted):
+    # Returns (value, next position). Values are only built for wanted fields.
+    if kind == 0x01:
+        return (_DOUBLE.unpack_from(data, pos)[0] if wanted else None), pos + 8
+    if kind == 0x02:
+        length = _INT32.unpack_from(data, pos)[0]
+        value = data[pos + 4:pos + 3 + length].decode("utf-8") if wanted else None
+        return value, pos + 4 + length
+    if kind in (0x03, 0x04):
+        return None, pos + _INT32.unpack_from(data, pos)[0]
+    if kind == 0x05:
+        return None, pos + 5 + _INT32.unpack_from(data, pos)[0]
+    if kind == 0x07:
+        return (ObjectId(bytes(data[pos:pos + 12])) if wanted else None), pos + 12
+    if kind == 0x08:
+        return (data[pos] == 1 if wanted else None), pos + 1
+    if kind in (0x09, 0x11):
+        return None, pos + 8
+    if kind in (0x06, 0x0A, 0x7F, 0xFF):
+        return None, pos
+    if kind == 0x0B:
+        return None, _skip_cstring(data, _skip_cstring(data, pos))
+    if kind == 0x10:
+        return (_INT32.unpack_from(data, pos)[0] if wanted else None), pos + 4
+    if kind == 0x12:
+        return (_INT64.unpack_from(data, pos)[0] if wanted else None), pos + 8
+    if kind == 0x13:
+        return None, pos + 16
+    raise ValueError(f"Unsupported BSON type 0x{kind:02x}")
+
+
+def decode_batches(batches, schema):
+    # Each batch is a run of concatenated BSON documents. Values are appended
+    # straight into per-field lists; no per-document dict is ever built.
+    names = list(schema)
+    fields = {name.encode(): index for index, name in enumerate(names)}
+    columns = [[] for _ in names]
+    rows = 0
+    for data in batches:
+        pos = 0
+        end = len(data)
+        while pos < end:
+            doc_end = pos + _INT32.unpack_from(data, pos)[0]
+            for column in columns:
+                column.append(None)
+            pos += 4
+            while pos < doc_end - 1:
+                kind = data[pos]
+                name_end = data.index(b"\x00", pos + 1)
+                index = fields.get(data[pos + 1:name_end])
+                value, pos = _read_value(data, kind, name_end + 1, index is not None)
+                if index is not None:
+                    columns[index][rows] = value
+            pos = doc_end
+            rows += 1
+    return {name: column for name, column in zip(names, columns)}
+
+
+def _to_array(values, kind):
+    # Same dtypes the dict path produces: int64 unless values are missing
+    if kind == "int":
+        if any(value is None for value in values):
+            return np.array([np.nan if value is None else value for value in values], dtype="float64")
+        try:
+            return np.array(values, dtype="int64")
+        except (TypeError, ValueError, OverflowError):
+            return np.array(values, dtype="float64")
+    if kind == "float":
+        return np.array([np.nan if value is None else value for value in values], dtype="float64")
+    return np.array(values, dtype=object)
+
+
+def columns_to_frame(columns, schema):
+    frame = pd.DataFrame({name: _to_array(columns[name], kind) for name, kind in schema.items()})
+    # Like the dict path, fields that no document has are left out
+    return frame[[name for name in schema if any(value is not None for value in columns[name])]]
+
+
+# ---- Public ----
+def fetch_frame(collection, query=None, schema=ATBAT_SCHEMA, batch_size=FETCH_BATCH_SIZE, use_pymongoarrow=None):
+    # Only the schema's fields are requested; pymongoarrow is used by default
+    # when installed, else the pure-Python decoder
+    projection = {name: 1 for name in schema}
+    if "_id" not in schema:
+        projection["_id"] = 0
+    batches = collection.find_raw_batches(query or {}, projection, batch_size=batch_size)
+    if use_pymongoarrow is None:
+        use_pymongoarrow = have_pymongoarrow()
+    if use_pymongoarrow:
+        return arrow_to_frame(decode_batches_arrow(batches, schema), schema)
+    return columns_to_frame(decode_batches(batches, schema), schema)
+
+
+def fetch_frame_dicts(collection, query=None, batch_size=FETCH_BATCH_SIZE):
+    # The original path, kept for comparison
+    return pd.DataFrame(list(collection.find(query or {}, batch_size=batch_size)))
@@ -0,0 +1,58 @@
+# Idempotent at-bat writes.
+#
+# Every at-bat carries a client-generated "atbat_id" assigned when the form is
+# rendered. Writes are upserts on a unique index over that key, so Streamlit
+# reruns, double taps and retried batch flushes can repeat a write safely.
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+ATBATS_COLLECTION = "atbats"
+DUPLICATE_KEY = 11000
+
+
+def ensure_indexes(db):
+    # Per-game scoring sessions load their at-bats by game_id
+    db[ATBATS_COLLECTION].create_index([("game_id", ASCENDING)])
+    # Partial so at-bats recorded before keys existed don't collide on null
+    db[ATBATS_COLLECTION].create_index(
+        [("atbat_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"atbat_id": {"$exists": True}}
+    )
+
+
+def atbat_key(atbat):
+    # Journal/queue key: the idempotency key, or _id for legacy at-bats
+    return atbat.get("atbat_id") or str(atbat["_id"])
+
+
+def _upsert_op(atbat):
+    if atbat.get("atbat_id"):
+        return UpdateOne({"atbat_id": atbat["atbat_id"]}, {"$setOnInsert": atbat}, upsert=True)
+    # At-bats queued before keys existed are still idempotent on their _id
+    return ReplaceOne({"_id": atbat["_id"]}, atbat, upsert=True)
+
+
+def delete_atbat(db, atbat):
+    # Same key as the upsert; returns whether an at-bat was removed
+    key = {"atbat_id": atbat["atbat_id"]} if atbat.get("atbat_id") else {"_id": atbat["_id"]}
+    return db[ATBATS_COLLECTION].delete_one(key).deleted_count > 0
+
+
+def upsert_atbat(db, atbat):
+    return bulk_upsert_atbats(db, [atbat]) > 0
+
+
+def bulk_upsert_atbats(db, atbats):
+    # One unordered round-trip; returns how many at-bats were newly inserted
+    if not atbats:
+        return 0
+    try:
+        result = db[ATBATS_COLLECTION].bulk_write([_upsert_op(atbat) for atbat in atbats], ordered=False)
+    except BulkWriteError as exc:
+        # A duplicate key only means a concurrent upsert of the same at-bat won
+        errors = exc.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+        return exc.details.get("nUpserted", 0)
+    return result.upserted_count
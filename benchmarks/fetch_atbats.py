@@ -0,0 +1,116 @@
+# Compare the at-bat fetch paths: list of dicts vs raw-BSON columns vs pymongoarrow.
+#
+#   python benchmarks/fetch_atbats.py --atbats 100000
+#   python benchmarks/fetch_atbats.py --uri "$MONGO_URI" --atbats 100000 --batch-size 2000
+#
+# Each path is timed end to end (query + transfer + decode) and on decode
+# alone, from raw batches captured once; the in-memory store has to encode
+# BSON for the raw paths, so decode-only is the fair comparison there.
+# Against a real cluster the at-bats are written to a separate database
+# (--db, default "wiffle_benchmark"), never to blitzballstats.
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bson  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import arrow_fetch  # noqa: E402
+from synthetic_league import make_league  # noqa: E402
+
+def make_atbats(count, seed=7):
+    # Whole synthetic games, trimmed to exactly `count` at-bats
+    atbats_per_game = 60
+    games = -(-count // atbats_per_game)
+    return make_league(games=games, atbats_per_game=atbats_per_game, seed=seed)[2][:count]
+
+
+def get_collection(uri, db_name):
+    if uri.startswith("memory://"):
+        from local_store import LocalClient
+        return LocalClient()[db_name]["atbats"]
+    from pymongo import MongoClient
+    return MongoClient(uri)[db_name]["atbats"]
+
+
+def measure(fetch, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fetch())
+        times.append(time.perf_counter() - start)
+    times.sort()
+
+    # One extra traced run for memory; tracing slows it, so it isn't timed
+    tracemalloc.start()
+    fetch()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "rows": rows,
+        "median_seconds": round(times[len(times) // 2], 4),
+        "best_seconds": round(times[0], 4),
+        # Python heap only; Arrow's C++ buffers are not traced
+        "peak_python_mb": round(peak / 1e6, 1),
+    }
+
+
+def decode_dicts(batches):
+    rows = []
+    for batch in batches:
+        rows.extend(bson.decode_all(batch))
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the at-bat fetch paths")
+    parser.add_argument("--uri", default="memory://")
+    parser.add_argument("--db", default="wiffle_benchmark")
+    parser.add_argument("--atbats", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=arrow_fetch.FETCH_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    collection = get_collection(args.uri, args.db)
+    collection.drop()
+    collection.insert_many(make_atbats(args.atbats))
+
+    paths = {
+        "dicts": lambda: arrow_fetch.fetch_frame_dicts(collection, batch_size=args.batch_size),
+        "raw_bson": lambda: arrow_fetch.fetch_frame(collection, batch_size=args.batch_size, use_pymongoarrow=False),
+    }
+    if arrow_fetch.have_pymongoarrow():
+        paths["pymongoarrow"] = lambda: arrow_fetch.fetch_frame(collection, batch_size=args.batch_size, use_pymongoarrow=True)
+
+    schema = arrow_fetch.ATBAT_SCHEMA
+    batches = list(collection.find_raw_batches({}, {name: 1 for name in schema}, batch_size=args.batch_size))
+    decoders = {
+        "dicts": lambda: decode_dicts(batches),
+        "raw_bson": lambda: arrow_fetch.columns_to_frame(arrow_fetch.decode_batches(batches, schema), schema),
+    }
+    if arrow_fetch.have_pymongoarrow():
+        decoders["pymongoarrow"] = lambda: arrow_fetch.arrow_to_frame(arrow_fetch.decode_batches_arrow(batches, schema), schema)
+
+    results = {
+        "atbats": args.atbats,
+        "batch_size": args.batch_size,
+        "source": "memory" if args.uri.startswith("memory://") else "mongodb",
+        "end_to_end": {name: measure(fetch, args.repeat) for name, fetch in paths.items()},
+        "decode_only": {name: measure(decode, args.repeat) for name, decode in decoders.items()},
+    }
+    for section in ("end_to_end", "decode_only"):
+        print(section)
+        for name, result in results[section].items():
+            print(f"  {name:>13}: {result['median_seconds']:.3f}s median, {result['peak_python_mb']} MB peak (Python heap)")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
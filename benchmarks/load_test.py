@@ -0,0 +1,329 @@
+# Simulate concurrent viewers browsing every page.
+#
+#   python benchmarks/load_test.py --sessions 8 --rounds 3
+#   python benchmarks/load_test.py --sessions 20 --atbats 100000 --output load.json
+#
+# Runs entirely in-process: the app is pointed at the in-memory store
+# (MONGO_URI=memory://) seeded with a synthetic league, and each simulated
+# viewer is a Streamlit AppTest session on its own thread that navigates the
+# pages and changes their widgets the way a visitor would. Nothing is written
+# to games or at-bats and no network is used.
+#
+# Reported per page: rerun latency percentiles, database calls per rerun and
+# errors; for the process: resident memory before, during and after, and
+# how much of it is the frames all sessions share.
+# AppTest was built for one test at a time (see share_runtime), so with many
+# sessions an occasional harness error can come from AppTest itself; those
+# are counted apart from errors the pages raised. On a Streamlit release
+# share_runtime hasn't been checked against, nothing is patched and reruns
+# take turns instead of overlapping.
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ["MONGO_URI"] = "memory://"
+
+import streamlit  # noqa: E402
+from streamlit.runtime.scriptrunner import get_script_run_ctx  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import local_store  # noqa: E402
+from database import get_db  # noqa: E402
+from memory_report import rss_mb, shared_report  # noqa: E402
+from synthetic_league import seed_database  # noqa: E402
+
+# What a visitor does on each page after it loads: (widget type, key or index)
+PAGE_ACTIONS = {
+    "Home.py": [("selectbox", "journal_game")],
+    "pages/Standings.py": [("radio", 0), ("selectbox", 0)],
+    "pages/Visualizations.py": [("radio", 0)],
+    "pages/Player_Dashboard.py": [("player", None)],
+    "pages/Player Matchups.py": [("selectbox", 0), ("selectbox", 1)],
+    "pages/Game Log.py": [("selectbox", 0)],
+}
+
+# Collection methods that reach the database
+DB_METHODS = (
+    "find", "find_raw_batches", "find_one", "count_documents", "estimated_document_count",
+    "distinct", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "find_one_and_update", "bulk_write", "create_index",
+)
+SESSION_KEY = "_load_test_run"
+# Streamlit releases (major.minor) whose internals share_runtime was checked
+# against; add one only after reading its Runtime and ScriptCache
+PATCHED_STREAMLIT = ("1.66",)
+
+_calls = defaultdict(int)
+_calls_lock = threading.Lock()
+
+
+# ---- Instrumentation ----
+def share_runtime():
+    # AppTest is built for one test at a time. It installs a stand-in Runtime
+    # for each run and removes it when the run ends, which would pull it out
+    # from under reruns still in progress on other sessions' threads, so the
+    # last one installed stays visible. It also recompiles the page on every
+    # run; the server compiles each page once, so compiled pages are shared
+    # (which also keeps ast.parse off several threads at once).
+    # These are Streamlit internals, so they are only patched on the pinned
+    # releases; returns whether they were.
+    if ".".join(streamlit.__version__.split(".")[:2]) not in PATCHED_STREAMLIT:
+        return False
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    except ImportError:
+        return False
+    if not (hasattr(Runtime, "_instance") and hasattr(ScriptCache, "get_bytecode")):
+        return False
+
+    last = {}
+    compiled = {}
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        if "runtime" not in last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return last["runtime"]
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in last
+
+    def shared_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    ScriptCache.get_bytecode = shared_bytecode
+    return True
+
+
+def quiet_viewer_threads():
+    # Viewer threads drive AppTest from outside any script run, which
+    # Streamlit warns about on every widget change
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: not threading.current_thread().name.startswith("viewer")
+    )
+
+
+def _current_run():
+    # The harness tags each session's state with the rerun in progress; the
+    # loader's worker threads carry the same script context
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    try:
+        return ctx.session_state[SESSION_KEY] if SESSION_KEY in ctx.session_state else None
+    except Exception:
+        return None
+
+
+def _counted(method):
+    def wrapper(*args, **kwargs):
+        run = _current_run()
+        with _calls_lock:
+            _calls[run] += 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def count_db_calls():
+    for name in DB_METHODS:
+        setattr(local_store.LocalCollection, name, _counted(getattr(local_store.LocalCollection, name)))
+
+
+def calls_for(run):
+    with _calls_lock:
+        return _calls.pop(run, 0)
+
+
+# ---- Sessions ----
+def _act(at, action, rng, players):
+    kind, target = action
+    if kind == "player":
+        at.query_params["player"] = rng.choice(players)
+        return
+    widgets = getattr(at, kind)
+    widget = widgets(key=target) if isinstance(target, str) else widgets[target]
+    options = list(widget.options)
+    if kind == "checkbox":
+        widget.set_value(not widget.value)
+    elif options:
+        widget.set_value(rng.choice(options))
+
+
+def _timed_run(at, session, step, timeout):
+    run = (session, step)
+    at.session_state[SESSION_KEY] = run
+    start = time.perf_counter()
+    at.run(timeout=timeout)
+    seconds = time.perf_counter() - start
+    errors = [str(exception.message) for exception in at.exception]
+    return seconds, calls_for(run), errors
+
+
+def run_session(session, args, players, samples, turn):
+    # turn: held around each rerun; a real lock when reruns can't overlap
+    rng = random.Random(args.seed + session)
+    at = AppTest.from_file(str(ROOT / "Home.py"), default_timeout=args.timeout)
+    reruns = []
+    step = 0
+    for _ in range(args.rounds):
+        pages = list(PAGE_ACTIONS)
+        rng.shuffle(pages)
+        for page in pages:
+            # Navigating counts as a rerun of the page being opened
+            if page != "Home.py" or step:
+                at.switch_page(page)
+            actions = [None] + [rng.choice(PAGE_ACTIONS[page]) for _ in range(args.clicks)]
+            for action in actions:
+                try:
+                    with turn:
+                        if action is not None:
+                            _act(at, action, rng, players)
+                        seconds, calls, errors = _timed_run(at, session, step, args.timeout)
+                    harness_error = None
+                except Exception as exc:
+                    # The harness itself failed (e.g. the widget to change
+                    # wasn't on the page), not the app
+                    seconds, calls, errors = None, calls_for((session, step)), []
+                    harness_error = repr(exc)
+                reruns.append({
+                    "page": page,
+                    "action": None if action is None else action[0],
+                    "seconds": seconds,
+                    "db_calls": calls,
+                    "errors": errors,
+                    "harness_error": harness_error,
+                })
+                step += 1
+        samples.append(rss_mb())
+    return reruns
+
+
+# ---- Report ----
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return round(ordered[index], 4)
+
+
+def summarize(reruns):
+    by_page = defaultdict(list)
+    for rerun in reruns:
+        by_page[rerun["page"]].append(rerun)
+    pages = {}
+    for page, rows in sorted(by_page.items()):
+        seconds = [row["seconds"] for row in rows if row["seconds"] is not None]
+        calls = [row["db_calls"] for row in rows]
+        errors = [error for row in rows for error in row["errors"]]
+        harness_errors = [row["harness_error"] for row in rows if row["harness_error"]]
+        pages[page] = {
+            "reruns": len(rows),
+            "p50_seconds": percentile(seconds, 50),
+            "p90_seconds": percentile(seconds, 90),
+            "p99_seconds": percentile(seconds, 99),
+            "max_seconds": percentile(seconds, 100),
+            "db_calls_per_rerun": round(sum(calls) / len(calls), 2),
+            "max_db_calls": max(calls),
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "harness_errors": len(harness_errors),
+            "first_harness_error": harness_errors[0] if harness_errors else None,
+        }
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit pages with concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent simulated viewers")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over every page per session")
+    parser.add_argument("--clicks", type=int, default=2, help="Widget changes per page visit")
+    parser.add_argument("--atbats", type=int, default=20000)
+    parser.add_argument("--players", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds before a rerun counts as failed")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    overlapping = share_runtime()
+    if not overlapping:
+        print(f"Streamlit {streamlit.__version__} isn't one of {', '.join(PATCHED_STREAMLIT)}; "
+              "running without patches, one rerun at a time")
+    turn = nullcontext() if overlapping else threading.Lock()
+    quiet_viewer_threads()
+    count_db_calls()
+    db = get_db()
+    league = seed_database(db, players=args.players, games=math.ceil(args.atbats / 60), seed=args.seed)
+    players = [player["name"] for player in db["players"].find({}, {"name": 1})]
+    calls_for(None)
+
+    rss_start = rss_mb()
+    samples = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions, thread_name_prefix="viewer") as pool:
+        futures = [pool.submit(run_session, session, args, players, samples, turn) for session in range(args.sessions)]
+        reruns = [rerun for future in futures for rerun in future.result()]
+    elapsed = time.perf_counter() - start
+    rss_end = rss_mb()
+
+    seconds = [rerun["seconds"] for rerun in reruns if rerun["seconds"] is not None]
+    results = {
+        "streamlit": streamlit.__version__,
+        "overlapping_reruns": overlapping,
+        "sessions": args.sessions,
+        "rounds": args.rounds,
+        "clicks_per_visit": args.clicks,
+        "league": league,
+        "elapsed_seconds": round(elapsed, 2),
+        "reruns": len(reruns),
+        "reruns_per_second": round(len(reruns) / elapsed, 2) if elapsed else None,
+        "p50_seconds": percentile(seconds, 50),
+        "p90_seconds": percentile(seconds, 90),
+        "p99_seconds": percentile(seconds, 99),
+        "background_db_calls": calls_for(None),
+        "memory": {
+            "rss_start_mb": rss_start,
+            "rss_end_mb": rss_end,
+            "growth_mb": round(rss_end - rss_start, 1),
+            # Frames held once for all sessions at the end of the run
+            "shared_frames_mb": round(sum(row["mb"] for row in shared_report()), 2),
+            # One sample per finished round per session, in completion order
+            "rss_samples_mb": samples,
+        },
+        "pages": summarize(reruns),
+    }
+
+    print(f"{len(reruns)} reruns from {args.sessions} sessions in {elapsed:.1f}s, "
+          f"memory {rss_start} -> {rss_end} MB")
+    for page, row in results["pages"].items():
+        print(f"  {page:>28}: p50 {row['p50_seconds']}s  p90 {row['p90_seconds']}s  "
+              f"p99 {row['p99_seconds']}s  {row['db_calls_per_rerun']} db calls/rerun  {row['errors']} errors")
+    if any(row["harness_errors"] for row in results["pages"].values()):
+        print("  some reruns could not be driven; see harness_errors in the JSON output")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Time the stat computations behind each page on synthetic leagues.
+#
+#   python benchmarks/stats_benchmark.py
+#   python benchmarks/stats_benchmark.py --sizes 10000 100000 --repeat 5 --output stats.json
+#
+# For each size a league is generated (synthetic_league, fixed seed) into the
+# in-memory store, loaded the way the pages load it, and every page's stat
+# code from stats.py is timed. Sizes are rounded up to whole games. Results
+# are written as JSON so runs can be compared across commits.
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+import arrow_fetch  # noqa: E402
+import stats  # noqa: E402
+from local_store import LocalClient  # noqa: E402
+from synthetic_league import seed_database  # noqa: E402
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+def timed(call, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "median_seconds": round(times[len(times) // 2], 4),
+        "best_seconds": round(times[0], 4),
+        "runs": repeat,
+    }
+
+
+def load(db):
+    # Same shapes load_frames hands the pages
+    players = pd.DataFrame(list(db["players"].find()))
+    games = pd.DataFrame(list(db["games"].find()))
+    atbats = arrow_fetch.fetch_frame(db["atbats"])
+    return players, games, atbats
+
+
+def busiest_player(atbats):
+    return atbats["batter"].value_counts().index[0]
+
+
+def page_cases(players, games, atbats):
+    # One entry per page, each running what that page computes on a rerun
+    player = busiest_player(atbats)
+    opponent = atbats[atbats["batter"] == player]["pitcher"].value_counts().index[0]
+    dated = games.assign(date=pd.to_datetime(games["date"], errors="coerce"))
+    season = dated[dated["date"].dt.year == dated["date"].dt.year.max()].iloc[::-1].reset_index(drop=True)
+
+    def player_dashboard():
+        batting = atbats[atbats["batter"] == player]
+        pitching = atbats[atbats["pitcher"] == player]
+        stats.hitting_summary(batting)
+        stats.pitching_summary(pitching)
+        stats.hitting_game_log(batting, games)
+        stats.pitching_game_log(pitching, games)
+
+    def player_matchups():
+        p1_hit, p1_pitch, p2_hit, p2_pitch = stats.head_to_head(atbats, player, opponent)
+        for hitting, pitching in ((p1_hit, p1_pitch), (p2_hit, p2_pitch)):
+            stats.hitting_summary(hitting)
+            stats.pitching_summary(pitching)
+
+    def game_log():
+        for _, row in season.iterrows():
+            stats.scoring_plays(atbats, row)
+        stats.player_records(season)
+
+    return {
+        "standings": lambda: stats.standings_leaderboard(players, atbats),
+        "visualizations": lambda: (stats.calculate_all_player_stats(atbats), stats.calculate_pitcher_stats(atbats)),
+        "player_dashboard": player_dashboard,
+        "player_matchups": player_matchups,
+        "game_log": game_log,
+    }
+
+
+def run_size(size, args):
+    db = LocalClient()["wiffle_benchmark"]
+    start = time.perf_counter()
+    counts = seed_database(
+        db,
+        players=args.players,
+        games=math.ceil(size / args.atbats_per_game),
+        atbats_per_game=args.atbats_per_game,
+        seed=args.seed,
+    )
+    generate_seconds = time.perf_counter() - start
+
+    players, games, atbats = load(db)
+    result = {
+        "atbats": counts["atbats"],
+        "games": counts["games"],
+        "players": counts["players"],
+        "generate_seconds": round(generate_seconds, 4),
+        "load": timed(lambda: load(db), args.repeat),
+        "pages": {},
+    }
+    for name, call in page_cases(players, games, atbats).items():
+        result["pages"][name] = timed(call, args.repeat)
+        print(f"  {name:>16}: {result['pages'][name]['median_seconds']:.3f}s median")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the page stat computations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="At-bat counts to run")
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--atbats-per-game", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "fetch_path": "pymongoarrow" if arrow_fetch.have_pymongoarrow() else "raw_bson",
+        "seed": args.seed,
+        "sizes": [],
+    }
+    for size in args.sizes:
+        print(f"{size} at-bats")
+        results["sizes"].append(run_size(size, args))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
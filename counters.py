@@ -0,0 +1,122 @@
+# Atomic sequence counters for allocating IDs without reading whole collections.
+#
+# Each counter is one document in the "counters" collection advanced with
+# find_one_and_update($inc), so concurrent scorers can never get the same
+# value. Counters are seeded once from existing data on first use.
+import logging
+import re
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import game_journal
+from data_version import bump_version
+from game_state import split_roster
+
+COUNTERS_COLLECTION = "counters"
+GAME_COUNTER = "game_id"
+GAME_ID_PATTERN = re.compile(r"^Game_(\d+)$")
+
+_seeded = set()
+logger = logging.getLogger("wiffle.counters")
+
+
+def ensure_indexes(db):
+    # Older databases can hold duplicate ids from the len(games) + 1 scheme;
+    # the index is skipped there until dedupe_game_ids (migrate.py) runs
+    try:
+        db["games"].create_index([("game_id", ASCENDING)], unique=True)
+        return True
+    except OperationFailure as exc:
+        logger.warning("Unique game_id index not built: %s", exc)
+        return False
+
+
+def seed_counter(db, name, value):
+    # $max keeps this safe to run concurrently and never moves a counter back
+    db[COUNTERS_COLLECTION].update_one({"_id": name}, {"$max": {"seq": value}}, upsert=True)
+
+
+def reset_counter(db, name):
+    db[COUNTERS_COLLECTION].delete_one({"_id": name})
+
+
+def next_value(db, name):
+    doc = db[COUNTERS_COLLECTION].find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["seq"]
+
+
+def _seed_game_counter(db):
+    # One-time scan of game ids (projection only) for databases that predate
+    # the counter; afterwards allocation is a single round-trip
+    if GAME_COUNTER in _seeded:
+        return
+    if db[COUNTERS_COLLECTION].find_one({"_id": GAME_COUNTER}) is None:
+        highest = 0
+        for game in db["games"].find({}, {"game_id": 1, "_id": 0}):
+            match = GAME_ID_PATTERN.match(str(game.get("game_id", "")))
+            if match:
+                highest = max(highest, int(match.group(1)))
+        seed_counter(db, GAME_COUNTER, highest)
+    _seeded.add(GAME_COUNTER)
+
+
+def next_game_id(db):
+    _seed_game_counter(db)
+    return f"Game_{next_value(db, GAME_COUNTER)}"
+
+
+def insert_game(db, game):
+    # Allocate an id and insert; a unique-index collision (e.g. a game created
+    # by hand) just moves on to the next id
+    while True:
+        game["game_id"] = next_game_id(db)
+        try:
+            db["games"].insert_one(game)
+            return game["game_id"]
+        except DuplicateKeyError:
+            game.pop("_id", None)
+
+
+# ---- Migration ----
+def dedupe_game_ids(db):
+    # For migrate.py: gives every game sharing an id with an older one a new
+    # id, then builds the unique index. An at-bat moves with a renumbered game
+    # when its batter is on that game's roster and not on the original's;
+    # anything ambiguous stays with the oldest game. The journals of affected
+    # ids are dropped so migrate.py rebuilds them from the sorted-out at-bats.
+    # Returns how many games were renumbered.
+    groups = {}
+    for game in db["games"].find({}, {"game_id": 1, "team1": 1, "team2": 1}).sort("_id", 1):
+        groups.setdefault(game.get("game_id"), []).append(game)
+
+    renumbered = []
+    affected = []
+    for game_id, games in groups.items():
+        if game_id is None or len(games) < 2:
+            continue
+        kept = set(split_roster(games[0].get("team1")) + split_roster(games[0].get("team2")))
+        for game in games[1:]:
+            new_id = next_game_id(db)
+            while db["games"].find_one({"game_id": new_id}, {"_id": 1}) is not None:
+                new_id = next_game_id(db)
+            db["games"].update_one({"_id": game["_id"]}, {"$set": {"game_id": new_id}})
+            roster = set(split_roster(game.get("team1")) + split_roster(game.get("team2")))
+            db["atbats"].update_many(
+                {"game_id": game_id, "batter": {"$in": sorted(roster - kept)}},
+                {"$set": {"game_id": new_id}}
+            )
+            renumbered.append(new_id)
+        db[game_journal.EVENTS_COLLECTION].delete_many({"game_id": game_id})
+        db[game_journal.SNAPSHOTS_COLLECTION].delete_many({"game_id": game_id})
+        affected.append(game_id)
+
+    if renumbered:
+        bump_version(db, "games", "atbats", game_ids=affected + renumbered)
+    ensure_indexes(db)
+    return len(renumbered)
@@ -0,0 +1,74 @@
+# Global data-version counter stored in a single metadata document.
+#
+# Every write path bumps the counter with one atomic $inc, so any cache
+# (in this process, another page, or another replica) can check whether its
+# data is still current with a single tiny read of the "meta" collection.
+#
+# Per-game versions live in their own small documents (one per game, in
+# GAME_VERSIONS_COLLECTION) rather than as keys on the meta document, which
+# would otherwise grow with every game ever played.
+from pymongo import ReturnDocument, UpdateOne
+
+META_COLLECTION = "meta"
+VERSION_DOC_ID = "data_version"
+GAME_VERSIONS_COLLECTION = "game_versions"
+
+
+def bump_version(db, *collections, game_id=None, game_ids=()):
+    # Increment the global version plus the per-collection and per-game ones
+    increments = {"version": 1}
+    for name in collections:
+        increments[f"collections.{name}"] = 1
+
+    doc = db[META_COLLECTION].find_one_and_update(
+        {"_id": VERSION_DOC_ID},
+        {"$inc": increments},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    games = ([game_id] if game_id is not None else []) + list(game_ids)
+    if games:
+        db[GAME_VERSIONS_COLLECTION].bulk_write([
+            UpdateOne({"_id": game}, {"$inc": {"version": 1}}, upsert=True) for game in games
+        ], ordered=False)
+    return doc["version"]
+
+
+def get_version(db):
+    doc = db[META_COLLECTION].find_one({"_id": VERSION_DOC_ID}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+def get_versions(db, include_games=False):
+    # The per-game map grows with history, so only fetch it when asked for
+    doc = db[META_COLLECTION].find_one({"_id": VERSION_DOC_ID}, {"games": 0}) or {}
+    games = {}
+    if include_games:
+        games = {game["_id"]: game["version"] for game in db[GAME_VERSIONS_COLLECTION].find({}, {"version": 1})}
+    return {
+        "version": doc.get("version", 0),
+        "collections": doc.get("collections", {}),
+        "games": games,
+    }
+
+
+def collection_version(versions, name):
+    return versions["collections"].get(name, 0)
+
+
+def game_version(db, game_id):
+    doc = db[GAME_VERSIONS_COLLECTION].find_one({"_id": game_id}, {"version": 1}) or {}
+    return doc.get("version", 0)
+
+
+def migrate_game_versions(db):
+    # Moves per-game versions off the meta document, where older versions
+    # kept them; $max so a version never moves back. Returns how many moved.
+    doc = db[META_COLLECTION].find_one({"_id": VERSION_DOC_ID}, {"games": 1}) or {}
+    legacy = doc.get("games") or {}
+    if legacy:
+        db[GAME_VERSIONS_COLLECTION].bulk_write([
+            UpdateOne({"_id": game}, {"$max": {"version": version}}, upsert=True) for game, version in legacy.items()
+        ], ordered=False)
+    db[META_COLLECTION].update_one({"_id": VERSION_DOC_ID}, {"$unset": {"games": ""}})
+    return len(legacy)
@@ -0,0 +1,225 @@
+# Shared MongoDB connection and version-keyed collection loading for all pages
+import os
+import weakref
+from functools import partial
+
+import streamlit as st
+import pandas as pd
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+import arrow_fetch
+import atbat_writes
+import counters
+import game_journal
+import mongo_monitor
+import player_ids
+import ratings
+from data_version import get_versions, collection_version, game_version
+from loader import load_concurrently, timed_fetch
+
+# Load MongoDB URI from .env or environment variables
+load_dotenv()
+MONGO_URI = os.getenv('MONGO_URI')
+DB_NAME = "blitzballstats"
+# "columnar" decodes large collections straight into typed columns;
+# "dicts" is the original list-of-documents path. By default the columnar
+# path is used when pymongoarrow is installed, since the pure-Python decoder
+# saves memory but not time.
+FETCH_PATH = os.getenv("FETCH_PATH") or ("columnar" if arrow_fetch.have_pymongoarrow() else "dicts")
+COLUMNAR_SCHEMAS = {"atbats": arrow_fetch.ATBAT_SCHEMA}
+
+# Old versions are dropped once this many frames are cached
+SHARED_FRAMES = int(os.getenv("SHARED_FRAMES", "12"))
+
+_client = None
+_shared = weakref.WeakValueDictionary()
+_last_versions = None
+_last_game_versions = {}
+_last_loaded = {}
+
+# Fields needed to list and pick games; full documents are loaded per game
+GAME_LIST_PROJECTION = {
+    "game_id": 1, "date": 1, "team1": 1, "team2": 1, "status": 1,
+    "team1_score": 1, "team2_score": 1
+}
+
+
+def get_client():
+    # One client (and connection pool) per process instead of one per rerun.
+    # MONGO_URI=memory:// selects the in-memory stand-in for tests. Commands
+    # sent to MongoDB are counted by mongo_monitor.
+    global _client
+    if _client is None:
+        if MONGO_URI and MONGO_URI.startswith("memory://"):
+            from local_store import LocalClient
+            _client = LocalClient()
+        else:
+            _client = MongoClient(MONGO_URI, event_listeners=mongo_monitor.listeners())
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def reset_client():
+    # For forked worker processes: a MongoClient must not be used across a
+    # fork, so the worker connects again. The in-memory store is kept, since
+    # the worker's copy of it is the only data it has.
+    global _client
+    if _client is not None and not (MONGO_URI and MONGO_URI.startswith("memory://")):
+        _client = None
+
+
+@st.cache_resource(show_spinner=False)
+def ensure_indexes():
+    # Runs once per process; create_index is a no-op when the index exists.
+    # Returns a note for each index that could not be built.
+    db = get_db()
+    missing = []
+    atbat_writes.ensure_indexes(db)
+    if not counters.ensure_indexes(db):
+        missing.append("Duplicate game ids are stored, so new games are not protected from sharing an id. "
+                       "Run `python migrate.py` to renumber them.")
+    game_journal.ensure_indexes(db)
+    ratings.ensure_indexes(db)
+    player_ids.ensure_indexes(db)
+    return missing
+
+
+def enable_copy_on_write():
+    # Loaded and derived frames are held once per process and shared by every
+    # session; pages get shallow copies, and copy-on-write keeps a page's
+    # edits (added or converted columns) out of the shared frame. It's a
+    # process-wide pandas option, so the page scripts turn it on themselves
+    # (any of them can be the first one visited) rather than importing this
+    # module doing it. On by default from pandas 3.
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def _share(kind, key, frame):
+    _shared[(kind, key)] = frame
+    return frame
+
+
+def shared_frames():
+    # {(kind, key): frame} for every shared frame still cached
+    return dict(_shared.items())
+
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_FRAMES)
+def load_collection(name, version):
+    # One frame per collection version for the whole process (not a copy per
+    # session as st.cache_data hands out); callers must not modify it
+    collection = get_db()[name]
+    if FETCH_PATH == "columnar" and name in COLUMNAR_SCHEMAS:
+        frame = timed_fetch(name, lambda: arrow_fetch.fetch_frame(collection, schema=COLUMNAR_SCHEMAS[name]))
+    else:
+        frame = timed_fetch(name, lambda: pd.DataFrame(list(collection.find())))
+    return _share("collection", (name, version), frame)
+
+
+def _load_with_fallback(name, version):
+    # A failed or timed-out fetch serves the last version we loaded (a cache hit)
+    try:
+        frame = load_collection(name, version)
+    except PyMongoError:
+        if name not in _last_loaded:
+            raise
+        return load_collection(name, _last_loaded[name])
+    _last_loaded[name] = version
+    return frame
+
+
+def _timed_out(name, error):
+    if name not in _last_loaded:
+        raise error
+    return load_collection(name, _last_loaded[name])
+
+
+def _current_versions():
+    # One small read of the version document. If MongoDB is unreachable,
+    # keep serving whatever we loaded last.
+    global _last_versions
+    try:
+        versions = get_versions(get_db())
+        _last_versions = versions
+    except PyMongoError:
+        if _last_versions is None:
+            raise
+        versions = _last_versions
+    return versions
+
+
+def load_frames(*names):
+    # Cache misses for different collections are fetched concurrently
+    versions = _current_versions()
+    loaded = load_concurrently(
+        {name: partial(_load_with_fallback, name, collection_version(versions, name)) for name in names},
+        on_timeout=_timed_out
+    )
+    frames = [loaded[name].copy(deep=False) for name in names]
+    return frames[0] if len(frames) == 1 else frames
+
+
+def current_versions():
+    # For pinning several derived frames to one read of the versions
+    return _current_versions()
+
+
+def _compute_at(compute, collections, versions):
+    # The inputs at exactly the versions the result is cached under
+    frames = [load_collection(name, version).copy(deep=False) for name, version in zip(collections, versions)]
+    return compute(*frames)
+
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_FRAMES)
+def _derive(name, versions, key, _compute):
+    return _share("derived", (name, versions, key), _compute())
+
+
+def derived_frame(name, compute, collections, key=(), versions=None):
+    # A frame computed from loaded collections (leaderboards, stat tables),
+    # computed once per data version and shared like the collections. compute
+    # is called with the collections' frames, loaded here at the versions the
+    # result is keyed by; frames loaded earlier could be older than a version
+    # read now. key holds anything else the result depends on.
+    versions = versions or _current_versions()
+    pinned = tuple(collection_version(versions, collection) for collection in collections)
+    return _derive(name, pinned, key, partial(_compute_at, compute, collections, pinned)).copy(deep=False)
+
+
+@st.cache_resource(show_spinner=False, max_entries=SHARED_FRAMES)
+def fetch_game_list(version):
+    frame = pd.DataFrame(list(get_db()["games"].find({}, GAME_LIST_PROJECTION).sort("_id", 1)))
+    return _share("game list", version, frame)
+
+
+def load_game_list():
+    # Summary rows for every game, without the state snapshots
+    return fetch_game_list(collection_version(_current_versions(), "games")).copy(deep=False)
+
+
+@st.cache_data(show_spinner=False)
+def fetch_game(game_id, version):
+    db = get_db()
+    game = db["games"].find_one({"game_id": game_id})
+    atbats = pd.DataFrame(list(db["atbats"].find({"game_id": game_id})))
+    return game, atbats
+
+
+def load_game(game_id):
+    # One game document and its at-bats, cached until that game's version
+    # moves, so a scorer's session never reloads the whole league
+    try:
+        version = game_version(get_db(), game_id)
+        _last_game_versions[game_id] = version
+    except PyMongoError:
+        if game_id not in _last_game_versions:
+            raise
+        version = _last_game_versions[game_id]
+    return fetch_game(game_id, version)
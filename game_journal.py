@@ -0,0 +1,320 @@
+# Append-only event journal per game with periodic state snapshots.
+#
+# Every scoring action (at-bat, inning end, game end, correction) is appended
+# as an event with a per-game sequence number. Undo and redo are events too,
+# so the journal is never rewritten. The effective history is a stack of event
+# seqs; snapshots store that stack plus the GameState it produces, so undo,
+# redo and state reconstruction only replay events since the last snapshot.
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from atbat_writes import atbat_key
+from game_state import GameConflict, GameState, parse_ended_innings, split_roster
+
+EVENTS_COLLECTION = "game_events"
+SNAPSHOTS_COLLECTION = "game_snapshots"
+SNAPSHOT_EVERY = 20
+
+ATBAT = "atbat"
+END_INNING = "end_inning"
+END_GAME = "end_game"
+CORRECTION = "correction"
+UNDO = "undo"
+REDO = "redo"
+
+
+def ensure_indexes(db):
+    db[EVENTS_COLLECTION].create_index([("game_id", ASCENDING), ("seq", DESCENDING)], unique=True)
+    db[EVENTS_COLLECTION].create_index(
+        [("game_id", ASCENDING), ("key", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"key": {"$exists": True}}
+    )
+    db[SNAPSHOTS_COLLECTION].create_index([("game_id", ASCENDING), ("seq", DESCENDING)])
+
+
+# ---- Appending ----
+def latest_event(db, game_id):
+    # Indexed lookup of the newest event instead of loading the game's history
+    return db[EVENTS_COLLECTION].find_one({"game_id": game_id}, sort=[("seq", DESCENDING)])
+
+
+def _event_with_key(db, game_id, key):
+    if key is None:
+        return None
+    return db[EVENTS_COLLECTION].find_one({"game_id": game_id, "key": key}, {"seq": 1})
+
+
+def append_event(db, game_id, event_type, payload=None, key=None, expected_seq=None):
+    # An optional idempotency key makes retried appends return the original seq.
+    # expected_seq makes the append a compare-and-set: it only succeeds if no
+    # other scorer has appended since the caller read the journal.
+    existing = _event_with_key(db, game_id, key)
+    if existing:
+        return existing["seq"]
+    while True:
+        if expected_seq is not None:
+            seq = expected_seq
+        else:
+            latest = latest_event(db, game_id)
+            seq = latest["seq"] + 1 if latest else 1
+        event = {
+            "game_id": game_id,
+            "seq": seq,
+            "type": event_type,
+            "payload": payload or {},
+            "created_at": datetime.now(timezone.utc),
+        }
+        if key is not None:
+            event["key"] = key
+        try:
+            db[EVENTS_COLLECTION].insert_one(event)
+            return seq
+        except DuplicateKeyError:
+            existing = _event_with_key(db, game_id, key)
+            if existing:
+                return existing["seq"]
+            if expected_seq is not None:
+                raise GameConflict(game_id)
+            # Another writer took this seq; retry with the next one
+            continue
+
+
+def ensure_journal(db, game_id, team1, team2, atbat_records, ended_innings=()):
+    # Games started before the journal existed get their history imported
+    # once, in one insert with fixed seqs and keys: two writers importing the
+    # same game produce the same events and the second one's are dropped as
+    # duplicates. The import ends with a snapshot so loads don't replay it.
+    if not atbat_records or latest_event(db, game_id) is not None:
+        return False
+    imported = [(ATBAT, atbat, atbat_key(atbat)) for atbat in atbat_records]
+    imported += [(END_INNING, {"inning": label}, f"import:end_inning:{label}") for label in ended_innings]
+    created_at = datetime.now(timezone.utc)
+    try:
+        db[EVENTS_COLLECTION].insert_many([
+            {"game_id": game_id, "seq": seq, "type": event_type, "payload": payload, "key": key, "created_at": created_at}
+            for seq, (event_type, payload, key) in enumerate(imported, start=1)
+        ], ordered=False)
+    except BulkWriteError as exc:
+        if any(error.get("code") != 11000 for error in exc.details.get("writeErrors", [])):
+            raise
+    _snapshot(db, game_id, load_history(db, game_id, team1, team2))
+    return True
+
+
+def import_legacy_games(db):
+    # For migrate.py: journals for every game that has at-bats but none yet
+    journaled = set(db[EVENTS_COLLECTION].distinct("game_id"))
+    imported = 0
+    for game in db["games"].find({}, {"game_id": 1, "team1": 1, "team2": 1, "ended_innings": 1}):
+        if game.get("game_id") in journaled:
+            continue
+        atbat_records = list(db["atbats"].find({"game_id": game["game_id"]}))
+        if ensure_journal(db, game["game_id"], split_roster(game.get("team1")), split_roster(game.get("team2")),
+                          atbat_records, parse_ended_innings(game.get("ended_innings"))):
+            imported += 1
+    return imported
+
+
+# ---- Reconstruction ----
+def _apply_stack_event(stack, redo, event):
+    if event["type"] == UNDO:
+        if stack:
+            redo.append(stack.pop())
+    elif event["type"] == REDO:
+        if redo:
+            stack.append(redo.pop())
+    else:
+        stack.append(event["seq"])
+        redo.clear()
+
+
+def _apply_state_event(state, event, corrections):
+    payload = event["payload"]
+    if event["type"] == ATBAT:
+        atbat = dict(payload, **corrections.get(event["seq"], {}))
+        if isinstance(atbat.get("inning"), str):
+            state.move_to(atbat["inning"])
+        state.record_atbat(atbat)
+    elif event["type"] == END_INNING:
+        if state.inning_label == payload.get("inning"):
+            state.end_half_inning()
+        elif payload.get("inning") not in state.ended_innings:
+            state.ended_innings.append(payload.get("inning"))
+    elif event["type"] == END_GAME:
+        state.end_game()
+
+
+def _load_events(db, game_id, seqs, known):
+    missing = [seq for seq in seqs if seq not in known]
+    if missing:
+        for event in db[EVENTS_COLLECTION].find({"game_id": game_id, "seq": {"$in": missing}}):
+            known[event["seq"]] = event
+    return known
+
+
+def _tail_corrections(events, seqs):
+    corrections = {}
+    for seq in seqs:
+        if events[seq]["type"] == CORRECTION:
+            payload = events[seq]["payload"]
+            corrections.setdefault(payload["target"], {}).update(payload["after"])
+    return corrections
+
+
+def load_history(db, game_id, team1, team2):
+    snapshots = db[SNAPSHOTS_COLLECTION]
+    snapshot = snapshots.find_one({"game_id": game_id}, sort=[("seq", DESCENDING)])
+    since = snapshot["seq"] if snapshot else 0
+    stack = list(snapshot["stack"]) if snapshot else []
+    redo = list(snapshot["redo"]) if snapshot else []
+
+    # Only the events appended since the latest snapshot are read
+    events = {}
+    for event in db[EVENTS_COLLECTION].find({"game_id": game_id, "seq": {"$gt": since}}).sort("seq", ASCENDING):
+        events[event["seq"]] = event
+        _apply_stack_event(stack, redo, event)
+    head = max(events) if events else since
+
+    # Start from the newest snapshot whose history is still a prefix of the
+    # current stack and that no later correction reaches back into. Undoing
+    # past a snapshot falls back to an older one.
+    base = snapshot
+    while True:
+        prefix = base["stack"] if base else []
+        if stack[:len(prefix)] == prefix:
+            replay = stack[len(prefix):]
+            _load_events(db, game_id, replay, events)
+            corrections = _tail_corrections(events, replay)
+            if base is None or not any(target in prefix for target in corrections):
+                break
+        base = snapshots.find_one({"game_id": game_id, "seq": {"$lt": base["seq"]}}, sort=[("seq", DESCENDING)])
+
+    if base is not None:
+        state = GameState.from_snapshot(game_id, team1, team2, base["state"])
+    else:
+        state = GameState(game_id=game_id, team1=team1, team2=team2)
+    for seq in replay:
+        _apply_state_event(state, events[seq], corrections)
+
+    return {"state": state, "stack": stack, "redo": redo, "head": head, "events": events, "snapshot_seq": since}
+
+
+def _snapshot(db, game_id, history):
+    db[SNAPSHOTS_COLLECTION].insert_one({
+        "game_id": game_id,
+        "seq": history["head"],
+        "stack": history["stack"],
+        "redo": history["redo"],
+        "state": history["state"].to_snapshot(),
+    })
+
+
+def _maybe_snapshot(db, game_id, history):
+    # By distance from the latest snapshot, not head % SNAPSHOT_EVERY: a
+    # concurrent append can carry the head past any particular multiple
+    if history["head"] - history["snapshot_seq"] >= SNAPSHOT_EVERY:
+        _snapshot(db, game_id, history)
+
+
+# ---- Public operations ----
+def record(db, game_id, team1, team2, event_type, payload=None, key=None, expected_seq=None):
+    append_event(db, game_id, event_type, payload, key, expected_seq)
+    history = load_history(db, game_id, team1, team2)
+    _maybe_snapshot(db, game_id, history)
+    return history
+
+
+def last_effective_event(db, game_id, history):
+    if not history["stack"]:
+        return None
+    _load_events(db, game_id, history["stack"][-1:], history["events"])
+    return history["events"][history["stack"][-1]]
+
+
+def effective_atbat(db, game_id, history, atbat_event):
+    # The at-bat as recorded plus any corrections still in effect
+    atbat = dict(atbat_event["payload"])
+    live = set(history["stack"])
+    corrections = db[EVENTS_COLLECTION].find(
+        {"game_id": game_id, "type": CORRECTION, "payload.target": atbat_event["seq"]}
+    ).sort("seq", ASCENDING)
+    for correction in corrections:
+        if correction["seq"] in live:
+            atbat.update(correction["payload"]["after"])
+    return atbat
+
+
+def _project(db, event, forward):
+    # Mirror an undone/redone event onto the at-bats collection
+    atbats_col = db["atbats"]
+    payload = event["payload"]
+    if event["type"] == ATBAT:
+        if forward:
+            atbats_col.replace_one({"_id": payload["_id"]}, payload, upsert=True)
+        else:
+            atbats_col.delete_one({"_id": payload["_id"]})
+    elif event["type"] == CORRECTION:
+        fields = payload["after"] if forward else payload["before"]
+        atbats_col.update_one({"_id": payload["atbat_id"]}, {"$set": fields})
+
+
+def undo(db, game_id, team1, team2, steps=1, expected_head=None):
+    # expected_head is the journal position the scorer was looking at; if
+    # anyone appended since, the first step raises GameConflict untouched
+    undone = []
+    history = load_history(db, game_id, team1, team2)
+    head = history["head"] if expected_head is None else expected_head
+    for _ in range(steps):
+        event = last_effective_event(db, game_id, history)
+        if event is None:
+            break
+        history = record(db, game_id, team1, team2, UNDO, {"target": event["seq"]}, expected_seq=head + 1)
+        head = history["head"]
+        _project(db, event, forward=False)
+        undone.append(event)
+    return undone, history
+
+
+def redo(db, game_id, team1, team2, steps=1, expected_head=None):
+    redone = []
+    history = load_history(db, game_id, team1, team2)
+    head = history["head"] if expected_head is None else expected_head
+    for _ in range(steps):
+        if not history["redo"]:
+            break
+        _load_events(db, game_id, history["redo"], history["events"])
+        event = history["events"][history["redo"][-1]]
+        history = record(db, game_id, team1, team2, REDO, {"target": event["seq"]}, expected_seq=head + 1)
+        head = history["head"]
+        _project(db, event, forward=True)
+        redone.append(event)
+    return redone, history
+
+
+def correct_atbat(db, game_id, team1, team2, history, atbat_event, changes):
+    current = effective_atbat(db, game_id, history, atbat_event)
+    payload = {
+        "target": atbat_event["seq"],
+        "atbat_id": current["_id"],
+        "before": {key: current.get(key) for key in changes},
+        "after": changes,
+    }
+    history = record(db, game_id, team1, team2, CORRECTION, payload, expected_seq=history["head"] + 1)
+    _project(db, {"type": CORRECTION, "payload": payload}, forward=True)
+    return history
+
+
+def describe_event(event):
+    payload = event["payload"]
+    if event["type"] == ATBAT:
+        return f"At-bat: `{payload.get('batter')}` vs `{payload.get('pitcher')}` | Outcome: `{payload.get('outcome')}`"
+    if event["type"] == END_INNING:
+        return f"Ended inning `{payload.get('inning')}`"
+    if event["type"] == END_GAME:
+        return "Ended game"
+    if event["type"] == CORRECTION:
+        return f"Corrected at-bat #{payload.get('target')}: {payload.get('after')}"
+    return event["type"]
@@ -0,0 +1,234 @@
+# Incremental live state for an active game.
+#
+# Tracks inning, half, outs, score per team and each team's spot in the
+# batting order. Every recorded at-bat updates the state in O(1), half-innings
+# advance automatically at three outs, and a compact snapshot is stored on the
+# game document so the current situation never requires rescanning at-bats.
+from dataclasses import dataclass, field
+
+from data_version import bump_version
+
+REGULATION_INNINGS = 6
+OUTS_PER_HALF_INNING = 3
+
+
+def _as_int(value):
+    if value is None or value != value:  # missing or NaN
+        return 0
+    return int(value)
+
+
+def parse_ended_innings(value):
+    # Arrays since multi-scorer support; older games stored a ";"-joined string
+    if isinstance(value, list):
+        return [label for label in value if label]
+    if isinstance(value, str):
+        return [label for label in value.split(";") if label]
+    return []
+
+
+class GameConflict(Exception):
+    # Another scorer changed the game after this session read it
+    def __init__(self, game_id):
+        super().__init__(f"{game_id} was updated by another scorer")
+        self.game_id = game_id
+
+
+def split_roster(value):
+    if isinstance(value, list):
+        return [p.strip() for p in value if str(p).strip()]
+    if value is None or value != value:  # missing or NaN
+        return []
+    return [p.strip() for p in str(value).split(",") if p.strip()]
+
+
+@dataclass
+class GameState:
+    game_id: str
+    team1: list
+    team2: list
+    inning: int = 1
+    half: str = "Top"
+    outs: int = 0
+    team1_score: int = 0
+    team2_score: int = 0
+    team1_next: int = 0
+    team2_next: int = 0
+    ended_innings: list = field(default_factory=list)
+    status: str = "active"
+    atbats: int = 0
+
+    def __post_init__(self):
+        # Name -> batting order position, so lookups stay O(1)
+        self._order = {
+            "team1": {name: i for i, name in enumerate(self.team1)},
+            "team2": {name: i for i, name in enumerate(self.team2)},
+        }
+
+    # ---- Situation ----
+    @property
+    def inning_label(self):
+        return f"{self.half} {self.inning}"
+
+    @property
+    def batting_team(self):
+        # Team 1 bats in the top of each inning
+        return "team1" if self.half == "Top" else "team2"
+
+    @property
+    def fielding_team(self):
+        return "team2" if self.half == "Top" else "team1"
+
+    def roster(self, team):
+        return self.team1 if team == "team1" else self.team2
+
+    def team_of(self, player):
+        if player in self._order["team1"]:
+            return "team1"
+        if player in self._order["team2"]:
+            return "team2"
+        return None
+
+    def next_batter(self):
+        team = self.batting_team
+        roster = self.roster(team)
+        if not roster:
+            return None
+        return roster[getattr(self, f"{team}_next") % len(roster)]
+
+    def score(self):
+        return self.team1_score, self.team2_score
+
+    # ---- Transitions ----
+    def record_atbat(self, atbat):
+        team = self.team_of(atbat.get("batter")) or self.batting_team
+        runs = _as_int(atbat.get("rbi"))
+        setattr(self, f"{team}_score", getattr(self, f"{team}_score") + runs)
+
+        # The next batter follows whoever actually hit, even out of order
+        position = self._order[team].get(atbat.get("batter"))
+        if position is not None:
+            setattr(self, f"{team}_next", position + 1)
+        else:
+            setattr(self, f"{team}_next", getattr(self, f"{team}_next") + 1)
+
+        self.atbats += 1
+        self.outs += _as_int(atbat.get("outs_recorded"))
+        if self.outs >= OUTS_PER_HALF_INNING:
+            self.end_half_inning()
+
+    def end_half_inning(self):
+        if self.inning_label not in self.ended_innings:
+            self.ended_innings.append(self.inning_label)
+        self.outs = 0
+        if self.half == "Top":
+            self.half = "Bottom"
+        else:
+            self.half = "Top"
+            self.inning += 1
+
+    def move_to(self, label):
+        # Jump to an explicit "Top 3" style label (used when replaying history)
+        half, inning = label.split()
+        if (half, int(inning)) != (self.half, self.inning):
+            self.half, self.inning, self.outs = half, int(inning), 0
+
+    def end_game(self):
+        self.status = "completed"
+
+    # ---- Persistence ----
+    def to_snapshot(self):
+        return {
+            "inning": self.inning,
+            "half": self.half,
+            "outs": self.outs,
+            "score": [self.team1_score, self.team2_score],
+            "next": [self.team1_next, self.team2_next],
+            "ended_innings": list(self.ended_innings),
+            "status": self.status,
+            "atbats": self.atbats,
+        }
+
+    @classmethod
+    def from_snapshot(cls, game_id, team1, team2, snapshot):
+        return cls(
+            game_id=game_id,
+            team1=team1,
+            team2=team2,
+            inning=snapshot["inning"],
+            half=snapshot["half"],
+            outs=snapshot["outs"],
+            team1_score=snapshot["score"][0],
+            team2_score=snapshot["score"][1],
+            team1_next=snapshot["next"][0],
+            team2_next=snapshot["next"][1],
+            ended_innings=list(snapshot.get("ended_innings", [])),
+            status=snapshot.get("status", "active"),
+            atbats=snapshot.get("atbats", 0),
+        )
+
+    @classmethod
+    def from_history(cls, game_id, team1, team2, atbats, ended_innings=()):
+        # Full replay, only needed for games recorded before snapshots existed
+        state = cls(game_id=game_id, team1=team1, team2=team2)
+        for atbat in atbats:
+            if isinstance(atbat.get("inning"), str):
+                state.move_to(atbat["inning"])
+            state.record_atbat(atbat)
+        for label in ended_innings:
+            if label not in state.ended_innings:
+                state.ended_innings.append(label)
+        while state.inning_label in state.ended_innings:
+            state.end_half_inning()
+        return state
+
+
+def save_game_state(db, state, *also_changed, rev=None, rewind=False):
+    # Compare-and-set on the game document. "rev" is the journal seq the
+    # stored state reflects, so a scorer writing a state computed from an
+    # older position never overwrites a newer one. Ended innings are merged
+    # with $addToSet; only undo/corrections (rewind=True) may remove one.
+    query = {"game_id": state.game_id}
+    fields = {
+        "state": state.to_snapshot(),
+        "status": state.status,
+        "team1_score": state.team1_score,
+        "team2_score": state.team2_score,
+    }
+    update = {"$set": fields}
+    if rev is not None:
+        query["$or"] = [{"rev": {"$lt": rev}}, {"rev": {"$exists": False}}]
+        fields["rev"] = rev
+    if rewind:
+        fields["ended_innings"] = list(state.ended_innings)
+    else:
+        update["$addToSet"] = {"ended_innings": {"$each": list(state.ended_innings)}}
+    result = db["games"].update_one(query, update)
+    bump_version(db, "games", *also_changed, game_id=state.game_id)
+    return result.matched_count > 0
+
+
+def migrate_ended_innings(db):
+    # For migrate.py: games still holding the legacy string get a list, so
+    # $addToSet works on them
+    migrated = 0
+    for game in db["games"].find({"ended_innings": {"$type": "string"}}, {"ended_innings": 1}):
+        result = db["games"].update_one(
+            {"_id": game["_id"], "ended_innings": game["ended_innings"]},
+            {"$set": {"ended_innings": parse_ended_innings(game["ended_innings"])}}
+        )
+        migrated += result.modified_count
+    return migrated
+
+
+def load_game_state(game, game_atbats=None):
+    # Build the state from a game document (dict or DataFrame row)
+    team1 = split_roster(game.get("team1"))
+    team2 = split_roster(game.get("team2"))
+    snapshot = game.get("state")
+    if isinstance(snapshot, dict):
+        return GameState.from_snapshot(game["game_id"], team1, team2, snapshot)
+
+    ended = parse_ended_innings(game.get("ended_innings"))
+    atbat_records = [] if game_atbats is None else game_atbats.to_dict("records")
+    return GameState.from_history(game["game_id"], team1, team2, atbat_records, ended)
@@ -5,6 +5,11 @@ import os
 import json
 from dotenv import load_dotenv
 
+import counters
+import game_journal
+import player_ids
+from data_version import bump_version
+
 # Load MongoDB URI from .env or environment variables
 load_dotenv()
 MONGO_URI = os.getenv('MONGO_URI')  # e.g. mongodb+srv://<user>:<password>@cluster0.mongodb.net
@@ -18,6 +23,8 @@ def import_csv_to_mongodb(csv_path, collection_name):
     client = MongoClient(MONGO_URI)
     db = client["blitzballstats"]
     collection = db[collection_name]
+    # Games cached per game id must move on too, both the replaced and the new
+    game_ids = set(collection.distinct("game_id")) if collection_name in ("games", "atbats") else set()
 
     # Optional: Clear old data
     collection.drop()
@@ -25,6 +32,9 @@ def import_csv_to_mongodb(csv_path, collection_name):
     df = pd.read_csv(csv_path)
     data = json.loads(df.to_json(orient="records"))
     collection.insert_many(data)
+    if collection_name in ("games", "atbats"):
+        game_ids |= set(collection.distinct("game_id"))
+    bump_version(db, collection_name, game_ids=sorted(game_ids, key=str))
     print(f"Inserted {collection.count_documents({})} documents into {collection_name}")
     
 
@@ -32,3 +42,18 @@ def import_csv_to_mongodb(csv_path, collection_name):
 import_csv_to_mongodb('atbats.csv', 'atbats')
 import_csv_to_mongodb('games.csv', 'games')
 import_csv_to_mongodb('players.csv', 'players')
+
+# Player ids for whatever the CSVs lacked, counting on from the imported ones
+imported = MongoClient(MONGO_URI)["blitzballstats"]
+counters.reset_counter(imported, player_ids.PLAYER_COUNTER)
+player_ids.ensure_indexes(imported)
+print(f"Assigned player ids on {player_ids.migrate(imported)} documents")
+
+# Journals, snapshots and the game counter described the replaced games;
+# journals are rebuilt from the imported at-bats and the counter reseeds
+# from the imported game ids on first use
+imported[game_journal.EVENTS_COLLECTION].delete_many({})
+imported[game_journal.SNAPSHOTS_COLLECTION].delete_many({})
+counters.reset_counter(imported, counters.GAME_COUNTER)
+game_journal.ensure_indexes(imported)
+print(f"Rebuilt journals for {game_journal.import_legacy_games(imported)} games")
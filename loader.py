@@ -0,0 +1,121 @@
+# Concurrent collection loading.
+#
+# Pages need several collections per rerun. Instead of paying one Atlas
+# round-trip (plus decoding) after another, the reads are submitted to a
+# shared thread pool so a cold load costs roughly the slowest collection.
+# Each fetch runs under its own timeout and is recorded for diagnostics.
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import pymongo
+from pymongo.errors import PyMongoError
+
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("LOAD_TIMEOUT_SECONDS", "20"))
+# At-bats are by far the largest collection, so they get more time
+COLLECTION_TIMEOUTS = {
+    "atbats": float(os.getenv("LOAD_TIMEOUT_ATBATS_SECONDS", "45")),
+}
+# The driver enforces the timeout itself; the pool only steps in if a call
+# is stuck somewhere the driver can't see (e.g. decoding)
+BACKSTOP_GRACE_SECONDS = 5.0
+
+logger = logging.getLogger("wiffle.loader")
+
+_executor = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="wiffle-load")
+_fetches = deque(maxlen=200)
+_fetches_lock = threading.Lock()
+
+
+class LoadTimeout(PyMongoError):
+    def __init__(self, name, seconds):
+        super().__init__(f"Loading '{name}' took longer than {seconds:g}s")
+        self.name = name
+        self.seconds = seconds
+
+
+def timeout_for(name):
+    return COLLECTION_TIMEOUTS.get(name, DEFAULT_TIMEOUT_SECONDS)
+
+
+# ---- Instrumentation ----
+def record_fetch(name, seconds, rows=None, error=None):
+    entry = {
+        "collection": name,
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "thread": threading.current_thread().name,
+        "error": error,
+        "at": time.time(),
+    }
+    with _fetches_lock:
+        _fetches.append(entry)
+    logger.debug("fetch %s: %.1f ms, %s rows%s", name, seconds * 1000, rows, f", error: {error}" if error else "")
+    return entry
+
+
+def recent_fetches(limit=50):
+    with _fetches_lock:
+        return list(_fetches)[-limit:]
+
+
+def timed_fetch(name, fetch):
+    # Runs one DB fetch + decode under the driver's client-side timeout, so a
+    # slow collection is cancelled instead of holding a pool thread forever
+    start = time.perf_counter()
+    try:
+        with pymongo.timeout(timeout_for(name)):
+            frame = fetch()
+    except Exception as exc:
+        record_fetch(name, time.perf_counter() - start, error=str(exc))
+        raise
+    record_fetch(name, time.perf_counter() - start, rows=len(frame))
+    return frame
+
+
+# ---- Concurrent loading ----
+def with_script_context(call):
+    # Streamlit's cache and session lookups need the script run context,
+    # which is per thread; hand the caller's to the pool thread
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return call
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return call
+
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call()
+    return run
+
+
+def load_concurrently(calls, on_timeout=None):
+    # calls: {name: zero-argument callable}. Returns {name: result}; a single
+    # call runs inline since there is nothing to overlap with. on_timeout(name)
+    # may supply a stand-in result when a call misses its deadline.
+    if len(calls) == 1:
+        name, call = next(iter(calls.items()))
+        return {name: call()}
+
+    futures = {name: _executor.submit(with_script_context(call)) for name, call in calls.items()}
+    started = time.monotonic()
+    results = {}
+    for name, future in futures.items():
+        # Deadlines are measured from submission, so waits don't stack up
+        remaining = timeout_for(name) + BACKSTOP_GRACE_SECONDS - (time.monotonic() - started)
+        try:
+            results[name] = future.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            future.cancel()
+            error = LoadTimeout(name, timeout_for(name))
+            record_fetch(name, time.monotonic() - started, error=str(error))
+            if on_timeout is None:
+                raise error
+            results[name] = on_timeout(name, error)
+    return results
@@ -0,0 +1,625 @@
+# In-memory stand-in for the subset of MongoDB the app uses.
+#
+# Selected with MONGO_URI=memory:// so the pages, scripts and write-behind
+# queue can run against local data for tests, benchmarks and offline work.
+# Documents are deep-copied in and out, unique indexes are enforced and the
+# usual PyMongo exceptions and result objects are returned.
+import copy
+import threading
+
+import bson
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+_MISSING = object()
+_TYPES = {
+    "string": str,
+    "object": dict,
+    "array": list,
+    "bool": bool,
+    "int": int,
+    "long": int,
+    "double": float,
+    "number": (int, float),
+}
+
+
+# ---- Matching and projection ----
+def _get_path(doc, path):
+    current = doc
+    for part in path.split("."):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            return _MISSING
+    return current
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part, {})
+    doc.pop(parts[-1], None)
+
+
+def _candidates(value):
+    # Array fields match on any element, like MongoDB multikey queries
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _compare(value, op, arg):
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > arg
+        if op == "$gte":
+            return value >= arg
+        if op == "$lt":
+            return value < arg
+        return value <= arg
+    except TypeError:
+        return False
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, arg in condition.items():
+            if op == "$exists":
+                if (value is not _MISSING) != bool(arg):
+                    return False
+            elif op == "$in":
+                if value is _MISSING:
+                    if None not in arg:
+                        return False
+                elif not any(candidate in arg for candidate in _candidates(value)):
+                    return False
+            elif op == "$nin":
+                if value is not _MISSING and any(candidate in arg for candidate in _candidates(value)):
+                    return False
+            elif op == "$ne":
+                if value is not _MISSING and arg in _candidates(value):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if not any(_compare(candidate, op, arg) for candidate in _candidates(value)):
+                    return False
+            elif op == "$type":
+                if value is _MISSING:
+                    return False
+                if arg == "null":
+                    if value is not None:
+                        return False
+                elif arg == "array":
+                    if not isinstance(value, list):
+                        return False
+                elif not any(
+                    isinstance(candidate, _TYPES[arg]) and not (isinstance(candidate, bool) and arg != "bool")
+                    for candidate in _candidates(value)
+                ):
+                    return False
+            elif op == "$elemMatch":
+                if not isinstance(value, list) or not any(
+                    isinstance(item, dict) and matches(item, arg) for item in value
+                ):
+                    return False
+            else:
+                raise NotImplementedError(f"Query operator {op} is not supported by the local store")
+        return True
+    if value is _MISSING:
+        return condition is None
+    return condition in _candidates(value)
+
+
+def matches(doc, query):
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include = {key for key, flag in projection.items() if flag and key != "_id"}
+    if include:
+        result = {}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path in include:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(result, path, copy.deepcopy(value))
+        return result
+    result = copy.deepcopy(doc)
+    for path, flag in projection.items():
+        if not flag:
+            _unset_path(result, path)
+    return result
+
+
+def _sort_key(value):
+    # Missing/None sort first, then numbers, then strings, then everything else
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, int(value))
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+def _normalize_sort(key_or_list, direction=1):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction)]
+    return list(key_or_list)
+
+
+# ---- Updates ----
+def _apply_update(doc, update, inserting=False):
+    if not any(key.startswith("$") for key in update):
+        replacement = copy.deepcopy(update)
+        replacement["_id"] = doc["_id"]
+        doc.clear()
+        doc.update(replacement)
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get_path(doc, path)
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                if current is _MISSING or arg > current:
+                    _set_path(doc, path, arg)
+            elif op == "$push":
+                values = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                _set_path(doc, path, ([] if current is _MISSING else list(current)) + copy.deepcopy(values))
+            elif op == "$addToSet":
+                values = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                existing = [] if current is _MISSING else list(current)
+                for value in values:
+                    if value not in existing:
+                        existing.append(copy.deepcopy(value))
+                _set_path(doc, path, existing)
+            elif op == "$pull":
+                if current is not _MISSING:
+                    _set_path(doc, path, [value for value in current if value != arg])
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the local store")
+
+
+def _upsert_seed(query):
+    seed = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and any(op.startswith("$") for op in condition):
+            continue
+        _set_path(seed, key, copy.deepcopy(condition))
+    return seed
+
+
+# ---- Results ----
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids = {}
+        self.acknowledged = True
+
+    @property
+    def bulk_api_result(self):
+        return {
+            "nInserted": self.inserted_count,
+            "nMatched": self.matched_count,
+            "nModified": self.modified_count,
+            "nRemoved": self.deleted_count,
+            "nUpserted": self.upserted_count,
+            "upserted": [{"index": i, "_id": _id} for i, _id in self.upserted_ids.items()],
+        }
+
+
+# ---- Cursor ----
+class LocalCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key_or_list, direction=1):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _evaluate(self):
+        if self._results is None:
+            self._results = self._collection._select(self._query, self._sort, self._skip, self._limit, self._projection)
+        return self._results
+
+    def __iter__(self):
+        return iter(self._evaluate())
+
+    def to_list(self, length=None):
+        return list(self._evaluate())[:length] if length else list(self._evaluate())
+
+
+# ---- Collection / database / client ----
+class LocalCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._unique = []
+        self._indexes = {"_id_": [("_id", 1)]}
+        self._lock = database.client.lock
+
+    # -- helpers --
+    def _key(self, _id):
+        return str(_id) if isinstance(_id, ObjectId) else repr(_id)
+
+    def _index_values(self, doc, fields, partial):
+        if partial and not matches(doc, partial):
+            return None
+        values = tuple(_get_path(doc, field) for field, _ in fields)
+        if all(value is _MISSING for value in values) and partial:
+            return None
+        return tuple(None if value is _MISSING else str(value) for value in values)
+
+    def _check_unique(self, doc, ignore_key=None):
+        for name, fields, partial, entries in self._unique:
+            values = self._index_values(doc, fields, partial)
+            if values is not None and entries.get(values, ignore_key) != ignore_key:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+
+    def _index_add(self, key, doc):
+        for _, fields, partial, entries in self._unique:
+            values = self._index_values(doc, fields, partial)
+            if values is not None:
+                entries[values] = key
+
+    def _index_remove(self, key, doc):
+        for _, fields, partial, entries in self._unique:
+            values = self._index_values(doc, fields, partial)
+            if values is not None and entries.get(values) == key:
+                del entries[values]
+
+    def _store(self, key, doc):
+        if key in self._docs:
+            self._index_remove(key, self._docs[key])
+        self._docs[key] = doc
+        self._index_add(key, doc)
+
+    def _remove(self, key):
+        self._index_remove(key, self._docs.pop(key))
+
+    def _insert(self, document):
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        key = self._key(document["_id"])
+        if key in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        stored = copy.deepcopy(document)
+        self._check_unique(stored)
+        self._store(key, stored)
+        return document["_id"]
+
+    def _select(self, query, sort=None, skip=0, limit=0, projection=None):
+        with self._lock:
+            docs = [doc for doc in self._docs.values() if matches(doc, query)]
+            for field, direction in reversed(sort or []):
+                docs.sort(key=lambda doc: _sort_key(_get_path(doc, field)), reverse=direction < 0)
+            if skip:
+                docs = docs[skip:]
+            if limit:
+                docs = docs[:limit]
+            return [_project(doc, projection) for doc in docs]
+
+    def _first_key(self, query, sort=None):
+        docs = [(key, doc) for key, doc in self._docs.items() if matches(doc, query)]
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda item: _sort_key(_get_path(item[1], field)), reverse=direction < 0)
+        return docs[0][0] if docs else None
+
+    def _update(self, query, update, upsert, many):
+        with self._lock:
+            keys = [key for key, doc in self._docs.items() if matches(doc, query)]
+            if not many:
+                keys = keys[:1]
+            modified = 0
+            for key in keys:
+                candidate = copy.deepcopy(self._docs[key])
+                _apply_update(candidate, update)
+                self._check_unique(candidate, ignore_key=key)
+                if candidate != self._docs[key]:
+                    modified += 1
+                self._store(key, candidate)
+            if keys or not upsert:
+                return UpdateResult(len(keys), modified)
+            doc = _upsert_seed(query)
+            doc.setdefault("_id", ObjectId())
+            _apply_update(doc, update, inserting=True)
+            return UpdateResult(0, 0, self._insert(doc))
+
+    # -- indexes --
+    def create_index(self, keys, unique=False, name=None, partialFilterExpression=None, **kwargs):
+        fields = _normalize_sort(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in fields)
+        with self._lock:
+            if unique and not any(existing[0] == name for existing in self._unique):
+                entries = {}
+                self._unique.append((name, fields, partialFilterExpression, entries))
+                for key, doc in self._docs.items():
+                    values = self._index_values(doc, fields, partialFilterExpression)
+                    if values is None:
+                        continue
+                    if values in entries:
+                        self._unique.pop()
+                        raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+                    entries[values] = key
+            self._indexes[name] = fields
+        return name
+
+    def create_indexes(self, models):
+        return [self.create_index(model.document["key"].items(), **{
+            k: v for k, v in model.document.items() if k != "key"
+        }) for model in models]
+
+    def index_information(self):
+        return {name: {"key": fields} for name, fields in self._indexes.items()}
+
+    # -- reads --
+    def find(self, filter=None, projection=None, sort=None, limit=0, batch_size=None, **kwargs):
+        cursor = LocalCursor(self, filter or {}, projection)
+        if sort:
+            cursor.sort(sort)
+        if limit:
+            cursor.limit(limit)
+        return cursor
+
+    def find_raw_batches(self, filter=None, projection=None, sort=None, limit=0, batch_size=None, **kwargs):
+        # Concatenated BSON per batch, like the driver's raw batch cursor
+        docs = self.find(filter, projection, sort, limit).to_list()
+        size = batch_size or 101
+        for start in range(0, len(docs), size):
+            yield b"".join(bson.encode(doc) for doc in docs[start:start + size])
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        results = self._select(filter or {}, _normalize_sort(sort) if sort else None, 0, 1, projection)
+        return results[0] if results else None
+
+    def count_documents(self, filter=None, **kwargs):
+        with self._lock:
+            return sum(1 for doc in self._docs.values() if matches(doc, filter or {}))
+
+    def estimated_document_count(self):
+        return len(self._docs)
+
+    def distinct(self, key, filter=None):
+        values = []
+        for doc in self._select(filter or {}):
+            value = _get_path(doc, key)
+            if value is _MISSING:
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                if item not in values:
+                    values.append(item)
+        return values
+
+    # -- writes --
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document))
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        inserted, errors = [], []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as exc:
+                    errors.append({"index": index, "code": 11000, "errmsg": str(exc), "op": document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        return self._update(filter, update, upsert, many=True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        return self._update(filter, replacement, upsert, many=False)
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            key = self._first_key(filter)
+            if key is None:
+                return DeleteResult(0)
+            self._remove(key)
+            return DeleteResult(1)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            keys = [key for key, doc in self._docs.items() if matches(doc, filter)]
+            for key in keys:
+                self._remove(key)
+            return DeleteResult(len(keys))
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            key = self._first_key(filter, _normalize_sort(sort) if sort else None)
+            if key is None:
+                if not upsert:
+                    return None
+                doc = _upsert_seed(filter)
+                doc.setdefault("_id", ObjectId())
+                _apply_update(doc, update, inserting=True)
+                self._insert(doc)
+                return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+            before = copy.deepcopy(self._docs[key])
+            after = copy.deepcopy(before)
+            _apply_update(after, update)
+            self._check_unique(after, ignore_key=key)
+            self._store(key, after)
+            return _project(after if return_document == ReturnDocument.AFTER else before, projection)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        result, errors = BulkWriteResult(), []
+        for index, request in enumerate(requests):
+            try:
+                op = type(request).__name__
+                doc = request._doc if hasattr(request, "_doc") else None
+                if op == "InsertOne":
+                    self.insert_one(doc)
+                    result.inserted_count += 1
+                    continue
+                query, update = request._filter, request._doc
+                upsert = getattr(request, "_upsert", False)
+                if op in ("UpdateOne", "ReplaceOne", "UpdateMany"):
+                    outcome = self._update(query, update, upsert, many=op == "UpdateMany")
+                    result.matched_count += outcome.matched_count
+                    result.modified_count += outcome.modified_count
+                    if outcome.upserted_id is not None:
+                        result.upserted_count += 1
+                        result.upserted_ids[index] = outcome.upserted_id
+                elif op in ("DeleteOne", "DeleteMany"):
+                    deleted = (self.delete_one if op == "DeleteOne" else self.delete_many)(query)
+                    result.deleted_count += deleted.deleted_count
+            except DuplicateKeyError as exc:
+                errors.append({"index": index, "code": 11000, "errmsg": str(exc)})
+                if ordered:
+                    break
+        if errors:
+            details = result.bulk_api_result
+            details["writeErrors"] = errors
+            raise BulkWriteError(details)
+        return result
+
+    def drop(self):
+        with self._lock:
+            self._docs.clear()
+            self._unique = []
+            self._indexes = {"_id_": [("_id", 1)]}
+
+
+class LocalDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        with self.client.lock:
+            if name not in self._collections:
+                self._collections[name] = LocalCollection(self, name)
+            return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def list_collection_names(self):
+        return [name for name, collection in self._collections.items() if collection._docs]
+
+    def command(self, command, *args, **kwargs):
+        if command == "ping" or command == {"ping": 1}:
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Command {command} is not supported by the local store")
+
+
+class LocalClient:
+    def __init__(self, *args, **kwargs):
+        self.lock = threading.RLock()
+        self._databases = {}
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self._databases:
+                self._databases[name] = LocalDatabase(self, name)
+            return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    @property
+    def admin(self):
+        return self["admin"]
+
+    def close(self):
+        pass
@@ -0,0 +1,96 @@
+# Memory footprint: frames shared by every session versus each session's own
+# state, for the Diagnostics page and the load test.
+#
+# Loaded collections and derived stat tables are held once per process
+# (database.load_collection / derived_frame); a session only keeps its widget
+# values and the few things pages put in st.session_state, so the per-session
+# rows should stay in the kilobytes however large the league gets.
+import sys
+
+import pandas as pd
+
+from database import shared_frames
+
+
+def rss_mb():
+    # Resident set size from /proc; falls back to the peak on other systems
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def frame_bytes(frame):
+    return int(frame.memory_usage(deep=True, index=True).sum())
+
+
+def _size(value, depth=0):
+    if isinstance(value, pd.DataFrame):
+        return frame_bytes(value)
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    size = sys.getsizeof(value)
+    if depth < 4:
+        if isinstance(value, dict):
+            size += sum(_size(k, depth + 1) + _size(v, depth + 1) for k, v in value.items())
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(_size(item, depth + 1) for item in value)
+    return size
+
+
+# ---- Shared ----
+def shared_report():
+    rows = []
+    for (kind, key), frame in sorted(shared_frames().items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        rows.append({
+            "kind": kind,
+            "name": key[0] if isinstance(key, tuple) else "games",
+            "version": str(key[1] if isinstance(key, tuple) else key),
+            "rows": len(frame),
+            "mb": round(frame_bytes(frame) / 1e6, 3),
+        })
+    return rows
+
+
+# ---- Per session ----
+def _active_sessions():
+    # Streamlit has no public list of sessions; fall back to the current one
+    try:
+        from streamlit.runtime import Runtime
+        return [(info.session.id, info.session.session_state) for info in Runtime.instance()._session_mgr.list_active_sessions()]
+    except Exception:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return [] if ctx is None else [(ctx.session_id, ctx.session_state)]
+
+
+def session_report():
+    rows = []
+    for session_id, state in _active_sessions():
+        try:
+            values = state.filtered_state
+        except Exception:
+            values = {key: state[key] for key in list(state)}
+        rows.append({
+            "session": session_id,
+            "keys": len(values),
+            "kb": round(sum(_size(key) + _size(value) for key, value in values.items()) / 1024, 1),
+        })
+    return rows
+
+
+def summary():
+    shared = shared_report()
+    sessions = session_report()
+    return {
+        "rss_mb": rss_mb(),
+        "shared_frames": len(shared),
+        "shared_mb": round(sum(row["mb"] for row in shared), 2),
+        "sessions": len(sessions),
+        "session_kb_total": round(sum(row["kb"] for row in sessions), 1),
+    }
@@ -0,0 +1,36 @@
+# One-off data migrations, run by hand after upgrading:
+#
+#   python migrate.py
+#
+# Page loads never rewrite stored data; anything older releases stored in a
+# different shape is brought up to date here instead. Every step is safe to
+# re-run and skips whatever is already migrated.
+import time
+
+import counters
+import data_version
+import game_journal
+import player_ids
+from database import ensure_indexes, get_db
+from game_state import migrate_ended_innings
+
+
+def main():
+    db = get_db()
+    ensure_indexes()
+    steps = [
+        ("per-game versions moved off the meta document", data_version.migrate_game_versions),
+        ("games renumbered off a duplicate id", counters.dedupe_game_ids),
+        ("games given a list of ended innings", migrate_ended_innings),
+        ("documents given player ids", player_ids.migrate),
+        ("interrupted renames finished", player_ids.finish_renames),
+        ("games given a journal", game_journal.import_legacy_games),
+    ]
+    for label, step in steps:
+        start = time.perf_counter()
+        changed = step(db)
+        print(f"{label}: {changed} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# MongoDB command monitoring.
+#
+# A PyMongo CommandListener registered on the app's client counts every
+# command sent to MongoDB: how many, the documents and bytes that came back,
+# and the server round-trip time. Commands are charged to the session and
+# page rerun that issued them (loader threads carry the page's script
+# context), and to the collection they read, so the Diagnostics page can show
+# which pages pull whole collections and whether caching actually cut Atlas
+# traffic. Commands slower than MONGO_SLOW_MS are logged and kept. Set
+# MONGO_MONITOR=0 to leave the listener off entirely.
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+
+import bson
+from pymongo import monitoring
+
+ENABLED = os.getenv("MONGO_MONITOR", "1") != "0"
+SLOW_MS = float(os.getenv("MONGO_SLOW_MS", "500"))
+RECENT_RERUNS = 200
+RECENT_SLOW = 100
+MAX_SESSIONS = 500
+# Decoded batches are sized from a sample of their documents; encoding a
+# whole 100k-document batch again would cost half as much as decoding it
+SIZE_SAMPLE = 20
+# Driver housekeeping, not app queries
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions", "saslStart", "saslContinue"}
+
+logger = logging.getLogger("wiffle.mongo")
+
+_lock = threading.Lock()
+_pending = {}
+_open = {}
+_reruns = deque(maxlen=RECENT_RERUNS)
+_slow = deque(maxlen=RECENT_SLOW)
+_sessions = OrderedDict()
+_pages = defaultdict(lambda: _counts(reruns=0))
+_collections = defaultdict(lambda: _counts())
+_page_collections = defaultdict(int)
+
+
+def _counts(**extra):
+    return dict(commands=0, documents=0, bytes=0, server_ms=0.0, **extra)
+
+
+def _add(counts, documents, size, server_ms):
+    counts["commands"] += 1
+    counts["documents"] += documents
+    counts["bytes"] += size
+    counts["server_ms"] += server_ms
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx is not None else None
+
+
+# ---- Rerun boundaries ----
+def start_rerun(page):
+    # Called through timing.start_rerun, so every page marks its reruns once
+    session = _session_id()
+    with _lock:
+        _open[session] = dict(page=page, session=session, at=time.time(), **_counts(), collections=defaultdict(int))
+
+
+def end_rerun():
+    session = _session_id()
+    with _lock:
+        rerun = _open.pop(session, None)
+        if rerun is None:
+            return
+        collections = rerun.pop("collections")
+        for name, documents in collections.items():
+            _page_collections[(rerun["page"], name)] += documents
+        rerun["server_ms"] = round(rerun["server_ms"], 2)
+        rerun["collections"] = ", ".join(f"{name} ({documents})" for name, documents in collections.items())
+        _reruns.append(rerun)
+        page = _pages[rerun["page"]]
+        page["reruns"] += 1
+        for key in ("commands", "documents", "bytes", "server_ms"):
+            page[key] += rerun[key]
+
+
+# ---- Reply sizes ----
+def _stream_length(data):
+    # Documents in a stream of concatenated BSON documents (raw batches)
+    count = offset = 0
+    while offset + 4 <= len(data):
+        offset += int.from_bytes(data[offset:offset + 4], "little")
+        count += 1
+    return count
+
+
+def _batch(reply):
+    cursor = reply.get("cursor") if hasattr(reply, "get") else None
+    if not cursor:
+        return None
+    for key in ("firstBatch", "nextBatch"):
+        if key in cursor:
+            return cursor[key]
+    return None
+
+
+def _reply_size(reply):
+    # (documents, bytes) returned by one command
+    raw = getattr(reply, "raw", None)
+    batch = _batch(reply)
+    if batch is None:
+        # Writes, distinct and the like: small replies, no documents
+        return 0, len(raw) if raw is not None else len(bson.encode(reply))
+    if len(batch) == 1 and isinstance(batch[0], (bytes, memoryview)):
+        # find_raw_batches (the columnar path): one buffer holding the batch
+        return _stream_length(batch[0]), len(batch[0])
+    if raw is not None:
+        return len(batch), len(raw)
+    documents = len(batch)
+    if not documents:
+        return 0, 0
+    step = max(1, documents // SIZE_SAMPLE)
+    sample = [bson.encode(document) for document in batch[::step][:SIZE_SAMPLE]]
+    return documents, round(sum(len(encoded) for encoded in sample) / len(sample) * documents)
+
+
+def _describe(event):
+    # Command name, collection and a short filter for the slow log
+    command = event.command
+    # getMore names its collection in a separate field
+    collection = command.get(event.command_name)
+    if not isinstance(collection, str):
+        collection = command.get("collection", "")
+    detail = command.get("filter", command.get("pipeline", command.get("query", "")))
+    detail = str(detail)
+    return collection, detail if len(detail) <= 200 else detail[:197] + "..."
+
+
+# ---- Listener ----
+class CommandMonitor(monitoring.CommandListener):
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection, detail = _describe(event)
+        with _lock:
+            _pending[(event.request_id, event.connection_id)] = (_session_id(), collection, detail)
+
+    def succeeded(self, event):
+        self._finish(event, _reply_size(event.reply))
+
+    def failed(self, event):
+        self._finish(event, (0, 0), error=str(event.failure.get("errmsg", event.failure)))
+
+    def _finish(self, event, size, error=None):
+        with _lock:
+            started = _pending.pop((event.request_id, event.connection_id), None)
+        if started is None:
+            return
+        session, collection, detail = started
+        documents, size = size
+        server_ms = event.duration_micros / 1000
+        with _lock:
+            _add(_collections[collection], documents, size, server_ms)
+            if session not in _sessions:
+                _sessions[session] = _counts(first_seen=time.time())
+                if len(_sessions) > MAX_SESSIONS:
+                    _sessions.popitem(last=False)
+            _add(_sessions[session], documents, size, server_ms)
+            rerun = _open.get(session)
+            if rerun is not None:
+                _add(rerun, documents, size, server_ms)
+                rerun["collections"][collection] += documents
+            if server_ms >= SLOW_MS:
+                _slow.append({
+                    "at": time.time(),
+                    "page": rerun["page"] if rerun else None,
+                    "command": event.command_name,
+                    "collection": collection,
+                    "filter": detail,
+                    "documents": documents,
+                    "bytes": size,
+                    "server_ms": round(server_ms, 2),
+                    "error": error,
+                })
+        if server_ms >= SLOW_MS:
+            logger.warning("slow %s on %s: %.0f ms, %d documents, %d bytes (%s)",
+                           event.command_name, collection, server_ms, documents, size, detail)
+
+
+_monitor = CommandMonitor()
+
+
+def listeners():
+    # For MongoClient(event_listeners=...)
+    return [_monitor] if ENABLED else []
+
+
+# ---- Reports ----
+def _rounded(counts):
+    return {key: round(value, 2) if isinstance(value, float) else value for key, value in counts.items()}
+
+
+def page_summary():
+    # Average traffic per rerun of each page
+    with _lock:
+        pages = {page: dict(counts) for page, counts in _pages.items()}
+        by_collection = dict(_page_collections)
+    rows = []
+    for page, counts in sorted(pages.items()):
+        reruns = counts["reruns"] or 1
+        rows.append({
+            "page": page,
+            "reruns": counts["reruns"],
+            "commands_per_rerun": round(counts["commands"] / reruns, 2),
+            "documents_per_rerun": round(counts["documents"] / reruns, 1),
+            "mb_per_rerun": round(counts["bytes"] / reruns / 1e6, 3),
+            "server_ms_per_rerun": round(counts["server_ms"] / reruns, 2),
+            "total_mb": round(counts["bytes"] / 1e6, 2),
+            # Which collections the documents came from, per rerun
+            "documents_by_collection": ", ".join(
+                f"{name} {documents / reruns:.0f}"
+                for (row_page, name), documents in sorted(by_collection.items()) if row_page == page
+            ),
+        })
+    return rows
+
+
+def collection_summary():
+    with _lock:
+        return [_rounded(dict(collection=name, **counts)) for name, counts in sorted(_collections.items())]
+
+
+def session_summary():
+    with _lock:
+        return [_rounded(dict(session=session or "background", **counts)) for session, counts in _sessions.items()]
+
+
+def recent_reruns(limit=50):
+    with _lock:
+        return list(_reruns)[-limit:]
+
+
+def slow_commands(limit=50):
+    with _lock:
+        return list(_slow)[-limit:]
+
+
+def reset():
+    with _lock:
+        _reruns.clear()
+        _slow.clear()
+        _sessions.clear()
+        _pages.clear()
+        _collections.clear()
+        _page_collections.clear()
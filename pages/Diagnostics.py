@@ -0,0 +1,139 @@
+import streamlit as st
+import pandas as pd
+import os
+
+from pymongo import MongoClient
+
+import memory_report
+import mongo_monitor
+import timing
+from database import get_client, get_db
+from warmup import start_warmup, warmup_report, import_time_report
+
+timing.start_rerun("Diagnostics")
+
+# Connect to MongoDB Atlas
+db = get_db()
+start_warmup()
+
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
+
+
+# Page config
+st.set_page_config(page_title="Diagnostics")
+st.title("Diagnostics")
+
+password_input = st.text_input("Enter admin password to view diagnostics", type="password")
+if not ADMIN_PASSWORD or password_input != ADMIN_PASSWORD:
+    st.info("Diagnostics are only available to admins.")
+    timing.end_rerun()
+    st.stop()
+timing.phase("render")
+
+
+# ---- Page timings ----
+st.header("Page Timings")
+st.caption("Time per rerun spent in each phase, per page. Percentiles cover the most recent reruns.")
+timing_on = st.checkbox("Record page timings", value=timing.is_enabled())
+if timing_on != timing.is_enabled():
+    timing.set_enabled(timing_on)
+
+timing_rows = timing.summary()
+if not timing_rows:
+    st.info("No reruns recorded yet. Visit some pages, then come back.")
+else:
+    timing_df = pd.DataFrame(timing_rows)
+    timing_pages = sorted(timing_df["page"].unique())
+    timing_page = st.selectbox("Page", ["All pages"] + timing_pages)
+    if timing_page != "All pages":
+        timing_df = timing_df[timing_df["page"] == timing_page]
+    st.dataframe(timing_df, hide_index=True, use_container_width=True)
+
+    with st.expander("Recent reruns"):
+        st.dataframe(pd.DataFrame(timing.recent_reruns()).iloc[::-1], hide_index=True, use_container_width=True)
+
+    json_col, csv_col, reset_col = st.columns(3)
+    json_col.download_button("Export JSON", timing.export_json(), file_name="page_timings.json", mime="application/json")
+    csv_col.download_button("Export CSV", timing.export_csv(), file_name="page_timings.csv", mime="text/csv")
+    if reset_col.button("Reset Timings"):
+        timing.reset()
+        st.success("Page timings cleared.")
+
+
+# ---- Database traffic ----
+st.header("Database Traffic")
+st.caption(
+    "MongoDB commands per rerun: documents and bytes returned and server round-trip time. "
+    f"Commands slower than {mongo_monitor.SLOW_MS:g} ms are listed below."
+)
+if not isinstance(get_client(), MongoClient):
+    st.info("The in-memory store sends no MongoDB commands, so there is nothing to count.")
+elif not mongo_monitor.ENABLED:
+    st.info("Command monitoring is off (MONGO_MONITOR=0).")
+else:
+    traffic_rows = mongo_monitor.page_summary()
+    if not traffic_rows:
+        st.info("No reruns recorded yet. Visit some pages, then come back.")
+    else:
+        st.dataframe(pd.DataFrame(traffic_rows), hide_index=True, use_container_width=True)
+
+    with st.expander("By collection"):
+        st.dataframe(pd.DataFrame(mongo_monitor.collection_summary()), hide_index=True, use_container_width=True)
+    with st.expander("By session"):
+        st.dataframe(pd.DataFrame(mongo_monitor.session_summary()), hide_index=True, use_container_width=True)
+    with st.expander("Recent reruns"):
+        st.dataframe(pd.DataFrame(mongo_monitor.recent_reruns()).iloc[::-1], hide_index=True, use_container_width=True)
+
+    slow_rows = mongo_monitor.slow_commands()
+    st.subheader("Slow Commands")
+    if slow_rows:
+        st.dataframe(pd.DataFrame(slow_rows).iloc[::-1], hide_index=True, use_container_width=True)
+    else:
+        st.write("None so far.")
+    if st.button("Reset Traffic Counts"):
+        mongo_monitor.reset()
+        st.success("Database traffic counts cleared.")
+
+
+# ---- Memory ----
+st.header("Memory")
+st.caption("Loaded and derived frames are held once and shared by every session; sessions keep only their own state.")
+memory = memory_report.summary()
+rss_col, shared_col, sessions_col = st.columns(3)
+rss_col.metric("Process", f"{memory['rss_mb']:.0f} MB")
+shared_col.metric("Shared frames", f"{memory['shared_mb']:.1f} MB", f"{memory['shared_frames']} frames", delta_color="off")
+sessions_col.metric("Session state", f"{memory['session_kb_total']:.0f} KB", f"{memory['sessions']} sessions", delta_color="off")
+with st.expander("Shared frames"):
+    st.dataframe(pd.DataFrame(memory_report.shared_report()), hide_index=True, use_container_width=True)
+with st.expander("Per session"):
+    st.dataframe(pd.DataFrame(memory_report.session_report()), hide_index=True, use_container_width=True)
+
+
+# ---- Startup warm-up ----
+st.header("Startup Warm-up")
+report = warmup_report()
+if report["started_at"] is None:
+    st.info("Warm-up has not started yet.")
+else:
+    if report["finished_at"] is None:
+        st.info("Warm-up is still running.")
+    else:
+        st.write(f"Finished in `{report['finished_at'] - report['started_at']:.2f}s`")
+    st.dataframe(pd.DataFrame(report["steps"]), hide_index=True, use_container_width=True)
+
+
+# ---- Import times ----
+st.header("Import Times")
+st.caption("Measured with `python -X importtime` in a fresh interpreter.")
+if st.button("Measure Import Times"):
+    with st.spinner("Importing in a fresh interpreter..."):
+        st.session_state.import_report = import_time_report()
+
+if "import_report" in st.session_state:
+    import_rows = pd.DataFrame(st.session_state.import_report)
+    show_nested = st.checkbox("Include nested imports")
+    if not show_nested:
+        import_rows = import_rows[import_rows["depth"] == 0]
+    st.dataframe(import_rows, hide_index=True, use_container_width=True)
+
+timing.end_rerun()
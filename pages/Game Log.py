@@ -2,16 +2,19 @@ import streamlit as st
 import pandas as pd
 import os
 
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import timing
+from database import enable_copy_on_write, get_db, load_frames
+from ratings import rating_column
+from stats import player_records, scoring_plays
+from warmup import start_warmup
+from win_probability import current_curve
 
-# Load MongoDB URI from .env or environment variables
-load_dotenv()
-MONGO_URI = os.getenv('MONGO_URI')  
+timing.start_rerun("Game Log")
+enable_copy_on_write()
 
 # Connect to MongoDB Atlas
-client = MongoClient(MONGO_URI)
-db = client['blitzballstats'] 
+db = get_db()
+start_warmup()
 
 
 
@@ -20,15 +23,16 @@ st.set_page_config(page_title="Game Log")
 
 
 # MongoDB collections
-players = pd.DataFrame(list(db.players.find()))
-atbats = pd.DataFrame(list(db.atbats.find()))
-games = pd.DataFrame(list(db.games.find()))
+timing.phase("fetch")
+players, atbats, games = load_frames("players", "atbats", "games")
 
 
 # Convert date column to datetime format for filtering
+timing.phase("frame")
 games["date"] = pd.to_datetime(games["date"], errors="coerce")
 
 
+timing.phase("render")
 st.title("Match History Log")
 
 
@@ -41,6 +45,8 @@ games = games[games["date"].dt.year == selected_year]
 
 # Show the most recent games first
 games = games.iloc[::-1].reset_index(drop=True)
+# Each game's at-bat positions, found in one pass instead of a scan per game
+atbat_rows = atbats.groupby("game_id", sort=False).indices if not atbats.empty else {}
 
 for i, row in games.iterrows():
     match_title = f"Match {len(games) - i}:"
@@ -94,53 +100,32 @@ for i, row in games.iterrows():
         st.markdown(f"**Winner**: {winner}")
             # Show scoring plays
                 # Show scoring plays
+        game_id = row.get("game_id")
         with st.expander("📈 Scoring Plays"):
-            game_id = row.get("game_id")
-            if game_id is not None and game_id in atbats["game_id"].values:
-                scoring_plays = atbats[(atbats["game_id"] == game_id) & (atbats["rbi"] > 0)].copy()
-
-                if not scoring_plays.empty:
-                    play_rows = []
-
-                    # Convert team player strings to lists
-                    team1_players = [p.strip() for p in str(row["team1_players"]).split(",")]
-                    team2_players = [p.strip() for p in str(row["team2_players"]).split(",")]
-
-                    # Initialize running score
-                    team1_score = 0
-                    team2_score = 0
-
-                    for _, play in scoring_plays.iterrows():
-                        inning_label = play["inning"] if pd.notna(play["inning"]) else "?"
-                        batter = play["batter"]
-                        outcome = play["outcome"]
-                        rbi = int(play.get("rbi", 0))
-
-                        
-                        
-
-                        # Determine team scoring
-                        if batter in team1_players:
-                            team1_score += rbi
-                        elif batter in team2_players:
-                            team2_score += rbi
-
-                        # Create full event description
-                        description = f"**{batter}** — {outcome}"
-
-                        play_rows.append({
-                            "Inning": inning_label,
-                            "Event": description,
-                            "Score": f"{team1_score}-{team2_score}"
-                        })
-
-                    scoring_df = pd.DataFrame(play_rows)
+            if game_id is not None and game_id in atbat_rows:
+                timing.phase("compute")
+                scoring_df = scoring_plays(atbats.iloc[atbat_rows[game_id]], row)
+                timing.phase("render")
+
+                if not scoring_df.empty:
                     st.dataframe(scoring_df, hide_index=True, use_container_width=True)
                 else:
                     st.markdown("No scoring plays recorded for this game.")
             else:
                 st.warning("No valid game ID found or no scoring plays available.")
 
+        # Expanders run their contents even when closed, so the curve is
+        # only built for games whose toggle is on
+        if st.toggle("📉 Win Probability", key=f"win_probability_{game_id}"):
+            if game_id not in atbat_rows:
+                st.markdown("No at-bats recorded for this game.")
+            else:
+                timing.phase("compute")
+                curve = current_curve(db, game_id)
+                timing.phase("render")
+                st.line_chart(curve, x="At-Bat", y="Team 1 Win %")
+                st.dataframe(curve, hide_index=True, use_container_width=True)
+
 
 
 
@@ -148,61 +133,12 @@ for i, row in games.iterrows():
 st.markdown("---")
 st.markdown(f"## Player W/L Records — {selected_year}")
 
-results = {}
-
-for _, row in games.iterrows():
-    try:
-        team1_score = int(float(row.get("team1_score", 0)))
-        team2_score = int(float(row.get("team2_score", 0)))
-    except ValueError:
-        continue
-
-    team1_players = [p.strip() for p in str(row["team1_players"]).split(",")]
-    team2_players = [p.strip() for p in str(row["team2_players"]).split(",")]
-
-    if team1_score > team2_score:
-        winners, losers = team1_players, team2_players
-
-        for p in winners:
-            if p not in results:
-                results[p] = {"Wins": 0, "Losses": 0, "Draws": 0}
-            results[p]["Wins"] += 1
-
-        for p in losers:
-            if p not in results:
-                results[p] = {"Wins": 0, "Losses": 0, "Draws": 0}
-            results[p]["Losses"] += 1
-
-    elif team2_score > team1_score:
-        winners, losers = team2_players, team1_players
-
-        for p in winners:
-            if p not in results:
-                results[p] = {"Wins": 0, "Losses": 0, "Draws": 0}
-            results[p]["Wins"] += 1
-
-        for p in losers:
-            if p not in results:
-                results[p] = {"Wins": 0, "Losses": 0, "Draws": 0}
-            results[p]["Losses"] += 1
-
-    else:
-        draw_players = team1_players + team2_players
-        for p in draw_players:
-            if p not in results:
-                results[p] = {"Wins": 0, "Losses": 0, "Draws": 0}
-            results[p]["Draws"] += 1
-
-# Convert to DataFrame
-data = []
-for player, record in results.items():
-    wins = record["Wins"]
-    losses = record["Losses"]
-    draws = record["Draws"]
-    games_played = wins + losses
-    win_pct = round(wins / games_played, 2) if games_played else 0.0
-    data.append([player, wins, losses, draws, games_played, win_pct])
-
-standings_df = pd.DataFrame(data, columns=["Player", "Wins", "Draws", "Losses", "Games Played", "Win %"])
-standings_df = standings_df.sort_values(by=["Wins", "Win %"], ascending=[False, False]).reset_index(drop=True)
+timing.phase("compute")
+standings_df = player_records(games)
+if not standings_df.empty:
+    # Current (all-time) rating beside the season's record
+    standings_df = standings_df.merge(rating_column(players), on="Player", how="left")
+timing.phase("render")
 st.dataframe(standings_df, use_container_width=True)
+
+timing.end_rerun()
@@ -1,22 +1,23 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import os
 import urllib.parse
 from urllib.parse import urlparse, parse_qs
 from urllib.parse import unquote
 from urllib.parse import quote
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import timing
+from database import current_versions, derived_frame, enable_copy_on_write, get_db, load_frames
+from ratings import rating_column
+from run_expectancy import NO_SEASON, expectancy_table, matrix, play_states, re24_leaderboard
+from stats import standings_leaderboard
+from warmup import start_warmup
 
-
-# Load MongoDB URI from .env or environment variables
-load_dotenv()
-MONGO_URI = os.getenv('MONGO_URI')  
+timing.start_rerun("Standings")
+enable_copy_on_write()
 
 # Connect to MongoDB Atlas
-client = MongoClient(MONGO_URI)
-db = client['blitzballstats'] 
+db = get_db()
+start_warmup()
 
 
 # Page config
@@ -27,85 +28,56 @@ players_col = db["players"]
 atbats_col = db["atbats"]
 games_col = db["games"]
 
-players = pd.DataFrame(list(players_col.find()))
-atbats = pd.DataFrame(list(atbats_col.find()))
-games = pd.DataFrame(list(games_col.find()))
+timing.phase("fetch")
+players, atbats, games = load_frames("players", "atbats", "games")
+timing.phase("render")
 
 st.title("League Standings")
 
 # Choose stat type
-stat_type = st.radio("Select Stat Type", ["Hitting", "Pitching"])
+stat_type = st.radio("Select Stat Type", ["Hitting", "Pitching", "Overall"])
 
 # Stat options
-hitting_stats = ["AVG", "OBP", "HR", "1B", "2B", "3B", "RBIs", "BB", "K%"]
-pitching_stats = ["ERA", "WHIP", "Hits Allowed", "HR Allowed", "K%"]
+hitting_stats = ["AVG", "OBP", "HR", "1B", "2B", "3B", "RBIs", "BB", "K%", "RE24"]
+pitching_stats = ["ERA", "WHIP", "Hits Allowed", "HR Allowed", "K%", "RE24"]
+overall_stats = ["Rating"]
 
 category = st.selectbox(
     f"Select {stat_type} Stat",
-    hitting_stats if stat_type == "Hitting" else pitching_stats
+    {"Hitting": hitting_stats, "Pitching": pitching_stats, "Overall": overall_stats}[stat_type]
 )
 
 # Process stats for each player
-leaderboard = []
-
-for player in players["name"].unique():
-    player_batting = atbats[atbats["batter"] == player]
-    player_pitching = atbats[atbats["pitcher"] == player]
-
-    # Hitting stats
-    num_at_bats = len(player_batting)
-    hits = player_batting["outcome"].isin(["Single", "Double", "Triple", "Home Run"]).sum()
-    walks = player_batting["outcome"].eq("Walk").sum()
-    strikeouts = player_batting["outcome"].eq("Strike Out").sum()
-    singles = player_batting["outcome"].eq("Single").sum()
-    doubles = player_batting["outcome"].eq("Double").sum()
-    triples = player_batting["outcome"].eq("Triple").sum()
-    home_runs = player_batting["outcome"].eq("Home Run").sum()
-    rbis = player_batting["rbi"].sum()
-
-    batting_average = hits / num_at_bats if num_at_bats else 0
-    obp = (hits + walks) / (num_at_bats + walks) if (num_at_bats + walks) else 0
-    k_rate_bat = (strikeouts / num_at_bats * 100) if num_at_bats else 0
-
-    # Pitching stats
-    total_outs = player_pitching["outs_recorded"].sum()
-    innings_pitched = total_outs / 3
-    hits_allowed = player_pitching["outcome"].isin(["Single", "Double", "Triple", "Home Run"]).sum()
-    walks_allowed = player_pitching["outcome"].eq("Walk").sum()
-    strikeouts_pitched = player_pitching["outcome"].eq("Strike Out").sum()
-    home_runs_allowed = player_pitching["outcome"].eq("Home Run").sum()
-    batters_faced = len(player_pitching)
-    earned_runs = player_pitching["rbi"].sum()
-
-    era = (earned_runs / innings_pitched * 9) if innings_pitched else np.nan
-    whip = (walks_allowed + hits_allowed) / innings_pitched if innings_pitched else np.nan
-    k_rate_pit = (strikeouts_pitched / batters_faced * 100) if batters_faced else np.nan
-
-    row = {
-        "Player": player,
-        "AVG": round(batting_average, 3),
-        "OBP": round(obp, 3),
-        "HR": home_runs,
-        "1B": singles,
-        "2B": doubles,
-        "3B": triples,
-        "RBIs": rbis,
-        "BB": walks,
-        "K%": round(k_rate_bat, 2),
-        "ERA": round(era, 2) if not np.isnan(era) else None,
-        "WHIP": round(whip, 2) if not np.isnan(whip) else None,
-        "Hits Allowed": hits_allowed,
-        "HR Allowed": home_runs_allowed,
-        "K%_P": round(k_rate_pit, 2) if not np.isnan(k_rate_pit) else None,
-    }
-
-    leaderboard.append(row)
-df = pd.DataFrame(leaderboard)
+timing.phase("compute")
+versions = current_versions()
+df = derived_frame("standings", standings_leaderboard, ("players", "atbats"), versions=versions)
+
+# Run expectancy by runners/outs state per season, and RE24 from it
+re_table = None
+if not atbats.empty:
+    re_table = derived_frame(
+        "run_expectancy", lambda atbats, games: expectancy_table(play_states(atbats, games)), ("atbats", "games"),
+        versions=versions
+    )
+    # Same versions, so the table matches the at-bats it is applied to
+    re_board = derived_frame(
+        "re24", lambda atbats, games: re24_leaderboard(atbats, games, re_table), ("atbats", "games"),
+        versions=versions
+    )
+    if not df.empty:
+        df = df.merge(re_board[["Player", "RE24", "RE24_P"]], on="Player", how="left")
+
+# Ratings are stored on the player documents (see ratings.py)
+if not df.empty:
+    df = df.merge(rating_column(players)[["Player", "Rating"]], on="Player", how="left")
 
 # Determine sorting column and order
 if stat_type == "Pitching" and category == "K%":
     sort_col = "K%_P"
     ascending = False  # Higher pitching K% is better
+elif stat_type == "Pitching" and category == "RE24":
+    sort_col = "RE24_P"
+    ascending = False  # Runs saved
 elif stat_type == "Hitting" and category == "K%":
     sort_col = "K%"
     ascending = True  # Lower hitting K% is better
@@ -136,8 +108,10 @@ def get_card_style(value, bg_color=None):
 if df.empty or sort_col not in df.columns:
     st.warning("No data available for the selected stat yet. Play some games to see the standings!")
 else:
+    timing.phase("frame")
     sorted_df = df[["Player", sort_col]].dropna().sort_values(by=sort_col, ascending=ascending).reset_index(drop=True)
 
+    timing.phase("render")
     st.subheader(f"{category} Leaderboard")
 
     # Loop and display leaderboard in 3 columns: Rank, Name, Stat
@@ -156,4 +130,15 @@ else:
         with col2:
             st.markdown(get_card_style(row["Player"], bg), unsafe_allow_html=True)
         with col3:
-            st.markdown(get_card_style(row[sort_col], bg), unsafe_allow_html=True)
\ No newline at end of file
+            st.markdown(get_card_style(row[sort_col], bg), unsafe_allow_html=True)
+
+# Run expectancy matrix behind RE24
+if re_table is not None:
+    with st.expander("Run Expectancy Matrix"):
+        seasons = sorted((season for season in re_table["season"].unique() if season != NO_SEASON), reverse=True)
+        season = st.selectbox("Season", ["All Seasons"] + seasons)
+        grid = matrix(re_table, NO_SEASON if season == "All Seasons" else season)
+        st.caption("Average runs scored from each runners/outs state to the end of the half-inning")
+        st.dataframe(grid)
+
+timing.end_rerun()
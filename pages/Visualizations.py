@@ -5,16 +5,17 @@ import plotly.express as px
 import plotly.graph_objects as go 
 
 
-from pymongo import MongoClient
-from dotenv import load_dotenv
+import timing
+from database import derived_frame, enable_copy_on_write, get_db, load_frames
+from stats import calculate_all_player_stats, calculate_pitcher_stats
+from warmup import start_warmup
 
-# Load MongoDB URI from .env or environment variables
-load_dotenv()
-MONGO_URI = os.getenv('MONGO_URI')  
+timing.start_rerun("Visualizations")
+enable_copy_on_write()
 
 # Connect to MongoDB Atlas
-client = MongoClient(MONGO_URI)
-db = client['blitzballstats'] 
+db = get_db()
+start_warmup()
 
 # Page config
 st.set_page_config(page_title="Visualizations")
@@ -24,10 +25,10 @@ players_col = db["players"]
 atbats_col = db["atbats"]
 games_col = db["games"]
 
-players = pd.DataFrame(list(players_col.find()))
-atbats = pd.DataFrame(list(atbats_col.find()))
-games = pd.DataFrame(list(games_col.find()))
+timing.phase("fetch")
+players, atbats, games = load_frames("players", "atbats", "games")
 
+timing.phase("render")
 st.title("Player Visualizations")
 
 #--- Function for Preventing Key Errors with No Games Played Yet ---#
@@ -35,128 +36,112 @@ def column_has_data(df, column):
     return column in df.columns and not df[column].dropna().empty
 
 
-# ==== HITTING STATS FUNCTION ====
-def calculate_all_player_stats(atbats):
-    player_stats = {}
-
-    for player in pd.unique(atbats['batter'].dropna()):
-        player_df = atbats[atbats['batter'] == player]
-        ab = len(player_df)
-        hits = player_df["outcome"].isin(["Single", "Double", "Triple", "Home Run"]).sum()
-        walks = player_df["outcome"].eq("Walk").sum()
-        singles = player_df["outcome"].eq("Single").sum()
-        doubles = player_df["outcome"].eq("Double").sum()
-        triples = player_df["outcome"].eq("Triple").sum()
-        home_runs = player_df["outcome"].eq("Home Run").sum()
-        strikeouts = player_df["outcome"].eq("Strike Out").sum()
-        rbis = player_df["rbi"].sum()
-        avg = hits / ab if ab else 0
-        obp = (hits + walks) / (ab + walks) if (ab + walks) else 0
-        slg = (singles + 2*doubles + 3*triples + 4*home_runs) / ab if ab else 0
-
-        player_stats[player] = {
-            "name": player,
-            "AB": ab,
-            "H": hits,
-            "BB": walks,
-            "1B": singles,
-            "2B": doubles,
-            "3B": triples,
-            "HR": home_runs,
-            "K": strikeouts,
-            "RBI": rbis,
-            "AVG": round(avg, 3),
-            "OBP": round(obp, 3),
-            "SLG": round(slg, 3)
-        }
-
-    return pd.DataFrame(player_stats).T.reset_index(drop=True)
-
-# ==== PITCHING STATS FUNCTION ====
-def calculate_pitcher_stats(atbats):
-    pitcher_stats = {}
-
-    for pitcher in pd.unique(atbats['pitcher'].dropna()):
-        pitcher_df = atbats[atbats["pitcher"] == pitcher]
-        outs = pitcher_df["outs_recorded"].sum()
-        ip = outs / 3
-        walks = pitcher_df["outcome"].eq("Walk").sum()
-        hits = pitcher_df["outcome"].isin(["Single", "Double", "Triple", "Home Run"]).sum()
-        hr = pitcher_df["outcome"].eq("Home Run").sum()
-        k = pitcher_df["outcome"].eq("Strike Out").sum()
-        er = pitcher_df["rbi"].sum()
-
-        era = (er / ip * 9) if ip else 0
-        whip = (walks + hits) / ip if ip else 0
-        k9 = (k * 9) / ip if ip else 0
-
-        pitcher_stats[pitcher] = {
-            "name": pitcher,
-            "IP": ip,
-            "H": hits,
-            "HR": hr,
-            "BB": walks,
-            "K": k,
-            "ER": er,
-            "ERA": round(era, 2),
-            "WHIP": round(whip, 2),
-            "K/9": round(k9, 2)
-        }
-
-    return pd.DataFrame(pitcher_stats).T.reset_index(drop=True)
-
 # Calculate stats
-hitters = calculate_all_player_stats(atbats)
-pitchers = calculate_pitcher_stats(atbats)
+timing.phase("compute")
+hitters = derived_frame("hitters", calculate_all_player_stats, ("atbats",))
+pitchers = derived_frame("pitchers", calculate_pitcher_stats, ("atbats",))
 qualified_pitchers = pitchers[pitchers["IP"] >= 1]
 
 
+# ---- Large-Data Mode ----
+# Above this many points the quadrant scatters switch to WebGL traces with
+# hover labels and a continuous colour scale instead of one SVG trace per name
+LARGE_DATA_POINTS = int(os.getenv("VIZ_LARGE_DATA_POINTS", "40"))
+
+timing.phase("render")
+st.sidebar.header("Chart Settings")
+large_data_setting = st.sidebar.radio("Large-data mode", ["Auto", "On", "Off"], horizontal=True)
+min_qualified_ab = st.sidebar.number_input("Minimum AB to qualify (large-data mode)", min_value=0, value=0, step=1)
+min_qualified_ip = st.sidebar.number_input("Minimum IP to qualify (large-data mode)", min_value=0.0, value=1.0, step=1.0)
+
+
+def use_large_data_mode(num_points):
+    if large_data_setting == "On":
+        return True
+    if large_data_setting == "Off":
+        return False
+    return num_points > LARGE_DATA_POINTS
+
+
+def qualify(df, column, minimum):
+    return df[pd.to_numeric(df[column], errors="coerce") >= minimum]
+
+
+def large_data_scatter(df, x, y, size, title, color_scale):
+    # Colour by the y-axis metric so the whole league is a single WebGL trace.
+    # Object columns (the pitcher table is built transposed) would make Plotly
+    # treat the colour as discrete and draw one trace per value.
+    df = df.assign(**{column: pd.to_numeric(df[column], errors="coerce") for column in (x, y, size)})
+    return px.scatter(
+        df,
+        x=x, y=y,
+        size=size,
+        color=y,
+        hover_name="name",
+        hover_data={size: True},
+        color_continuous_scale=color_scale,
+        render_mode="webgl",
+        title=title
+    )
+
+
 
 
 # ---- RBI Leaders -----
 st.subheader("RBI Leaders:")
+timing.phase("figure")
 fig_rbi_horizontal = px.bar(
     hitters.sort_values("RBI", ascending=True),  # Ascending so highest is on top
     x="RBI", y="name", color="RBI", orientation='h',
     title="Hitter Performance: RBI(Runs Batted In)"
 )
 fig_rbi_horizontal.update_layout(yaxis={'categoryorder': 'total ascending'})  
+timing.phase("render")
 st.plotly_chart(fig_rbi_horizontal)
 
 
 
 # ----Walks vs Strikeouts-----
 
+timing.phase("frame")
 hitters["AB"] = pd.to_numeric(hitters["AB"], errors="coerce")
 hitters["BB"] = pd.to_numeric(hitters["BB"], errors="coerce")
 hitters["K"] = pd.to_numeric(hitters["K"], errors="coerce")
 
-avg_bb = hitters["BB"].mean()
-avg_k = hitters["K"].mean()
+bb_k_large = use_large_data_mode(len(hitters))
+bb_k_hitters = qualify(hitters, "AB", min_qualified_ab) if bb_k_large else hitters
 
+avg_bb = bb_k_hitters["BB"].mean()
+avg_k = bb_k_hitters["K"].mean()
+
+timing.phase("render")
 st.subheader("Strikeouts vs Walks:")
 
-fig_bb_k = px.scatter(
-    hitters,
-    x="BB",  # Walks
-    y="K",  # Strikeouts
-    text="name",  # Player name on hover
-    size="AB",  # Optional: size by at-bats
-    color="name",  # Optional: color by batting average
-    color_continuous_scale="Plasma",
-    title="Hitter Performance: K vs BB"
-)
+timing.phase("figure")
+if bb_k_large:
+    fig_bb_k = large_data_scatter(bb_k_hitters, "BB", "K", "AB", "Hitter Performance: K vs BB", "Plasma")
+else:
+    fig_bb_k = px.scatter(
+        bb_k_hitters,
+        x="BB",  # Walks
+        y="K",  # Strikeouts
+        text="name",  # Player name on hover
+        size="AB",  # Optional: size by at-bats
+        color="name",  # Optional: color by batting average
+        color_continuous_scale="Plasma",
+        title="Hitter Performance: K vs BB"
+    )
 
 # Add quadrant lines
 fig_bb_k.add_shape(
     type="line",
     x0=avg_bb, x1=avg_bb,
-    y0=hitters["K"].min(), y1=hitters["K"].max(),
+    y0=bb_k_hitters["K"].min(), y1=bb_k_hitters["K"].max(),
     line=dict(dash="dash", color="gray")
 )
 fig_bb_k.add_shape(
     type="line",
-    x0=hitters["BB"].min(), x1=hitters["BB"].max(),
+    x0=bb_k_hitters["BB"].min(), x1=bb_k_hitters["BB"].max(),
     y0=avg_k, y1=avg_k,
     line=dict(dash="dash", color="gray")
 )
@@ -164,32 +149,32 @@ fig_bb_k.add_shape(
 # Shaded rectangles for each quadrant
 fig_bb_k.add_shape(
     type="rect",
-    x0=hitters["BB"].min(), x1=avg_bb,
-    y0=avg_k, y1=hitters["K"].max(),
+    x0=bb_k_hitters["BB"].min(), x1=avg_bb,
+    y0=avg_k, y1=bb_k_hitters["K"].max(),
     fillcolor="rgba(255, 179, 186, 0.25)",  # High K, Low BB
     line_width=0,
     layer="below"
 )
 fig_bb_k.add_shape(
     type="rect",
-    x0=avg_bb, x1=hitters["BB"].max(),
-    y0=avg_k, y1=hitters["K"].max(),
+    x0=avg_bb, x1=bb_k_hitters["BB"].max(),
+    y0=avg_k, y1=bb_k_hitters["K"].max(),
     fillcolor="rgba(255, 223, 186, 0.25)",  # High K, High BB
     line_width=0,
     layer="below"
 )
 fig_bb_k.add_shape(
     type="rect",
-    x0=hitters["BB"].min(), x1=avg_bb,
-    y0=hitters["K"].min(), y1=avg_k,
+    x0=bb_k_hitters["BB"].min(), x1=avg_bb,
+    y0=bb_k_hitters["K"].min(), y1=avg_k,
     fillcolor="rgba(186, 255, 201, 0.25)",  # Low K, Low BB
     line_width=0,
     layer="below"
 )
 fig_bb_k.add_shape(
     type="rect",
-    x0=avg_bb, x1=hitters["BB"].max(),
-    y0=hitters["K"].min(), y1=avg_k,
+    x0=avg_bb, x1=bb_k_hitters["BB"].max(),
+    y0=bb_k_hitters["K"].min(), y1=avg_k,
     fillcolor="rgba(186, 225, 255, 0.25)",  # Low K, High BB (best)
     line_width=0,
     layer="below"
@@ -229,6 +214,7 @@ fig_bb_k.update_layout(
     margin=dict(r=140)
 )
 fig_bb_k.update_traces(textposition="top center")
+timing.phase("render")
 st.plotly_chart(fig_bb_k)
 
 
@@ -236,33 +222,41 @@ st.plotly_chart(fig_bb_k)
 st.subheader("OBP vs SLG (Size = HRs):")
 
 # Ensure numeric data types
+timing.phase("frame")
 hitters["OBP"] = pd.to_numeric(hitters["OBP"], errors="coerce")
 hitters["SLG"] = pd.to_numeric(hitters["SLG"], errors="coerce")
 hitters["HR"] = pd.to_numeric(hitters["HR"], errors="coerce")
 
+obp_slg_large = use_large_data_mode(len(hitters))
+obp_slg_hitters = qualify(hitters, "AB", min_qualified_ab) if obp_slg_large else hitters
+
 # Calculate averages
-avg_obp = hitters["OBP"].mean()
-avg_slg = hitters["SLG"].mean()
+avg_obp = obp_slg_hitters["OBP"].mean()
+avg_slg = obp_slg_hitters["SLG"].mean()
 
 # Create scatter plot
-fig_obp_slg = px.scatter(
-    hitters,
-    x="OBP", y="SLG",
-    size="HR", color="name", hover_name="name",
-    text="name",
-    title="Hitter Performance: OBP vs SLG"
-)
+timing.phase("figure")
+if obp_slg_large:
+    fig_obp_slg = large_data_scatter(obp_slg_hitters, "OBP", "SLG", "HR", "Hitter Performance: OBP vs SLG", "Viridis")
+else:
+    fig_obp_slg = px.scatter(
+        obp_slg_hitters,
+        x="OBP", y="SLG",
+        size="HR", color="name", hover_name="name",
+        text="name",
+        title="Hitter Performance: OBP vs SLG"
+    )
 
 # Add quadrant lines
 fig_obp_slg.add_shape(
     type="line",
     x0=avg_obp, x1=avg_obp,
-    y0=hitters["SLG"].min(), y1=hitters["SLG"].max(),
+    y0=obp_slg_hitters["SLG"].min(), y1=obp_slg_hitters["SLG"].max(),
     line=dict(dash="dash", color="gray")
 )
 fig_obp_slg.add_shape(
     type="line",
-    x0=hitters["OBP"].min(), x1=hitters["OBP"].max(),
+    x0=obp_slg_hitters["OBP"].min(), x1=obp_slg_hitters["OBP"].max(),
     y0=avg_slg, y1=avg_slg,
     line=dict(dash="dash", color="gray")
 )
@@ -270,26 +264,26 @@ fig_obp_slg.add_shape(
 # Add shaded quadrants
 fig_obp_slg.add_shape(
     type="rect",
-    x0=hitters["OBP"].min(), x1=avg_obp,
-    y0=avg_slg, y1=hitters["SLG"].max(),
+    x0=obp_slg_hitters["OBP"].min(), x1=avg_obp,
+    y0=avg_slg, y1=obp_slg_hitters["SLG"].max(),
     fillcolor="rgba(255, 179, 186, 0.25)", line_width=0, layer="below"
 )
 fig_obp_slg.add_shape(
     type="rect",
-    x0=avg_obp, x1=hitters["OBP"].max(),
-    y0=avg_slg, y1=hitters["SLG"].max(),
+    x0=avg_obp, x1=obp_slg_hitters["OBP"].max(),
+    y0=avg_slg, y1=obp_slg_hitters["SLG"].max(),
     fillcolor="rgba(255, 223, 186, 0.25)", line_width=0, layer="below"
 )
 fig_obp_slg.add_shape(
     type="rect",
-    x0=hitters["OBP"].min(), x1=avg_obp,
-    y0=hitters["SLG"].min(), y1=avg_slg,
+    x0=obp_slg_hitters["OBP"].min(), x1=avg_obp,
+    y0=obp_slg_hitters["SLG"].min(), y1=avg_slg,
     fillcolor="rgba(186, 255, 201, 0.25)", line_width=0, layer="below"
 )
 fig_obp_slg.add_shape(
     type="rect",
-    x0=avg_obp, x1=hitters["OBP"].max(),
-    y0=hitters["SLG"].min(), y1=avg_slg,
+    x0=avg_obp, x1=obp_slg_hitters["OBP"].max(),
+    y0=obp_slg_hitters["SLG"].min(), y1=avg_slg,
     fillcolor="rgba(186, 225, 255, 0.25)", line_width=0, layer="below"
 )
 
@@ -327,18 +321,21 @@ fig_obp_slg.update_layout(
     margin=dict(r=40)
 )
 fig_obp_slg.update_traces(textposition="top center")
+timing.phase("render")
 st.plotly_chart(fig_obp_slg)
 
 
 
 # ---- ERA Leaders (Horizontal) ----
 st.subheader("ERA Leaders:")
+timing.phase("figure")
 fig_era_horizontal = px.bar(
     qualified_pitchers.sort_values("ERA", ascending=True),
     x="ERA", y="name", color="ERA", orientation='h',
     title="Pitcher Performance: ERA(Earned Run Average)"
 )
 fig_era_horizontal.update_layout(yaxis={'categoryorder': 'total ascending'})
+timing.phase("render")
 st.plotly_chart(fig_era_horizontal)
 
 
@@ -347,31 +344,39 @@ st.plotly_chart(fig_era_horizontal)
 # ---- WHIP vs K/9 Quadrant Graph (with px.scatter) ----
 st.subheader("WHIP vs K/9:")
 
+timing.phase("frame")
 qualified_pitchers["IP"] = pd.to_numeric(qualified_pitchers["IP"], errors="coerce")
 qualified_pitchers["WHIP"] = pd.to_numeric(qualified_pitchers["WHIP"], errors="coerce")
 qualified_pitchers["K/9"] = pd.to_numeric(qualified_pitchers["K/9"], errors="coerce")
 
-avg_whip = qualified_pitchers["WHIP"].mean()
-avg_k9 = qualified_pitchers["K/9"].mean()
+whip_k9_large = use_large_data_mode(len(qualified_pitchers))
+whip_k9_pitchers = qualify(qualified_pitchers, "IP", min_qualified_ip) if whip_k9_large else qualified_pitchers
 
-fig_whip_k9 = px.scatter(
-    qualified_pitchers,
-    x="WHIP", y="K/9",
-    size="IP", color="name", hover_name="name",
-    text ="name",
-    title="Pitcher Performance: WHIP vs K/9"
-)
+avg_whip = whip_k9_pitchers["WHIP"].mean()
+avg_k9 = whip_k9_pitchers["K/9"].mean()
+
+timing.phase("figure")
+if whip_k9_large:
+    fig_whip_k9 = large_data_scatter(whip_k9_pitchers, "WHIP", "K/9", "IP", "Pitcher Performance: WHIP vs K/9", "Plasma")
+else:
+    fig_whip_k9 = px.scatter(
+        whip_k9_pitchers,
+        x="WHIP", y="K/9",
+        size="IP", color="name", hover_name="name",
+        text ="name",
+        title="Pitcher Performance: WHIP vs K/9"
+    )
 
 # Add quadrant lines
 fig_whip_k9.add_shape(
     type="line",
     x0=avg_whip, x1=avg_whip,
-    y0=qualified_pitchers["K/9"].min(), y1=qualified_pitchers["K/9"].max(),
+    y0=whip_k9_pitchers["K/9"].min(), y1=whip_k9_pitchers["K/9"].max(),
     line=dict(dash="dash", color="gray")
 )
 fig_whip_k9.add_shape(
     type="line",
-    x0=qualified_pitchers["WHIP"].min(), x1=qualified_pitchers["WHIP"].max(),
+    x0=whip_k9_pitchers["WHIP"].min(), x1=whip_k9_pitchers["WHIP"].max(),
     y0=avg_k9, y1=avg_k9,
     line=dict(dash="dash", color="gray")
 )
@@ -379,26 +384,26 @@ fig_whip_k9.add_shape(
 # Add shaded quadrants
 fig_whip_k9.add_shape(
     type="rect",
-    x0=qualified_pitchers["WHIP"].min(), x1=avg_whip,
-    y0=avg_k9, y1=qualified_pitchers["K/9"].max(),
+    x0=whip_k9_pitchers["WHIP"].min(), x1=avg_whip,
+    y0=avg_k9, y1=whip_k9_pitchers["K/9"].max(),
     fillcolor="rgba(255, 179, 186, 0.25)", line_width=0, layer="below"
 )
 fig_whip_k9.add_shape(
     type="rect",
-    x0=avg_whip, x1=qualified_pitchers["WHIP"].max(),
-    y0=avg_k9, y1=qualified_pitchers["K/9"].max(),
+    x0=avg_whip, x1=whip_k9_pitchers["WHIP"].max(),
+    y0=avg_k9, y1=whip_k9_pitchers["K/9"].max(),
     fillcolor="rgba(255, 223, 186, 0.25)", line_width=0, layer="below"
 )
 fig_whip_k9.add_shape(
     type="rect",
-    x0=qualified_pitchers["WHIP"].min(), x1=avg_whip,
-    y0=qualified_pitchers["K/9"].min(), y1=avg_k9,
+    x0=whip_k9_pitchers["WHIP"].min(), x1=avg_whip,
+    y0=whip_k9_pitchers["K/9"].min(), y1=avg_k9,
     fillcolor="rgba(186, 255, 201, 0.25)", line_width=0, layer="below"
 )
 fig_whip_k9.add_shape(
     type="rect",
-    x0=avg_whip, x1=qualified_pitchers["WHIP"].max(),
-    y0=qualified_pitchers["K/9"].min(), y1=avg_k9,
+    x0=avg_whip, x1=whip_k9_pitchers["WHIP"].max(),
+    y0=whip_k9_pitchers["K/9"].min(), y1=avg_k9,
     fillcolor="rgba(186, 225, 255, 0.25)", line_width=0, layer="below"
 )
 
@@ -436,44 +441,57 @@ fig_whip_k9.update_layout(
     margin=dict(r=40)
 )
 fig_whip_k9.update_traces(textposition="top center")
+timing.phase("render")
 st.plotly_chart(fig_whip_k9)
 
 
 # ---- OPS vs ERA ----
 
 # Combine hitting (OPS = OBP + SLG) and pitching stats
+timing.phase("frame")
 hitters["OPS"] = hitters["OBP"] + hitters["SLG"]
-combined = pd.merge(hitters[["name", "OPS"]], qualified_pitchers[["name", "ERA", "IP"]], on="name")
+combined = pd.merge(hitters[["name", "OPS", "AB"]], qualified_pitchers[["name", "ERA", "IP"]], on="name")
+
+ops_era_large = use_large_data_mode(len(combined))
+if ops_era_large:
+    ops_era_players = qualify(qualify(combined, "AB", min_qualified_ab), "IP", min_qualified_ip)
+else:
+    ops_era_players = combined
 
 # Calculate means
-avg_ops = combined["OPS"].mean()
-avg_era = combined["ERA"].mean()
+avg_ops = ops_era_players["OPS"].mean()
+avg_era = ops_era_players["ERA"].mean()
 
 # Plot quadrant graph
+timing.phase("render")
 st.subheader("OPS vs ERA:")
 
-fig_ops_era = px.scatter(
-    combined,
-    x="OPS",
-    y="ERA",
-    text="name",
-    size="IP",
-    color="name",
-    color_continuous_scale="Viridis",
-    title="Hitter/Pitcher Performance: OPS vs ERA"
-)
+timing.phase("figure")
+if ops_era_large:
+    fig_ops_era = large_data_scatter(ops_era_players, "OPS", "ERA", "IP", "Hitter/Pitcher Performance: OPS vs ERA", "Viridis")
+else:
+    fig_ops_era = px.scatter(
+        ops_era_players,
+        x="OPS",
+        y="ERA",
+        text="name",
+        size="IP",
+        color="name",
+        color_continuous_scale="Viridis",
+        title="Hitter/Pitcher Performance: OPS vs ERA"
+    )
 
 
 # Add quadrant lines
 fig_ops_era.add_shape(
     type="line",
     x0=avg_ops, x1=avg_ops,
-    y0=combined["ERA"].min(), y1=combined["ERA"].max(),
+    y0=ops_era_players["ERA"].min(), y1=ops_era_players["ERA"].max(),
     line=dict(dash="dash", color="gray")
 )
 fig_ops_era.add_shape(
     type="line",
-    x0=combined["OPS"].min(), x1=combined["OPS"].max(),
+    x0=ops_era_players["OPS"].min(), x1=ops_era_players["OPS"].max(),
     y0=avg_era, y1=avg_era,
     line=dict(dash="dash", color="gray")
 )
@@ -481,29 +499,29 @@ fig_ops_era.add_shape(
 # Shaded quadrants
 fig_ops_era.add_shape(
     type="rect",
-    x0=combined["OPS"].min(), x1=avg_ops,
-    y0=avg_era, y1=combined["ERA"].max(),
+    x0=ops_era_players["OPS"].min(), x1=avg_ops,
+    y0=avg_era, y1=ops_era_players["ERA"].max(),
     fillcolor="rgba(255, 179, 186, 0.25)",  # Low OPS, High ERA
     line_width=0, layer="below"
 )
 fig_ops_era.add_shape(
     type="rect",
-    x0=avg_ops, x1=combined["OPS"].max(),
-    y0=avg_era, y1=combined["ERA"].max(),
+    x0=avg_ops, x1=ops_era_players["OPS"].max(),
+    y0=avg_era, y1=ops_era_players["ERA"].max(),
     fillcolor="rgba(255, 223, 186, 0.25)",  # High OPS, High ERA
     line_width=0, layer="below"
 )
 fig_ops_era.add_shape(
     type="rect",
-    x0=combined["OPS"].min(), x1=avg_ops,
-    y0=combined["ERA"].min(), y1=avg_era,
+    x0=ops_era_players["OPS"].min(), x1=avg_ops,
+    y0=ops_era_players["ERA"].min(), y1=avg_era,
     fillcolor="rgba(186, 255, 201, 0.25)",  # Low OPS, Low ERA
     line_width=0, layer="below"
 )
 fig_ops_era.add_shape(
     type="rect",
-    x0=avg_ops, x1=combined["OPS"].max(),
-    y0=combined["ERA"].min(), y1=avg_era,
+    x0=avg_ops, x1=ops_era_players["OPS"].max(),
+    y0=ops_era_players["ERA"].min(), y1=avg_era,
     fillcolor="rgba(186, 225, 255, 0.25)",  # High OPS, Low ERA (ideal)
     line_width=0, layer="below"
 )
@@ -543,7 +561,7 @@ fig_ops_era.update_layout(
 )
 fig_ops_era.update_traces(textposition="top center")
 
+timing.phase("render")
 st.plotly_chart(fig_ops_era)
 
-
-
+timing.end_rerun()
@@ -0,0 +1,225 @@
+# Stable integer player ids.
+#
+# Players used to be identified only by display name: at-bats held batter
+# and pitcher names and games held comma-joined roster strings, so renaming a
+# player split their history in two. Every player now gets a player_id from
+# the counters collection, and that id is what records point at:
+#   - at-bats carry batter_id and pitcher_id (indexed)
+#   - games carry team1_ids, team2_ids and player_ids, both teams in one array
+#     with a multikey index, so a player's games are one indexed query
+#   - games store team1_players / team2_players as name arrays
+#
+# Names are still stored beside the ids for display and for the stats code,
+# which works on names; rename_player rewrites them everywhere by id.
+# migrate() brings older data up to this shape; it is run by hand through
+# migrate.py, never on a page load.
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import counters
+from data_version import bump_version
+from game_state import split_roster
+
+PLAYER_COUNTER = "player_id"
+# Collections (besides players) whose documents name players, and the id
+# field behind each name field
+NAME_FIELDS = {
+    "atbats": (("batter", "batter_id"), ("pitcher", "pitcher_id")),
+    "game_events": (("payload.batter", "payload.batter_id"), ("payload.pitcher", "payload.pitcher_id")),
+    "rating_history": (("player", "player_id"),),
+}
+
+_seeded = set()
+
+
+def ensure_indexes(db):
+    # Partial so players added before ids existed don't collide on null
+    db["players"].create_index(
+        [("player_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"player_id": {"$exists": True}}
+    )
+    db["atbats"].create_index([("batter_id", ASCENDING)])
+    db["atbats"].create_index([("pitcher_id", ASCENDING)])
+    db["games"].create_index([("player_ids", ASCENDING)])
+    # Older databases can hold duplicate names; the index waits for cleanup
+    try:
+        db["players"].create_index([("name", ASCENDING)], unique=True)
+    except OperationFailure:
+        pass
+
+
+# ---- Ids ----
+def _seed_player_counter(db):
+    # Same one-time seeding as game ids, from the highest id already used
+    if PLAYER_COUNTER in _seeded:
+        return
+    if db[counters.COUNTERS_COLLECTION].find_one({"_id": PLAYER_COUNTER}) is None:
+        highest = db["players"].find_one({"player_id": {"$type": "int"}}, {"player_id": 1}, sort=[("player_id", -1)])
+        counters.seed_counter(db, PLAYER_COUNTER, highest["player_id"] if highest else 0)
+    _seeded.add(PLAYER_COUNTER)
+
+
+def next_player_id(db):
+    _seed_player_counter(db)
+    return counters.next_value(db, PLAYER_COUNTER)
+
+
+def insert_player(db, name):
+    player_id = next_player_id(db)
+    db["players"].insert_one({"player_id": player_id, "name": name})
+    return player_id
+
+
+def ids_for(db, names):
+    # {name: player_id} for these players, giving an id to any still without
+    # one (and a player document to any name that has none)
+    ids = {}
+    for player in db["players"].find({"name": {"$in": list(names)}}, {"name": 1, "player_id": 1}):
+        if player.get("player_id") is None:
+            claimed = db["players"].find_one_and_update(
+                {"_id": player["_id"], "player_id": None},
+                {"$set": {"player_id": next_player_id(db)}},
+                return_document=ReturnDocument.AFTER
+            )
+            # Another process may have given it one first
+            player = claimed or db["players"].find_one({"_id": player["_id"]}, {"name": 1, "player_id": 1})
+        ids[player["name"]] = player["player_id"]
+    for name in names:
+        if name not in ids:
+            ids[name] = insert_player(db, name)
+    return ids
+
+
+def player_index(players):
+    # {name: player_id} from a players frame, for stamping ids on new records
+    if "player_id" not in players.columns:
+        return {}
+    known = players.dropna(subset=["player_id"])
+    return {name: int(player_id) for name, player_id in zip(known["name"], known["player_id"])}
+
+
+def roster_fields(team1, team2, ids):
+    # The roster part of a game document, from two lists of names
+    team1, team2 = split_roster(team1), split_roster(team2)
+    team1_ids = [ids[name] for name in team1 if name in ids]
+    team2_ids = [ids[name] for name in team2 if name in ids]
+    return {
+        "team1": ", ".join(team1),
+        "team2": ", ".join(team2),
+        "team1_players": team1,
+        "team2_players": team2,
+        "team1_ids": team1_ids,
+        "team2_ids": team2_ids,
+        "player_ids": team1_ids + team2_ids,
+    }
+
+
+def games_for_player(db, player_id, projection=None):
+    # Every game a player was on a roster for, through the multikey index
+    return db["games"].find({"player_ids": int(player_id)}, projection)
+
+
+# ---- Renames ----
+def rename_player(db, player_id, new_name):
+    # MongoDB can't rename across collections in one step, so the player
+    # document records the name being replaced ("renamed_from") until every
+    # copy is rewritten. Each step is safe to repeat: an interrupted rename
+    # is finished by renaming to the same name again (see finish_renames).
+    new_name = new_name.strip()
+    if not new_name:
+        raise ValueError("Name cannot be empty.")
+    player = db["players"].find_one({"player_id": int(player_id)})
+    if player is None:
+        raise ValueError(f"No player with id {player_id}")
+    old_name = player["name"]
+    pending = player.get("renamed_from")
+    if new_name == old_name and pending is None:
+        return
+    if new_name != old_name:
+        if db["players"].find_one({"name": new_name}, {"_id": 1}) is not None:
+            raise ValueError(f"Player '{new_name}' already exists.")
+        try:
+            claimed = db["players"].update_one(
+                {"player_id": int(player_id), "name": old_name},
+                {"$set": {"name": new_name, "renamed_from": pending or old_name}}
+            )
+        except DuplicateKeyError:
+            raise ValueError(f"Player '{new_name}' already exists.")
+        if claimed.matched_count == 0:
+            raise ValueError(f"'{old_name}' was just renamed by someone else; reload and try again.")
+    # Roster entries may still hold either earlier name after an interrupted rename
+    old_names = {old_name, pending} - {None, new_name}
+
+    for collection, fields in NAME_FIELDS.items():
+        for name_field, id_field in fields:
+            db[collection].update_many({id_field: int(player_id)}, {"$set": {name_field: new_name}})
+
+    updates = []
+    renamed = []
+    for game in games_for_player(db, player_id, {"game_id": 1, "team1_players": 1, "team2_players": 1}):
+        team1 = [new_name if name in old_names else name for name in split_roster(game.get("team1_players"))]
+        team2 = [new_name if name in old_names else name for name in split_roster(game.get("team2_players"))]
+        updates.append(UpdateOne({"_id": game["_id"]}, {"$set": {
+            "team1": ", ".join(team1), "team2": ", ".join(team2), "team1_players": team1, "team2_players": team2,
+        }}))
+        renamed.append(game["game_id"])
+    if updates:
+        db["games"].bulk_write(updates, ordered=False)
+    db["players"].update_one({"player_id": int(player_id), "name": new_name}, {"$unset": {"renamed_from": ""}})
+    # Each game's cached document and at-bats hold the old name too
+    bump_version(db, "players", "games", "atbats", "rating_history", game_ids=renamed)
+
+
+def finish_renames(db):
+    # For migrate.py: completes renames that were interrupted part way
+    pending = list(db["players"].find({"renamed_from": {"$exists": True}}, {"player_id": 1, "name": 1}))
+    for player in pending:
+        rename_player(db, player["player_id"], player["name"])
+    return len(pending)
+
+
+# ---- Migration ----
+def migrate(db):
+    # Ids for players without one (and for names only found in old games and
+    # at-bats), id fields on at-bats and journal events, roster arrays on
+    # games. Safe to re-run; returns how many documents changed.
+    changed = 0
+    ids = {}
+    for player in db["players"].find({}, {"name": 1, "player_id": 1}).sort("_id", 1):
+        if player.get("player_id") is None:
+            player["player_id"] = next_player_id(db)
+            db["players"].update_one({"_id": player["_id"]}, {"$set": {"player_id": player["player_id"]}})
+            changed += 1
+        ids.setdefault(player.get("name"), player["player_id"])
+
+    def player_id(name):
+        nonlocal changed
+        if name not in ids:
+            ids[name] = insert_player(db, name)
+            changed += 1
+        return ids[name]
+
+    for collection, fields in NAME_FIELDS.items():
+        for name_field, id_field in fields:
+            # Missing ids index as null, so when everything is migrated this
+            # is one index lookup
+            names = {name for name in db[collection].distinct(name_field, {id_field: None}) if isinstance(name, str)}
+            for name in names:
+                result = db[collection].update_many({name_field: name, id_field: None}, {"$set": {id_field: player_id(name)}})
+                changed += result.modified_count
+
+    updates = []
+    for game in db["games"].find({"player_ids": None}, {"team1": 1, "team2": 1, "team1_players": 1, "team2_players": 1}):
+        team1 = split_roster(game.get("team1_players")) or split_roster(game.get("team1"))
+        team2 = split_roster(game.get("team2_players")) or split_roster(game.get("team2"))
+        for name in team1 + team2:
+            player_id(name)
+        updates.append(UpdateOne({"_id": game["_id"]}, {"$set": roster_fields(team1, team2, ids)}))
+    if updates:
+        db["games"].bulk_write(updates, ordered=False)
+        changed += len(updates)
+
+    if changed:
+        bump_version(db, "players", "games", "atbats", "rating_history")
+    return changed
@@ -0,0 +1,254 @@
+# Elo-style player ratings from game results.
+#
+#   python ratings.py --replay         # recompute every rating from scratch
+#
+# A team's rating is the average of its players'. When a game ends, the
+# result against the expected result (from the two team ratings) moves every
+# player on the team by the same amount, scaled up for wider margins and
+# down when the favourite wins big, as in margin-of-victory Elo. Unrated
+# players start at INITIAL_RATING.
+#
+# The rating history collection is the ledger: one entry per game and
+# player_id holding that game's change. A player's current rating is
+# INITIAL_RATING plus their entries' changes, copied onto their player
+# document so the players frame every page already loads carries it. Rating
+# a game upserts its entries and then recomputes its players from the
+# ledger, so a retried or repeated write lands on the same ratings; "rated"
+# is set on the game document last. Undoing the end of a game deletes its
+# entries and recomputes the same way. The replay walks all completed games
+# in date order with the ratings in one array and rewrites everything, e.g.
+# after a correction to an old game.
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from pymongo import ASCENDING, UpdateOne
+
+import player_ids
+from data_version import bump_version
+from game_state import split_roster
+
+HISTORY_COLLECTION = "rating_history"
+INITIAL_RATING = 1500.0
+# Points a team moves on a one-run result it had a 50% chance of
+K_FACTOR = 24.0
+# Rating points that make one team a 10-to-1 favourite
+SCALE = 400.0
+
+
+def ensure_indexes(db):
+    # Partial so entries written before ids existed don't collide on null
+    db[HISTORY_COLLECTION].create_index(
+        [("game_id", ASCENDING), ("player_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"player_id": {"$exists": True}}
+    )
+    db[HISTORY_COLLECTION].create_index([("player_id", ASCENDING), ("date", ASCENDING)])
+
+
+# ---- Elo ----
+def expected(rating1, rating2):
+    return 1 / (1 + 10 ** ((rating2 - rating1) / SCALE))
+
+
+def team_change(rating1, rating2, score1, score2):
+    # Points added to each team 1 player (team 2 players lose the same)
+    result = 1.0 if score1 > score2 else 0.0 if score1 < score2 else 0.5
+    margin = abs(score1 - score2)
+    # A win by a favourite says less than the same margin by an underdog
+    winner_edge = (rating1 - rating2) if score1 > score2 else (rating2 - rating1) if score2 > score1 else 0.0
+    multiplier = math.log(margin + 1) * 2.2 / (winner_edge * 0.001 + 2.2) if margin else 1.0
+    return K_FACTOR * multiplier * (result - expected(rating1, rating2))
+
+
+def current_ratings(players):
+    # {name: rating} from a players frame; O(1) per lookup afterwards
+    if "rating" not in players.columns:
+        return {}
+    rated = players.dropna(subset=["rating"])
+    return dict(zip(rated["name"], rated["rating"].astype(float)))
+
+
+def rating_column(players):
+    # Player, Rating, Rated Games for the standings
+    frame = players.reindex(columns=["name", "rating", "rating_games"]).dropna(subset=["name"])
+    return pd.DataFrame({
+        "Player": frame["name"],
+        "Rating": frame["rating"].astype(float).fillna(INITIAL_RATING).round(0),
+        "Rated Games": frame["rating_games"].fillna(0).astype(int),
+    })
+
+
+# ---- Incremental ----
+def record_game(db, game_id, date, team1, team2, score1, score2):
+    # Called when a game ends; returns {player: change}, or None if the game
+    # was already rated
+    game = db["games"].find_one({"game_id": game_id}, {"rated": 1})
+    if game is None or game.get("rated"):
+        return None
+    team1, team2 = split_roster(team1), split_roster(team2)
+    ids = player_ids.ids_for(db, list(dict.fromkeys(team1 + team2)))
+
+    # A retry after a partial write keeps the change already recorded
+    recorded = {entry["player_id"]: entry["change"] for entry in db[HISTORY_COLLECTION].find({"game_id": game_id})}
+    docs = db["players"].find({"player_id": {"$in": list(ids.values())}}, {"player_id": 1, "rating": 1, "_id": 0})
+    ratings = {doc["player_id"]: doc["rating"] for doc in docs if doc.get("rating") is not None}
+    before = {name: ratings.get(player_id, INITIAL_RATING) for name, player_id in ids.items()}
+    change = next((recorded[ids[name]] for name in team1 if ids[name] in recorded), None)
+    if change is None:
+        change = next((-recorded[ids[name]] for name in team2 if ids[name] in recorded), None)
+    if change is None:
+        change = float(team_change(
+            np.mean([before[name] for name in team1]), np.mean([before[name] for name in team2]), score1, score2
+        ))
+    changes = {name: change for name in team1}
+    changes.update({name: -change for name in team2})
+
+    db[HISTORY_COLLECTION].bulk_write([
+        UpdateOne({"game_id": game_id, "player_id": ids[name]}, {"$setOnInsert": {
+            "date": date, "player": name,
+            "before": round(before[name], 2), "after": round(before[name] + delta, 2), "change": round(delta, 2),
+        }}, upsert=True)
+        for name, delta in changes.items()
+    ], ordered=False)
+    _refresh(db, ids)
+    db["games"].update_one({"game_id": game_id}, {"$set": {"rated": True}})
+    bump_version(db, "players", HISTORY_COLLECTION)
+    return changes
+
+
+def unrate_game(db, game_id):
+    # Reverses record_game when the end of a game is undone; returns how many
+    # players' ratings moved back
+    entries = list(db[HISTORY_COLLECTION].find({"game_id": game_id}, {"player_id": 1, "player": 1}))
+    if entries:
+        db[HISTORY_COLLECTION].delete_many({"game_id": game_id})
+        _refresh(db, {entry["player"]: entry["player_id"] for entry in entries})
+    unset = db["games"].update_one({"game_id": game_id, "rated": True}, {"$unset": {"rated": ""}})
+    if entries or unset.modified_count:
+        bump_version(db, "players", HISTORY_COLLECTION)
+    return len(entries)
+
+
+def sync_game(db, game_id, date, state):
+    # After an undo or redo: rates a game that has ended again and un-rates
+    # one that no longer has
+    if state.status == "completed":
+        return record_game(db, game_id, date, state.team1, state.team2, state.team1_score, state.team2_score)
+    unrate_game(db, game_id)
+    return None
+
+
+def _refresh(db, ids):
+    # ids: {name: player_id}. Sets each player's rating from their ledger;
+    # entries from before ids existed are matched by name.
+    totals = {player_id: [INITIAL_RATING, 0] for player_id in ids.values()}
+    entries = db[HISTORY_COLLECTION].find(
+        {"$or": [{"player_id": {"$in": list(totals)}}, {"player_id": None, "player": {"$in": list(ids)}}]},
+        {"player_id": 1, "player": 1, "change": 1}
+    )
+    for entry in entries:
+        total = totals[entry["player_id"] if entry.get("player_id") is not None else ids[entry["player"]]]
+        total[0] += entry["change"]
+        total[1] += 1
+    db["players"].bulk_write([
+        UpdateOne({"player_id": player_id}, {"$set": {"rating": round(rating, 2), "rating_games": games}})
+        for player_id, (rating, games) in totals.items()
+    ], ordered=False)
+
+
+# ---- Replay ----
+def _game_number(game_id):
+    digits = "".join(ch for ch in str(game_id) if ch.isdigit())
+    return int(digits) if digits else 0
+
+
+def _roster(row, team):
+    return split_roster(getattr(row, f"{team}_players", None)) or split_roster(getattr(row, team, None))
+
+
+def replay(games):
+    # Ratings after every completed game, oldest first, in one pass over a
+    # rating array. Returns ({player: (rating, games)}, history frame).
+    finished = games[games["status"] == "completed"].copy()
+    finished["score1"] = pd.to_numeric(finished["team1_score"], errors="coerce")
+    finished["score2"] = pd.to_numeric(finished["team2_score"], errors="coerce")
+    finished = finished.dropna(subset=["score1", "score2"])
+    finished["order"] = finished["game_id"].map(_game_number)
+    finished["day"] = pd.to_datetime(finished["date"], errors="coerce")
+    finished = finished.sort_values(["day", "order"], kind="stable", na_position="first")
+
+    rosters = [(_roster(row, "team1"), _roster(row, "team2")) for row in finished.itertuples()]
+    names = sorted({name for team1, team2 in rosters for name in team1 + team2})
+    index = {name: i for i, name in enumerate(names)}
+    ratings = np.full(len(names), INITIAL_RATING)
+    played = np.zeros(len(names), dtype=int)
+    history = []
+
+    for row, (team1, team2) in zip(finished.itertuples(), rosters):
+        if not team1 or not team2:
+            continue
+        side1 = np.array([index[name] for name in team1])
+        side2 = np.array([index[name] for name in team2])
+        change = team_change(ratings[side1].mean(), ratings[side2].mean(), row.score1, row.score2)
+        for side, delta in ((side1, change), (side2, -change)):
+            for i in side:
+                history.append((row.game_id, row.date, names[i], ratings[i], ratings[i] + delta, delta))
+            ratings[side] += delta
+            played[side] += 1
+
+    history = pd.DataFrame(history, columns=["game_id", "date", "player", "before", "after", "change"])
+    return {name: (ratings[i], played[i]) for name, i in index.items()}, history.round(2)
+
+
+def save_replay(db, ratings, history):
+    # Every player is reset, so players without a completed game lose any
+    # stale rating
+    ids = player_ids.ids_for(db, list(ratings))
+    db["players"].update_many({}, {"$unset": {"rating": "", "rating_games": ""}})
+    if ratings:
+        db["players"].bulk_write([
+            UpdateOne({"player_id": ids[name]}, {"$set": {"rating": round(float(rating), 2), "rating_games": int(played)}})
+            for name, (rating, played) in ratings.items()
+        ], ordered=False)
+    db[HISTORY_COLLECTION].delete_many({})
+    if not history.empty:
+        db[HISTORY_COLLECTION].insert_many(history.assign(player_id=history["player"].map(ids)).to_dict("records"))
+    db["games"].update_many({"status": "completed"}, {"$set": {"rated": True}})
+    bump_version(db, "players", HISTORY_COLLECTION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Player ratings")
+    parser.add_argument("--replay", action="store_true", help="Recompute every rating from the game results")
+    args = parser.parse_args()
+    if not args.replay:
+        parser.print_help()
+        return
+
+    from database import get_db
+
+    db = get_db()
+    ensure_indexes(db)
+    start = time.perf_counter()
+    games = pd.DataFrame(list(db["games"].find(
+        {"status": "completed"},
+        {"game_id": 1, "date": 1, "status": 1, "team1": 1, "team2": 1, "team1_players": 1, "team2_players": 1,
+         "team1_score": 1, "team2_score": 1, "_id": 0}
+    )))
+    if games.empty:
+        print("No completed games to rate")
+        return
+    ratings, history = replay(games)
+    save_replay(db, ratings, history)
+    print(f"Rated {len(ratings)} players over {history['game_id'].nunique()} games "
+          f"in {time.perf_counter() - start:.1f}s")
+    top = sorted(ratings.items(), key=lambda item: -item[1][0])[:10]
+    for name, (rating, played) in top:
+        print(f"  {rating:7.1f}  {name} ({played} games)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Run expectancy and RE24.
+#
+# The base/out state before each at-bat is rebuilt from what Home.py records:
+# runners_on (how many runners, 0-3; which bases isn't recorded) and the
+# outs made earlier in the same half-inning, from outs_recorded. That gives a
+# 4 x 3 grid of states. The run expectancy of a state is the average number
+# of runs (rbi, the app's measure of runs everywhere) scored from that point
+# to the end of the half-inning, over every complete half-inning of the
+# season. A play's RE24 is the change in run expectancy it caused plus the
+# runs it drove in; batters are credited with it and pitchers charged.
+#
+# Everything is computed with grouped cumulative sums and shifts over the
+# whole at-bats frame, so the full history costs a few vectorized passes.
+import numpy as np
+import pandas as pd
+
+from game_state import OUTS_PER_HALF_INNING
+
+RUNNER_STATES = range(4)
+OUT_STATES = range(OUTS_PER_HALF_INNING)
+# Plays whose game has no usable date share this season
+NO_SEASON = -1
+
+
+def _seasons(atbats, games):
+    if games is None or games.empty or "date" not in games.columns:
+        return pd.Series(NO_SEASON, index=atbats.index)
+    years = pd.to_datetime(games["date"], errors="coerce").dt.year
+    by_game = pd.Series(years.to_numpy(), index=games["game_id"].to_numpy())
+    by_game = by_game[~by_game.index.duplicated()]
+    return atbats["game_id"].map(by_game).fillna(NO_SEASON).astype(int)
+
+
+def play_states(atbats, games=None):
+    # One row per at-bat with its season, the state before it (runners,
+    # outs), the state after it and the runs scored from it to the end of
+    # its half-inning. At-bats keep their stored order within a half-inning.
+    plays = pd.DataFrame({
+        "game_id": atbats["game_id"],
+        "inning": atbats["inning"].fillna("?"),
+        "batter": atbats["batter"],
+        "pitcher": atbats["pitcher"],
+        "runners": pd.to_numeric(atbats["runners_on"], errors="coerce").fillna(0).clip(0, 3).astype(int),
+        "outs_made": pd.to_numeric(atbats["outs_recorded"], errors="coerce").fillna(0).clip(0, OUTS_PER_HALF_INNING).astype(int),
+        "runs": pd.to_numeric(atbats["rbi"], errors="coerce").fillna(0),
+        "season": _seasons(atbats, games),
+    })
+    half = plays.groupby(["game_id", "inning"], sort=False)
+
+    plays["outs"] = half["outs_made"].cumsum() - plays["outs_made"]
+    total_runs = half["runs"].transform("sum")
+    plays["runs_to_end"] = total_runs - half["runs"].cumsum() + plays["runs"]
+    plays["complete"] = half["outs_made"].transform("sum") >= OUTS_PER_HALF_INNING
+
+    # The next at-bat in the same half-inning starts in the state this one
+    # left; the last one (or the one making the third out) ends the inning
+    plays["next_runners"] = half["runners"].shift(-1)
+    plays["next_outs"] = half["outs"].shift(-1)
+    plays["ends_inning"] = plays["next_runners"].isna() | (plays["outs"] + plays["outs_made"] >= OUTS_PER_HALF_INNING)
+    # Plays after the third out was already recorded belong to no state
+    plays["valid"] = plays["outs"] < OUTS_PER_HALF_INNING
+    return plays
+
+
+def expectancy_table(plays):
+    # Long form: season, runners, outs, run_expectancy, plays. The season
+    # NO_SEASON row set covers every play, for states a season never saw.
+    counted = plays[plays["complete"] & plays["valid"]]
+    frames = [counted, counted.assign(season=NO_SEASON)] if (counted["season"] != NO_SEASON).any() else [counted]
+    grouped = pd.concat(frames).groupby(["season", "runners", "outs"])["runs_to_end"]
+    table = pd.DataFrame({"run_expectancy": grouped.mean(), "plays": grouped.size()})
+    seasons = sorted(set(counted["season"]) | {NO_SEASON})
+    full = pd.MultiIndex.from_product([seasons, RUNNER_STATES, OUT_STATES], names=["season", "runners", "outs"])
+    table = table.reindex(full)
+    table["plays"] = table["plays"].fillna(0).astype(int)
+    # Unseen states fall back to the all-seasons value, then to 0
+    overall = table.xs(NO_SEASON, level="season")["run_expectancy"]
+    fallback = overall.reindex(pd.MultiIndex.from_arrays(
+        [table.index.get_level_values("runners"), table.index.get_level_values("outs")])).to_numpy()
+    table["run_expectancy"] = table["run_expectancy"].fillna(pd.Series(fallback, index=table.index)).fillna(0.0)
+    return table.reset_index()
+
+
+def matrix(table, season=NO_SEASON):
+    # Runners down, outs across, like the usual RE24 grid
+    rows = table[table["season"] == season]
+    grid = rows.pivot(index="runners", columns="outs", values="run_expectancy").round(3)
+    grid.index = [f"{runners} on" for runners in grid.index]
+    grid.columns = [f"{outs} out" for outs in grid.columns]
+    return grid
+
+
+def _lookup(table, seasons, runners, outs):
+    values = table.set_index(["season", "runners", "outs"])["run_expectancy"]
+    # Seasons without a table of their own use the all-seasons one
+    seasons = np.where(np.isin(seasons, table["season"].unique()), seasons, NO_SEASON)
+    index = pd.MultiIndex.from_arrays([seasons, runners, outs])
+    return values.reindex(index).to_numpy()
+
+
+def re24(plays, table):
+    # RE24 of every valid play: RE(after) - RE(before) + runs
+    plays = plays[plays["valid"]]
+    before = _lookup(table, plays["season"].to_numpy(), plays["runners"].to_numpy(), plays["outs"].to_numpy())
+    after_runners = plays["next_runners"].fillna(0).astype(int).to_numpy()
+    after_outs = plays["next_outs"].fillna(0).clip(0, OUTS_PER_HALF_INNING - 1).astype(int).to_numpy()
+    after = _lookup(table, plays["season"].to_numpy(), after_runners, after_outs)
+    after = np.where(plays["ends_inning"].to_numpy(), 0.0, after)
+    return pd.Series(after - before + plays["runs"].to_numpy(), index=plays.index)
+
+
+def re24_leaderboard(atbats, games=None, table=None):
+    # Player, RE24 (as a batter), RE24_P (runs saved as a pitcher), PA.
+    # table: a cached expectancy_table for the same at-bats, if there is one
+    columns = ["Player", "RE24", "RE24_P", "PA"]
+    if atbats.empty:
+        return pd.DataFrame(columns=columns)
+    plays = play_states(atbats, games)
+    if table is None:
+        table = expectancy_table(plays)
+    plays = plays[plays["valid"]].assign(re24=re24(plays, table))
+    batting = plays.groupby("batter")["re24"].agg(["sum", "size"])
+    pitching = -plays.groupby("pitcher")["re24"].sum()
+    board = pd.DataFrame({
+        "RE24": batting["sum"],
+        "RE24_P": pitching,
+        "PA": batting["size"],
+    })
+    board["PA"] = board["PA"].fillna(0).astype(int)
+    board = board.round({"RE24": 2, "RE24_P": 2}).rename_axis("Player").reset_index()
+    return board[columns]
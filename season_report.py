@@ -0,0 +1,218 @@
+# End-of-season report generator.
+#
+#   python season_report.py                              # every season
+#   python season_report.py --seasons 2024 2025 --formats csv html
+#   python season_report.py --workers 4 --output-dir reports
+#
+# For each season writes every player's hitting and pitching lines, their
+# game logs, win/loss records, the standings leaderboard and the award
+# leaders, computed with the same stats.py functions as the pages. Seasons
+# run in parallel in a process pool. A worker only ever holds its own
+# season: at-bats are read through the columnar fetch in chunks of that
+# season's games, never the whole history.
+import argparse
+import importlib.util
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+
+import pandas as pd
+
+import arrow_fetch
+import stats
+from database import get_db, reset_client
+
+FORMATS = ("csv", "parquet", "html")
+# Game ids per at-bat query, to keep each $in list a sensible size
+GAME_CHUNK = 500
+GAME_FIELDS = {"game_id": 1, "date": 1, "team1": 1, "team2": 1, "team1_players": 1, "team2_players": 1,
+               "status": 1, "team1_score": 1, "team2_score": 1}
+
+# (table, column, title, qualifier column, highest wins)
+AWARDS = [
+    ("hitting", "avg", "Batting Title (AVG)", "ab", True),
+    ("hitting", "obp", "On-Base Leader (OBP)", "ab", True),
+    ("hitting", "slg", "Slugging Leader (SLG)", "ab", True),
+    ("hitting", "home_runs", "Home Run Leader", None, True),
+    ("hitting", "rbi", "RBI Leader", None, True),
+    ("pitching", "era", "ERA Leader", "innings_pitched", False),
+    ("pitching", "whip", "WHIP Leader", "innings_pitched", False),
+    ("pitching", "strikeouts", "Strikeout Leader", None, True),
+    ("records", "Wins", "Most Wins", None, True),
+]
+
+
+# ---- Data ----
+def season_games(db):
+    # {season: [game ids]} from the game dates; undated games are skipped
+    games = pd.DataFrame(list(db["games"].find({}, {"game_id": 1, "date": 1, "_id": 0})))
+    if games.empty:
+        return {}
+    games["season"] = pd.to_datetime(games["date"], errors="coerce").dt.year
+    games = games.dropna(subset=["season"])
+    return {int(season): group["game_id"].tolist() for season, group in games.groupby("season")}
+
+
+def load_season(db, game_ids):
+    games = pd.DataFrame(list(db["games"].find({"game_id": {"$in": game_ids}}, GAME_FIELDS)))
+    chunks = [
+        arrow_fetch.fetch_frame(db["atbats"], {"game_id": {"$in": game_ids[start:start + GAME_CHUNK]}})
+        for start in range(0, len(game_ids), GAME_CHUNK)
+    ]
+    atbats = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(arrow_fetch.ATBAT_SCHEMA))
+    return games.sort_values("date", kind="stable").reset_index(drop=True), atbats
+
+
+# ---- Tables ----
+def _lines(atbats, role, summarize):
+    rows = [dict(player=player, **summarize(group)) for player, group in atbats.groupby(role, sort=True)]
+    lines = pd.DataFrame(rows)
+    return lines.round(3) if not lines.empty else lines
+
+
+def _game_logs(atbats, role, games, game_log):
+    logs = []
+    for player, group in atbats.groupby(role, sort=True):
+        log = game_log(group, games)
+        if not log.empty:
+            logs.append(log.assign(player=player)[["player"] + list(log.columns)])
+    return pd.concat(logs, ignore_index=True) if logs else pd.DataFrame()
+
+
+def award_leaders(tables, min_ab, min_ip):
+    qualifiers = {"ab": min_ab, "innings_pitched": min_ip}
+    rows = []
+    for table, column, title, qualifier, highest in AWARDS:
+        frame = tables[table]
+        if frame.empty or column not in frame.columns:
+            continue
+        if qualifier is not None:
+            frame = frame[frame[qualifier] >= qualifiers[qualifier]]
+        frame = frame.dropna(subset=[column])
+        if frame.empty:
+            continue
+        best = frame[column].max() if highest else frame[column].min()
+        winners = frame[frame[column] == best]
+        name_column = "Player" if "Player" in frame.columns else "player"
+        rows.append({"award": title, "player": ", ".join(winners[name_column]), "value": best})
+    # object dtype keeps counts as integers next to the rate stats
+    return pd.DataFrame(rows, columns=["award", "player", "value"], dtype=object)
+
+
+def season_tables(players, games, atbats, min_ab, min_ip):
+    tables = {
+        "hitting": _lines(atbats, "batter", stats.hitting_summary),
+        "pitching": _lines(atbats, "pitcher", stats.pitching_summary),
+        "hitting_game_logs": _game_logs(atbats, "batter", games, stats.hitting_game_log),
+        "pitching_game_logs": _game_logs(atbats, "pitcher", games, stats.pitching_game_log),
+        "records": stats.player_records(games),
+        "leaderboard": stats.standings_leaderboard(players, atbats),
+    }
+    tables["awards"] = award_leaders(tables, min_ab, min_ip)
+    return tables
+
+
+# ---- Output ----
+def have_parquet():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def write_html(path, season, tables):
+    sections = [f"<h1>{season} Season Report</h1>"]
+    for name, frame in tables.items():
+        sections.append(f"<h2>{html.escape(name.replace('_', ' ').title())}</h2>")
+        sections.append(frame.to_html(index=False, na_rep="", border=0, classes="stats") if not frame.empty else "<p>None.</p>")
+    path.write_text(
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>{season} Season Report</title>"
+        "<style>body{font-family:sans-serif}table.stats{border-collapse:collapse}"
+        "table.stats td,table.stats th{padding:2px 8px;border-bottom:1px solid #ddd;text-align:right}</style>"
+        "</head><body>\n" + "\n".join(sections) + "\n</body></html>\n"
+    )
+
+
+def write_tables(directory, season, tables, formats):
+    directory.mkdir(parents=True, exist_ok=True)
+    files = []
+    for name, frame in tables.items():
+        if "csv" in formats:
+            frame.to_csv(directory / f"{name}.csv", index=False)
+            files.append(f"{name}.csv")
+        if "parquet" in formats:
+            frame.to_parquet(directory / f"{name}.parquet", index=False)
+            files.append(f"{name}.parquet")
+    if "html" in formats:
+        write_html(directory / "report.html", season, tables)
+        files.append("report.html")
+    return files
+
+
+# ---- Workers ----
+def run_season(season, game_ids, output_dir, formats, min_ab, min_ip):
+    start = time.perf_counter()
+    db = get_db()
+    players = pd.DataFrame(list(db["players"].find({}, {"name": 1, "_id": 0})))
+    games, atbats = load_season(db, game_ids)
+    tables = season_tables(players, games, atbats, min_ab, min_ip)
+    files = write_tables(Path(output_dir) / str(season), season, tables, formats)
+    return {
+        "season": season,
+        "games": len(games),
+        "atbats": len(atbats),
+        "players": len(tables["hitting"]),
+        "files": len(files),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def _pool(workers):
+    # Forked workers start with the parent's modules (and, for
+    # MONGO_URI=memory://, its data); each opens its own client
+    context = get_context("fork") if "fork" in get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=reset_client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write end-of-season stat reports")
+    parser.add_argument("--seasons", type=int, nargs="+", help="Seasons to report (default: all)")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["csv", "html"])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Seasons computed at once")
+    parser.add_argument("--min-ab", type=int, default=20, help="At-bats to qualify for rate-stat awards")
+    parser.add_argument("--min-ip", type=float, default=10, help="Innings to qualify for ERA/WHIP awards")
+    args = parser.parse_args()
+
+    formats = list(args.formats)
+    if "parquet" in formats and not have_parquet():
+        print("Parquet output needs pyarrow (pip install pyarrow); skipping parquet")
+        formats.remove("parquet")
+
+    seasons = season_games(get_db())
+    wanted = args.seasons or sorted(seasons)
+    missing = [season for season in wanted if season not in seasons]
+    if missing:
+        print(f"No games found for: {', '.join(map(str, missing))}")
+    wanted = [season for season in wanted if season in seasons]
+    if not wanted:
+        return
+
+    start = time.perf_counter()
+    jobs = [(season, seasons[season], args.output_dir, formats, args.min_ab, args.min_ip) for season in wanted]
+    if args.workers <= 1 or len(jobs) == 1:
+        results = [run_season(*job) for job in jobs]
+    else:
+        with _pool(min(args.workers, len(jobs))) as pool:
+            futures = [pool.submit(run_season, *job) for job in jobs]
+            results = [future.result() for future in as_completed(futures)]
+
+    for result in sorted(results, key=lambda result: result["season"]):
+        print(f"{result['season']}: {result['games']} games, {result['atbats']} at-bats, "
+              f"{result['players']} hitters, {result['files']} files in {result['seconds']}s")
+    print(f"Wrote {len(results)} season(s) to {args.output_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
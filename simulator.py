@@ -0,0 +1,253 @@
+# Monte Carlo game projections.
+#
+#   python simulator.py "Ann, Bo, Cy" "Di, Ed, Flo" --games 200000 --workers 4
+#
+# Plays out whole games between two rosters (batting in the order given, like
+# a game started on Home.py) by sampling each plate appearance from that
+# batter's outcome distribution against that pitcher. Head-to-head history is
+# thin, so a matchup's distribution is its own at-bats shrunk toward what the
+# batter and pitcher do against everyone, and theirs toward the league. Runs
+# on a play are sampled from how many runs that outcome drove in with the
+# same number of runners on.
+#
+# Games are simulated in batches: every array holds one value per game, and
+# each plate appearance is one vectorized step over every game still in that
+# half-inning. Batches are seeded from one SeedSequence, so a seed gives the
+# same projection whatever the number of workers.
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_all_start_methods, get_context
+
+import numpy as np
+import pandas as pd
+
+from game_state import OUTS_PER_HALF_INNING, REGULATION_INNINGS, split_roster
+
+OUTCOMES = [
+    "Single", "Double", "Triple", "Home Run", "Ground Out", "Pop Out", "Line Out",
+    "Strike Out", "Walk", "Fielder's Choice", "Sacrifice Fly", "Double Play", "Triple Play"
+]
+HOME_RUN = OUTCOMES.index("Home Run")
+# Outs made, batters reaching base and runners put out on each outcome
+OUTS_ON_PLAY = np.array([0, 0, 0, 0, 1, 1, 1, 1, 0, 1, 1, 2, 3])
+REACHES_BASE = np.array([1, 1, 1, 1, 0, 0, 0, 0, 1, 1, 0, 0, 0])
+RUNNERS_OUT = np.array([0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 1, 2])
+MAX_RUNS = 4
+
+# League-average plate appearances blended into each player's line, and
+# player-based ones into each head-to-head matchup
+PLAYER_PRIOR_PA = 30
+MATCHUP_PRIOR_PA = 10
+# Plays of the default run rules blended into each outcome/runners cell
+RUN_PRIOR_PA = 5
+# Extra innings before a game is called a tie
+MAX_INNINGS = REGULATION_INNINGS * 2
+# Ends a half-inning that never gets its third out
+MAX_BATTERS_PER_HALF = 40
+# Games per batch (and per seed); fixed so results don't depend on workers
+BATCH_GAMES = 10000
+
+
+# ---- Counts ----
+# Both are small enough to cache beside the leaderboards and are all a
+# projection needs from the league history.
+def matchup_counts(atbats):
+    # batter, pitcher, outcome, count
+    known = atbats[atbats["outcome"].isin(OUTCOMES)]
+    return known.groupby(["batter", "pitcher", "outcome"]).size().rename("count").reset_index()
+
+
+def run_counts(atbats):
+    # outcome, runners_on, rbi, count
+    known = atbats[atbats["outcome"].isin(OUTCOMES)]
+    frame = pd.DataFrame({
+        "outcome": known["outcome"],
+        "runners_on": pd.to_numeric(known["runners_on"], errors="coerce").fillna(0).clip(0, 3).astype(int),
+        "rbi": pd.to_numeric(known["rbi"], errors="coerce").fillna(0).clip(0, MAX_RUNS).astype(int),
+    })
+    return frame.groupby(["outcome", "runners_on", "rbi"]).size().rename("count").reset_index()
+
+
+# ---- Model ----
+@dataclass
+class MatchupModel:
+    players: list
+    lineups: tuple        # batting order per team, as indexes into players
+    pitcher_cdf: tuple    # per team: cumulative share of its innings each player pitches
+    outcome_cdf: np.ndarray  # [batter, pitcher, outcome]
+    run_cdf: np.ndarray      # [outcome, runners, runs]
+
+
+def _default_runs():
+    # Home runs clear the bases, a walk with the bases loaded forces one in
+    # and a sacrifice fly scores a runner; nothing else scores by default
+    runs = np.zeros((len(OUTCOMES), 4, MAX_RUNS + 1))
+    runs[:, :, 0] = 1
+    for runners in range(4):
+        runs[HOME_RUN, runners] = np.eye(MAX_RUNS + 1)[runners + 1]
+    runs[OUTCOMES.index("Walk"), 3] = np.eye(MAX_RUNS + 1)[1]
+    runs[OUTCOMES.index("Sacrifice Fly"), 1:] = np.eye(MAX_RUNS + 1)[1]
+    return runs
+
+
+def _cdf(probabilities):
+    cdf = np.cumsum(probabilities / probabilities.sum(axis=-1, keepdims=True), axis=-1)
+    cdf[..., -1] = 1.0
+    return cdf
+
+
+def _counts(frame, dimensions):
+    # Dense count array from long-form counts; rows outside dimensions dropped
+    shape = tuple(len(labels) for labels in dimensions.values())
+    counts = np.zeros(shape)
+    if frame.empty:
+        return counts
+    codes = [pd.Index(labels).get_indexer(frame[column]) for column, labels in dimensions.items()]
+    keep = np.all([code >= 0 for code in codes], axis=0)
+    np.add.at(counts, tuple(code[keep] for code in codes), frame["count"].to_numpy()[keep])
+    return counts
+
+
+def build_model(matchups, runs, team1, team2):
+    team1, team2 = split_roster(team1), split_roster(team2)
+    players = team1 + team2
+    league = _counts(matchups, {"outcome": OUTCOMES}) + 1
+    league = league / league.sum()
+
+    def shrink(counts, prior, weight):
+        return (counts + weight * prior) / (counts.sum(axis=-1, keepdims=True) + weight)
+
+    as_batter = _counts(matchups, {"batter": players, "outcome": OUTCOMES})
+    as_pitcher = _counts(matchups, {"pitcher": players, "outcome": OUTCOMES})
+    head_to_head = _counts(matchups, {"batter": players, "pitcher": players, "outcome": OUTCOMES})
+    batting = shrink(as_batter, league, PLAYER_PRIOR_PA)
+    pitching = shrink(as_pitcher, league, PLAYER_PRIOR_PA)
+    # Batter and pitcher rates combined as odds relative to the league
+    expected = batting[:, None, :] * pitching[None, :, :] / league
+    expected = expected / expected.sum(axis=-1, keepdims=True)
+    outcome_cdf = _cdf(shrink(head_to_head, expected, MATCHUP_PRIOR_PA))
+
+    run_table = _counts(runs, {"outcome": OUTCOMES, "runners_on": range(4), "rbi": range(MAX_RUNS + 1)})
+    run_cdf = _cdf(run_table + RUN_PRIOR_PA * _default_runs())
+
+    # Everyone on a team pitches, in proportion to the batters they've faced
+    faced = as_pitcher.sum(axis=1) + 1
+    lineups = (np.arange(len(team1)), np.arange(len(team1), len(players)))
+    pitcher_cdf = tuple(_cdf(faced[lineup]) for lineup in lineups)
+    return MatchupModel(players, lineups, pitcher_cdf, outcome_cdf, run_cdf)
+
+
+# ---- Simulation ----
+def _sample(rng, cdf):
+    # One draw per row of a [rows, choices] cumulative table
+    draws = (rng.random(len(cdf))[:, None] > cdf).sum(axis=1)
+    return np.minimum(draws, cdf.shape[-1] - 1)
+
+
+def _half_inning(model, rng, team, playing, score, next_batter, walk_off):
+    games = np.flatnonzero(playing)
+    fielding = 1 - team
+    lineup = model.lineups[team]
+    pitcher_picks = np.searchsorted(model.pitcher_cdf[fielding], rng.random(len(games)), side="right")
+    pitchers = model.lineups[fielding][np.minimum(pitcher_picks, len(model.lineups[fielding]) - 1)]
+    outs = np.zeros(len(games), dtype=np.int64)
+    runners = np.zeros(len(games), dtype=np.int64)
+    live = np.arange(len(games))
+
+    for _ in range(MAX_BATTERS_PER_HALF):
+        if not len(live):
+            break
+        game = games[live]
+        batters = lineup[next_batter[team, game] % len(lineup)]
+        outcome = _sample(rng, model.outcome_cdf[batters, pitchers[live]])
+        on = runners[live]
+        runs = np.minimum(_sample(rng, model.run_cdf[outcome, on]), on + (outcome == HOME_RUN))
+
+        score[team, game] += runs
+        runners[live] = np.clip(on + REACHES_BASE[outcome] - RUNNERS_OUT[outcome] - runs, 0, 3)
+        outs[live] += OUTS_ON_PLAY[outcome]
+        next_batter[team, game] += 1
+
+        done = outs[live] >= OUTS_PER_HALF_INNING
+        if walk_off:
+            done |= score[1, game] > score[0, game]
+        live = live[~done]
+
+
+def simulate_batch(model, games, seed):
+    # Runs scored by each team in each of `games` games
+    rng = np.random.default_rng(seed)
+    score = np.zeros((2, games), dtype=np.int64)
+    next_batter = np.zeros((2, games), dtype=np.int64)
+    undecided = np.ones(games, dtype=bool)
+
+    for inning in range(1, MAX_INNINGS + 1):
+        final = inning >= REGULATION_INNINGS
+        _half_inning(model, rng, 0, undecided, score, next_batter, walk_off=False)
+        # The bottom half isn't played when team 2 is already ahead
+        bottom = undecided & ~(final & (score[1] > score[0]))
+        _half_inning(model, rng, 1, bottom, score, next_batter, walk_off=final)
+        if final:
+            undecided &= score[0] == score[1]
+        if not undecided.any():
+            break
+    return score
+
+
+def _pool(workers):
+    # Forked workers skip re-importing numpy and pandas
+    context = get_context("fork") if "fork" in get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def simulate(model, games=BATCH_GAMES, seed=0, workers=1):
+    sizes = [BATCH_GAMES] * (games // BATCH_GAMES) + ([games % BATCH_GAMES] if games % BATCH_GAMES else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with _pool(min(workers, len(sizes))) as pool:
+            batches = list(pool.map(simulate_batch, [model] * len(sizes), sizes, seeds))
+    else:
+        batches = [simulate_batch(model, size, batch_seed) for size, batch_seed in zip(sizes, seeds)]
+    score = np.concatenate(batches, axis=1)
+    return summarize(score[0], score[1])
+
+
+def summarize(team1_runs, team2_runs):
+    return {
+        "games": len(team1_runs),
+        "team1_win": float(np.mean(team1_runs > team2_runs)),
+        "team2_win": float(np.mean(team2_runs > team1_runs)),
+        "tie": float(np.mean(team1_runs == team2_runs)),
+        "team1_runs": float(np.mean(team1_runs)),
+        "team2_runs": float(np.mean(team2_runs)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Project a game between two rosters")
+    parser.add_argument("team1", help="Comma-separated batting order")
+    parser.add_argument("team2", help="Comma-separated batting order")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    import arrow_fetch
+    from database import get_db
+
+    atbats = arrow_fetch.fetch_frame(get_db()["atbats"])
+    model = build_model(matchup_counts(atbats), run_counts(atbats), args.team1, args.team2)
+    start = time.perf_counter()
+    projection = simulate(model, args.games, args.seed, args.workers)
+    seconds = time.perf_counter() - start
+    print(f"Team 1 wins {projection['team1_win']:.1%}, Team 2 wins {projection['team2_win']:.1%}, "
+          f"tie {projection['tie']:.1%}")
+    print(f"Expected runs: Team 1 {projection['team1_runs']:.2f}, Team 2 {projection['team2_runs']:.2f}")
+    print(f"{projection['games']} games in {seconds:.2f}s ({projection['games'] / seconds:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
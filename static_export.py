@@ -0,0 +1,319 @@
+# Static HTML export of the read-only pages.
+#
+#   python static_export.py                      # into ./site
+#   python static_export.py --output-dir public --workers 4
+#   python static_export.py --force              # rebuild every page
+#
+# Writes every player's dashboard (career cards, game logs, a per-game
+# chart), the standings and a game log per season as plain HTML that any
+# static host can serve, so Streamlit is only needed for scoring. Stats come
+# from the same stats.py functions as the pages.
+#
+# Exports are incremental. Each page's key is built from the data versions
+# behind it: a player's page from the versions of the games they played in,
+# a season's game log from that season's games, the standings from the
+# players and at-bats versions. site/manifest.json keeps the keys, and only
+# pages whose key moved are rendered again, in parallel in a process pool.
+import argparse
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+
+import pandas as pd
+
+import arrow_fetch
+import stats
+from data_version import collection_version, get_versions
+from database import get_db
+
+# Bump when the page layout changes, so every page is rebuilt
+TEMPLATE_VERSION = 1
+MANIFEST = "manifest.json"
+PLOTLY_JS = "plotly.min.js"
+PLAYERS_PER_TASK = 8
+
+STYLE = """
+body { font-family: sans-serif; background: #0e1117; color: #fafafa; max-width: 1000px; margin: 0 auto; padding: 16px; }
+a { color: #81c784; }
+.cards { display: grid; grid-template-columns: 1fr 1fr; gap: 0 16px; }
+.card { padding: 12px; margin-bottom: 10px; border: 1px solid #333; border-radius: 8px; background-color: #1f1f2e; color: #f1f1f1; font-size: 16px; }
+table { border-collapse: collapse; margin: 8px 0; }
+td, th { padding: 4px 10px; border-bottom: 1px solid #333; text-align: right; }
+.team { padding: 10px; border-radius: 6px; color: #111; }
+.win { background-color: #81c784; }
+.loss { background-color: #ef9a9a; }
+"""
+
+# Filled in before the pool forks, so workers read the frames without them
+# being pickled for every task
+_data = {}
+
+
+# ---- Keys ----
+def _digest(*parts):
+    return hashlib.sha1(json.dumps([TEMPLATE_VERSION, *parts], default=str).encode()).hexdigest()[:16]
+
+
+def slugify(name, taken):
+    slug = re.sub(r"[^a-z0-9]+", "-", str(name).lower()).strip("-") or "player"
+    candidate, suffix = slug, 2
+    while candidate in taken:
+        candidate, suffix = f"{slug}-{suffix}", suffix + 1
+    taken.add(candidate)
+    return candidate
+
+
+def plan_pages(players, games, atbats, versions):
+    # {path: (kind, argument, key)} for every page of the site
+    game_versions = versions["games"]
+    pages = {
+        "standings.html": ("standings", None, _digest(
+            collection_version(versions, "players"), collection_version(versions, "atbats"))),
+    }
+
+    games_by_player = {}
+    for role in ("batter", "pitcher"):
+        for player, game_ids in atbats.groupby(role)["game_id"].unique().items():
+            games_by_player.setdefault(player, set()).update(game_ids)
+
+    taken = set()
+    for name in sorted(players["name"].dropna().unique()):
+        played = sorted(games_by_player.get(name, ()))
+        key = _digest(name, [(game_id, game_versions.get(game_id, 0)) for game_id in played])
+        pages[f"players/{slugify(name, taken)}.html"] = ("player", name, key)
+
+    seasons = pd.to_datetime(games["date"], errors="coerce").dt.year
+    for season, season_games in games.groupby(seasons):
+        game_ids = sorted(season_games["game_id"])
+        key = _digest(int(season), [(game_id, game_versions.get(game_id, 0)) for game_id in game_ids])
+        pages[f"games/{int(season)}.html"] = ("season", int(season), key)
+    return pages
+
+
+# ---- Rendering ----
+def _page(title, body, depth=0, charts=False):
+    root = "../" * depth
+    script = f'<script src="{root}{PLOTLY_JS}"></script>' if charts else ""
+    return (
+        "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title><style>{STYLE}</style>{script}</head><body>\n"
+        f'<p><a href="{root}index.html">Home</a> · <a href="{root}standings.html">Standings</a></p>\n'
+        f"<h1>{html.escape(title)}</h1>\n{body}\n</body></html>\n"
+    )
+
+
+def _table(frame):
+    if frame.empty:
+        return "<p>None.</p>"
+    return frame.to_html(index=False, na_rep="", border=0)
+
+
+def _cards(pairs):
+    cards = [f'<div class="card"><b>{html.escape(label)}</b> {html.escape(str(value))}</div>' for label, value in pairs]
+    half = (len(cards) + 1) // 2
+    return f'<div class="cards"><div>{"".join(cards[:half])}</div><div>{"".join(cards[half:])}</div></div>'
+
+
+def _hitting_chart(game_log):
+    import plotly.express as px
+    chart = game_log.assign(**{"Cumulative AVG": (game_log["Hits"].cumsum() / game_log["At-Bats"].cumsum()).round(3)})
+    fig = px.line(chart, x="date", y="Cumulative AVG", markers=True, title="Batting Average by Game")
+    fig.update_layout(template="plotly_dark", height=320, margin=dict(l=40, r=20, t=50, b=40))
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def render_player(name):
+    atbats, games = _data["atbats"], _data["games"]
+    batting = atbats[atbats["batter"] == name]
+    pitching_rows = atbats[atbats["pitcher"] == name]
+    hitting = stats.hitting_summary(batting)
+    pitching = stats.pitching_summary(pitching_rows)
+    hitting_log = stats.hitting_game_log(batting, games)
+    pitching_log = stats.pitching_game_log(pitching_rows, games)
+
+    body = ["<h2>Career Hitting Stats</h2>", _cards([
+        ("Games Played:", hitting["games"]), ("At-Bats:", hitting["ab"]), ("Hits:", hitting["hits"]),
+        ("AVG:", f"{hitting['avg']:.3f}"), ("OBP:", f"{hitting['obp']:.3f}"), ("SLG:", f"{hitting['slg']:.3f}"),
+        ("Extra-Base Hits (XBH):", hitting["xbh"]), ("Sacrifice Fly:", hitting["sac_flies"]),
+        ("RBIs:", int(hitting["rbi"])), ("Walks:", hitting["walks"]), ("Strikeouts:", hitting["strikeouts"]),
+        ("Singles:", hitting["singles"]), ("Doubles:", hitting["doubles"]), ("Triples:", hitting["triples"]),
+        ("Home Runs:", hitting["home_runs"]), ("K%:", hitting["k_rate"]),
+    ])]
+    if not hitting_log.empty:
+        body += [_hitting_chart(hitting_log), "<details><summary>Hitting Game Log</summary>", _table(hitting_log), "</details>"]
+    else:
+        body.append("<p>No hitting game log data available for this player.</p>")
+
+    body += ["<h2>Career Pitching Stats</h2>", _cards([
+        ("Games Pitched:", pitching["games"]), ("Innings Pitched:", f"{pitching['innings_pitched']:.1f}"),
+        ("Earned Runs:", int(pitching["earned_runs"])), ("ERA:", f"{pitching['era']:.2f}"),
+        ("Total Outs:", pitching["total_outs"]), ("Hits Allowed:", pitching["hits_allowed"]),
+        ("Walks Allowed:", pitching["walks_allowed"]), ("Total Strikes:", pitching["strikes"]),
+        ("Home Runs Allowed:", pitching["home_runs_allowed"]), ("Strikeouts:", pitching["strikeouts"]),
+        ("Double Plays:", pitching["double_plays"]), ("K%:", f"{pitching['k_rate']:.1f}%"),
+        ("WHIP:", f"{pitching['whip']:.2f}"), ("K/9:", f"{pitching['k_per_9']:.2f}"),
+        ("HR/9:", f"{pitching['hr_per_9']:.2f}"), ("Total Balls:", pitching["balls"]),
+    ])]
+    if not pitching_log.empty:
+        body += ["<details><summary>Pitching Game Log</summary>", _table(pitching_log), "</details>"]
+    else:
+        body.append("<p>No pitching game log data available for this player.</p>")
+    return _page(f"{name}'s Dashboard", "\n".join(body), depth=1, charts=not hitting_log.empty)
+
+
+def render_standings():
+    leaderboard = stats.standings_leaderboard(_data["players"], _data["atbats"])
+    body = ["<p>Sorted by AVG; pitchers by ERA.</p>"]
+    if leaderboard.empty:
+        body.append("<p>No data available yet.</p>")
+    else:
+        hitting = leaderboard[["Player", "AVG", "OBP", "HR", "1B", "2B", "3B", "RBIs", "BB", "K%"]]
+        pitching = leaderboard[["Player", "ERA", "WHIP", "Hits Allowed", "HR Allowed", "K%_P"]].dropna(subset=["ERA"])
+        body += ["<h2>Hitting</h2>", _table(hitting.sort_values("AVG", ascending=False)),
+                 "<h2>Pitching</h2>", _table(pitching.sort_values("ERA").rename(columns={"K%_P": "K%"}))]
+    return _page("League Standings", "\n".join(body))
+
+
+def render_season(season):
+    atbats, games = _data["atbats"], _data["games"]
+    season_games = games[pd.to_datetime(games["date"], errors="coerce").dt.year == season].iloc[::-1].reset_index(drop=True)
+    body = []
+    for i, row in season_games.iterrows():
+        try:
+            team1_score = int(float(row.get("team1_score", 0)))
+            team2_score = int(float(row.get("team2_score", 0)))
+        except ValueError:
+            team1_score = team2_score = 0
+        team1, team2 = row["team1"], row["team2"]
+        winner = team1 if team1_score > team2_score else team2 if team2_score > team1_score else "Draw"
+        team1_class = "win" if winner == team1 else "loss" if winner == team2 else ""
+        team2_class = "win" if winner == team2 else "loss" if winner == team1 else ""
+        plays = stats.scoring_plays(atbats, row)
+        if not plays.empty:
+            plays = plays.assign(Event=plays["Event"].map(
+                lambda event: re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(event))))
+        body += [
+            f"<h3>Match {len(season_games) - i}:</h3>",
+            f"<p><b>Date</b>: {html.escape(str(row['date']))}</p>",
+            f'<div class="cards"><div class="team {team1_class}"><strong>{html.escape(str(team1))}</strong> — Score: {team1_score}</div>'
+            f'<div class="team {team2_class}"><strong>{html.escape(str(team2))}</strong> — Score: {team2_score}</div></div>',
+            f"<p><b>Winner</b>: {html.escape(str(winner))}</p>",
+            "<details><summary>Scoring Plays</summary>",
+            plays.to_html(index=False, border=0, escape=False) if not plays.empty else "<p>No scoring plays recorded for this game.</p>",
+            "</details>",
+        ]
+    body += [f"<h2>Player W/L Records — {season}</h2>", _table(stats.player_records(season_games))]
+    return _page(f"Match History Log — {season}", "\n".join(body), depth=1)
+
+
+RENDERERS = {"player": render_player, "standings": lambda _: render_standings(), "season": render_season}
+
+
+def render_batch(output_dir, batch):
+    # Renders [(path, kind, argument)] into output_dir; runs in a worker
+    for path, kind, argument in batch:
+        target = Path(output_dir) / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_suffix(".tmp")
+        temporary.write_text(RENDERERS[kind](argument))
+        os.replace(temporary, target)
+    return len(batch)
+
+
+def render_index(pages):
+    players = sorted((argument, path) for path, (kind, argument, _) in pages.items() if kind == "player")
+    seasons = sorted(((argument, path) for path, (kind, argument, _) in pages.items() if kind == "season"), reverse=True)
+    body = [
+        "<h2>Game Logs</h2><ul>",
+        *[f'<li><a href="{path}">{season}</a></li>' for season, path in seasons],
+        "</ul><h2>Players</h2><ul>",
+        *[f'<li><a href="{path}">{html.escape(name)}</a></li>' for name, path in players],
+        "</ul>",
+    ]
+    return _page("Wiffle Ball Stats", "\n".join(body))
+
+
+# ---- Export ----
+def load(db):
+    players = pd.DataFrame(list(db["players"].find({}, {"name": 1, "_id": 0})))
+    games = pd.DataFrame(list(db["games"].find({}, {"state": 0, "ended_innings": 0})))
+    atbats = arrow_fetch.fetch_frame(db["atbats"])
+    if players.empty:
+        players = pd.DataFrame(columns=["name"])
+    if games.empty:
+        games = pd.DataFrame(columns=["game_id", "date", "team1", "team2", "team1_players", "team2_players"])
+    return players, games, atbats
+
+
+def _pool(workers):
+    context = get_context("fork") if "fork" in get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def export(output_dir, workers=1, force=False):
+    # Returns (pages rendered, pages kept, pages removed)
+    output = Path(output_dir)
+    manifest_path = output / MANIFEST
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() and not force else {}
+
+    db = get_db()
+    versions = get_versions(db, include_games=True)
+    if manifest.get("version") == versions["version"] and manifest.get("template") == TEMPLATE_VERSION:
+        # Nothing was written since the last export
+        return 0, len(manifest.get("pages", {})), 0
+
+    players, games, atbats = load(db)
+    pages = plan_pages(players, games, atbats, versions)
+    previous = manifest.get("pages", {})
+    stale = [(path, kind, argument) for path, (kind, argument, key) in pages.items()
+             if previous.get(path) != key or not (output / path).exists()]
+
+    output.mkdir(parents=True, exist_ok=True)
+    plotly_js = output / PLOTLY_JS
+    if not plotly_js.exists():
+        from plotly.offline import get_plotlyjs
+        plotly_js.write_text(get_plotlyjs())
+
+    _data.update(players=players, games=games, atbats=atbats)
+    batches = [stale[start:start + PLAYERS_PER_TASK] for start in range(0, len(stale), PLAYERS_PER_TASK)]
+    if workers <= 1 or len(batches) <= 1:
+        for batch in batches:
+            render_batch(output, batch)
+    else:
+        with _pool(min(workers, len(batches))) as pool:
+            list(pool.map(render_batch, [output] * len(batches), batches))
+
+    removed = [path for path in previous if path not in pages]
+    for path in removed:
+        (output / path).unlink(missing_ok=True)
+    (output / "index.html").write_text(render_index(pages))
+    manifest_path.write_text(json.dumps({
+        "version": versions["version"],
+        "template": TEMPLATE_VERSION,
+        "exported_at": time.time(),
+        "pages": {path: key for path, (_, _, key) in pages.items()},
+    }, indent=1))
+    return len(stale), len(pages) - len(stale), len(removed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the stat pages as a static site")
+    parser.add_argument("--output-dir", default="site")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="Render every page, ignoring the manifest")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rendered, kept, removed = export(args.output_dir, workers=args.workers, force=args.force)
+    print(f"Rendered {rendered} page(s), {kept} unchanged, {removed} removed "
+          f"in {time.perf_counter() - start:.1f}s -> {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+# Stat calculations used by the pages.
+#
+# Kept free of Streamlit so the same code the pages render can be timed by
+# the benchmark suite and reused by scripts.
+#
+# Every stat is keyed on player names (batter, pitcher, the roster arrays).
+# Ids are not needed here: player_ids.rename_player rewrites a renamed
+# player's name on every record, so their history stays under one name.
+import numpy as np
+import pandas as pd
+
+from game_state import split_roster
+
+HIT_OUTCOMES = ["Single", "Double", "Triple", "Home Run"]
+
+
+# ---- Standings ----
+def standings_leaderboard(players, atbats):
+    leaderboard = []
+
+    # One grouping pass instead of comparing every at-bat per player
+    batting_groups = dict(tuple(atbats.groupby("batter", sort=False)))
+    pitching_groups = dict(tuple(atbats.groupby("pitcher", sort=False)))
+    no_atbats = atbats.iloc[:0]
+
+    for player in players["name"].unique():
+        player_batting = batting_groups.get(player, no_atbats)
+        player_pitching = pitching_groups.get(player, no_atbats)
+
+        # Hitting stats
+        num_at_bats = len(player_batting)
+        hits = player_batting["outcome"].isin(HIT_OUTCOMES).sum()
+        walks = player_batting["outcome"].eq("Walk").sum()
+        strikeouts = player_batting["outcome"].eq("Strike Out").sum()
+        singles = player_batting["outcome"].eq("Single").sum()
+        doubles = player_batting["outcome"].eq("Double").sum()
+        triples = player_batting["outcome"].eq("Triple").sum()
+        home_runs = player_batting["outcome"].eq("Home Run").sum()
+        rbis = player_batting["rbi"].sum()
+
+        batting_average = hits / num_at_bats if num_at_bats else 0
+        obp = (hits + walks) / (num_at_bats + walks) if (num_at_bats + walks) else 0
+        k_rate_bat = (strikeouts / num_at_bats * 100) if num_at_bats else 0
+
+        # Pitching stats
+        total_outs = player_pitching["outs_recorded"].sum()
+        innings_pitched = total_outs / 3
+        hits_allowed = player_pitching["outcome"].isin(HIT_OUTCOMES).sum()
+        walks_allowed = player_pitching["outcome"].eq("Walk").sum()
+        strikeouts_pitched = player_pitching["outcome"].eq("Strike Out").sum()
+        home_runs_allowed = player_pitching["outcome"].eq("Home Run").sum()
+        batters_faced = len(player_pitching)
+        earned_runs = player_pitching["rbi"].sum()
+
+        era = (earned_runs / innings_pitched * 9) if innings_pitched else np.nan
+        whip = (walks_allowed + hits_allowed) / innings_pitched if innings_pitched else np.nan
+        k_rate_pit = (strikeouts_pitched / batters_faced * 100) if batters_faced else np.nan
+
+        leaderboard.append({
+            "Player": player,
+            "AVG": round(batting_average, 3),
+            "OBP": round(obp, 3),
+            "HR": home_runs,
+            "1B": singles,
+            "2B": doubles,
+            "3B": triples,
+            "RBIs": rbis,
+            "BB": walks,
+            "K%": round(k_rate_bat, 2),
+            "ERA": round(era, 2) if not np.isnan(era) else None,
+            "WHIP": round(whip, 2) if not np.isnan(whip) else None,
+            "Hits Allowed": hits_allowed,
+            "HR Allowed": home_runs_allowed,
+            "K%_P": round(k_rate_pit, 2) if not np.isnan(k_rate_pit) else None,
+        })
+
+    return pd.DataFrame(leaderboard)
+
+
+# ---- Visualizations ----
+def calculate_all_player_stats(atbats):
+    player_stats = {}
+
+    for player in pd.unique(atbats['batter'].dropna()):
+        player_df = atbats[atbats['batter'] == player]
+        ab = len(player_df)
+        hits = player_df["outcome"].isin(HIT_OUTCOMES).sum()
+        walks = player_df["outcome"].eq("Walk").sum()
+        singles = player_df["outcome"].eq("Single").sum()
+        doubles = player_df["outcome"].eq("Double").sum()
+        triples = player_df["outcome"].eq("Triple").sum()
+        home_runs = player_df["outcome"].eq("Home Run").sum()
+        strikeouts = player_df["outcome"].eq("Strike Out").sum()
+        rbis = player_df["rbi"].sum()
+        avg = hits / ab if ab else 0
+        obp = (hits + walks) / (ab + walks) if (ab + walks) else 0
+        slg = (singles + 2*doubles + 3*triples + 4*home_runs) / ab if ab else 0
+
+        player_stats[player] = {
+            "name": player,
+            "AB": ab,
+            "H": hits,
+            "BB": walks,
+            "1B": singles,
+            "2B": doubles,
+            "3B": triples,
+            "HR": home_runs,
+            "K": strikeouts,
+            "RBI": rbis,
+            "AVG": round(avg, 3),
+            "OBP": round(obp, 3),
+            "SLG": round(slg, 3)
+        }
+
+    return pd.DataFrame(player_stats).T.reset_index(drop=True)
+
+
+def calculate_pitcher_stats(atbats):
+    pitcher_stats = {}
+
+    for pitcher in pd.unique(atbats['pitcher'].dropna()):
+        pitcher_df = atbats[atbats["pitcher"] == pitcher]
+        outs = pitcher_df["outs_recorded"].sum()
+        ip = outs / 3
+        walks = pitcher_df["outcome"].eq("Walk").sum()
+        hits = pitcher_df["outcome"].isin(HIT_OUTCOMES).sum()
+        hr = pitcher_df["outcome"].eq("Home Run").sum()
+        k = pitcher_df["outcome"].eq("Strike Out").sum()
+        er = pitcher_df["rbi"].sum()
+
+        era = (er / ip * 9) if ip else 0
+        whip = (walks + hits) / ip if ip else 0
+        k9 = (k * 9) / ip if ip else 0
+
+        pitcher_stats[pitcher] = {
+            "name": pitcher,
+            "IP": ip,
+            "H": hits,
+            "HR": hr,
+            "BB": walks,
+            "K": k,
+            "ER": er,
+            "ERA": round(era, 2),
+            "WHIP": round(whip, 2),
+            "K/9": round(k9, 2)
+        }
+
+    return pd.DataFrame(pitcher_stats).T.reset_index(drop=True)
+
+
+# ---- Player Dashboard / Matchups ----
+def hitting_summary(data):
+    ab = data.shape[0]
+    hits = data["outcome"].isin(HIT_OUTCOMES).sum()
+    walks = data["outcome"].eq("Walk").sum()
+    singles = data["outcome"].eq("Single").sum()
+    doubles = data["outcome"].eq("Double").sum()
+    triples = data["outcome"].eq("Triple").sum()
+    home_runs = data["outcome"].eq("Home Run").sum()
+    strikeouts = data["outcome"].eq("Strike Out").sum()
+    return {
+        "games": data["game_id"].nunique(),
+        "ab": ab,
+        "hits": hits,
+        "walks": walks,
+        "singles": singles,
+        "doubles": doubles,
+        "triples": triples,
+        "home_runs": home_runs,
+        "strikeouts": strikeouts,
+        "rbi": data["rbi"].sum(),
+        "sac_flies": data["outcome"].eq("Sacrifice Fly").sum(),
+        "xbh": data["outcome"].isin(["Double", "Triple", "Home Run"]).sum(),
+        "avg": hits / ab if ab else 0,
+        "obp": (hits + walks) / (ab + walks) if (ab + walks) else 0,
+        "slg": (singles + 2 * doubles + 3 * triples + 4 * home_runs) / ab if ab else 0,
+        "k_rate": round((strikeouts / ab) * 100, 2) if ab else 0,
+    }
+
+
+def pitching_summary(data):
+    total_outs = data["outs_recorded"].sum()
+    innings_pitched = total_outs / 3
+    walks_allowed = data["outcome"].eq("Walk").sum()
+    strikeouts_pitched = data["outcome"].eq("Strike Out").sum()
+    hits_allowed = data["outcome"].isin(HIT_OUTCOMES).sum()
+    home_runs_allowed = data["outcome"].eq("Home Run").sum()
+    batters_faced = data.shape[0]
+    earned_runs = data["rbi"].sum()
+    return {
+        "games": data["game_id"].nunique(),
+        "total_outs": total_outs,
+        "innings_pitched": innings_pitched,
+        "walks_allowed": walks_allowed,
+        "strikeouts": strikeouts_pitched,
+        "hits_allowed": hits_allowed,
+        "home_runs_allowed": home_runs_allowed,
+        "double_plays": data["outcome"].eq("Double Play").sum(),
+        "batters_faced": batters_faced,
+        "strikes": data["strikes"].sum(),
+        "balls": data["balls"].sum(),
+        "earned_runs": earned_runs,
+        "k_rate": (strikeouts_pitched / batters_faced * 100) if batters_faced else 0,
+        "whip": (walks_allowed + hits_allowed) / innings_pitched if innings_pitched else 0,
+        "k_per_9": (strikeouts_pitched * 9) / innings_pitched if innings_pitched else 0,
+        "hr_per_9": (home_runs_allowed * 9) / innings_pitched if innings_pitched else 0,
+        "era": (earned_runs / innings_pitched * 9) if innings_pitched else 0,
+    }
+
+
+def _with_game_dates(game_log_df, games):
+    game_log_df = game_log_df.merge(games[["game_id", "date"]], left_on="Game ID", right_on="game_id", how="left")
+    game_log_df["date"] = pd.to_datetime(game_log_df["date"])
+    game_log_df = game_log_df.sort_values(by="date")
+    game_log_df.drop(columns=["game_id"], inplace=True)
+
+    # Moves date to the first column of the game log
+    cols = game_log_df.columns.tolist()
+    cols.insert(0, cols.pop(cols.index("date")))
+    return game_log_df[cols]
+
+
+def hitting_game_log(player_batting, games):
+    hitting_game_log = []
+    num_at_bats = len(player_batting)
+
+    for game_id, group in player_batting.groupby("game_id"):
+        at_bats = len(group)
+        hits = group["outcome"].isin(HIT_OUTCOMES).sum()
+        singles = group["outcome"].eq("Single").sum()
+        doubles = group["outcome"].eq("Double").sum()
+        triples = group["outcome"].eq("Triple").sum()
+        home_runs = group["outcome"].eq("Home Run").sum()
+        walks = group["outcome"].eq("Walk").sum()
+        strikeouts = group["outcome"].eq("Strike Out").sum()
+        sacrifice_flies = group["outcome"].eq("Sacrifice Fly").sum()
+        xbh = doubles + triples + home_runs
+        rbis = group["rbi"].sum()
+        avg = hits / at_bats if at_bats else 0
+        obp = (hits + walks) / (at_bats + walks) if (at_bats + walks) else 0
+        slg = (singles + 2*doubles + 3*triples + 4*home_runs) / at_bats if at_bats else 0
+        k_rate = round((strikeouts / num_at_bats) * 100, 2) if num_at_bats else 0
+
+        hitting_game_log.append({
+            "Game ID": game_id,
+            "At-Bats": at_bats,
+            "Hits": hits,
+            "Singles": singles,
+            "Doubles": doubles,
+            "Triples": triples,
+            "Home Runs": home_runs,
+            "XBH": xbh,
+            "Walks": walks,
+            "Strikeouts": strikeouts,
+            "Sac Flies": sacrifice_flies,
+            "RBIs": int(rbis),
+            "AVG": round(avg, 3),
+            "OBP": round(obp, 3),
+            "SLG": round(slg, 3),
+            "K%": k_rate
+        })
+
+    hitting_game_log_df = pd.DataFrame(hitting_game_log)
+    if hitting_game_log_df.empty:
+        return hitting_game_log_df
+    return _with_game_dates(hitting_game_log_df, games)
+
+
+def pitching_game_log(player_pitching, games):
+    pitching_game_log = []
+
+    for game_id, group in player_pitching.groupby("game_id"):
+        outs = group["outs_recorded"].sum()
+        ip = outs / 3
+        walks = group["outcome"].eq("Walk").sum()
+        strikeouts = group["outcome"].eq("Strike Out").sum()
+        home_runs = group["outcome"].eq("Home Run").sum()
+        double_plays = group["outcome"].eq("Double Play").sum()
+        triple_plays = group["outcome"].eq("Triple Play").sum()
+        earned_runs = group["rbi"].sum()
+        totalstrikes = group["strikes"].sum()
+        totalballs = group["balls"].sum()
+        era = (earned_runs / ip * 9) if ip else 0
+        whip = (walks + group["outcome"].isin(HIT_OUTCOMES).sum()) / ip if ip else 0
+        k9 = (strikeouts / ip * 9) if ip else 0
+        hr9 = (home_runs / ip * 9) if ip else 0
+
+        pitching_game_log.append({
+            "Game ID": game_id,
+            "Innings Pitched": round(ip, 1),
+            "ERA": round(era, 2),
+            "Outs": outs,
+            "Earned Runs": int(earned_runs),
+            "Walks": walks,
+            "Strikeouts": strikeouts,
+            "Home Runs": home_runs,
+            "Double Plays": double_plays,
+            "Triple Plays": triple_plays,
+            "WHIP": round(whip, 2),
+            "K/9": round(k9, 2),
+            "HR/9": round(hr9, 2),
+            "Balls": totalballs,
+            "Strikes": totalstrikes
+        })
+
+    pitching_game_log_df = pd.DataFrame(pitching_game_log)
+    if pitching_game_log_df.empty:
+        return pitching_game_log_df
+    return _with_game_dates(pitching_game_log_df, games)
+
+
+def head_to_head(atbats, player1, player2):
+    # (player1 hitting, player1 pitching, player2 hitting, player2 pitching)
+    matchups = atbats[((atbats["batter"] == player1) & (atbats["pitcher"] == player2)) |
+                      ((atbats["batter"] == player2) & (atbats["pitcher"] == player1))]
+    player1_hitting = matchups[(matchups["batter"] == player1) & (matchups["pitcher"] == player2)]
+    player2_hitting = matchups[(matchups["batter"] == player2) & (matchups["pitcher"] == player1)]
+    return player1_hitting, player2_hitting, player2_hitting, player1_hitting
+
+
+# ---- Game Log ----
+def scoring_plays(atbats, game):
+    plays = atbats[(atbats["game_id"] == game["game_id"]) & (atbats["rbi"] > 0)]
+
+    # Rosters are name arrays (or comma strings on older games)
+    team1_players = split_roster(game["team1_players"])
+    team2_players = split_roster(game["team2_players"])
+
+    # Running score
+    team1_score = 0
+    team2_score = 0
+    play_rows = []
+    for _, play in plays.iterrows():
+        inning_label = play["inning"] if pd.notna(play["inning"]) else "?"
+        batter = play["batter"]
+        rbi = int(play.get("rbi", 0))
+
+        # Determine team scoring
+        if batter in team1_players:
+            team1_score += rbi
+        elif batter in team2_players:
+            team2_score += rbi
+
+        play_rows.append({
+            "Inning": inning_label,
+            "Event": f"**{batter}** — {play['outcome']}",
+            "Score": f"{team1_score}-{team2_score}"
+        })
+    return pd.DataFrame(play_rows)
+
+
+def player_records(games):
+    results = {}
+    # Live games carry running scores too; only finished games count
+    finished = games[games.reindex(columns=["status"])["status"].eq("completed")]
+
+    for _, row in finished.iterrows():
+        try:
+            team1_score = int(float(row.get("team1_score", 0)))
+            team2_score = int(float(row.get("team2_score", 0)))
+        except ValueError:
+            continue
+
+        team1_players = split_roster(row["team1_players"])
+        team2_players = split_roster(row["team2_players"])
+
+        if team1_score != team2_score:
+            winners, losers = (team1_players, team2_players) if team1_score > team2_score else (team2_players, team1_players)
+            for p in winners:
+                results.setdefault(p, {"Wins": 0, "Losses": 0, "Draws": 0})["Wins"] += 1
+            for p in losers:
+                results.setdefault(p, {"Wins": 0, "Losses": 0, "Draws": 0})["Losses"] += 1
+        else:
+            for p in team1_players + team2_players:
+                results.setdefault(p, {"Wins": 0, "Losses": 0, "Draws": 0})["Draws"] += 1
+
+    data = []
+    for player, record in results.items():
+        wins = record["Wins"]
+        losses = record["Losses"]
+        draws = record["Draws"]
+        games_played = wins + losses
+        win_pct = round(wins / games_played, 2) if games_played else 0.0
+        data.append([player, wins, draws, losses, games_played, win_pct])
+
+    standings_df = pd.DataFrame(data, columns=["Player", "Wins", "Draws", "Losses", "Games Played", "Win %"])
+    return standings_df.sort_values(by=["Wins", "Win %"], ascending=[False, False]).reset_index(drop=True)
@@ -0,0 +1,339 @@
+# Read-only JSON API over the league stats.
+#
+#   python stats_api.py                      # http://127.0.0.1:8502
+#   MONGO_URI=memory:// python stats_api.py --port 9000
+#
+# For the league website, bots and anything else that used to scrape the
+# pages. Runs beside the Streamlit app on the same database and computes
+# everything with the same stats.py functions the pages use.
+#
+# Each response has an ETag built from the data versions it depends on, so a
+# client that sends If-None-Match gets a 304 after one small read of the
+# version document, with no collection loads and no stats. Frames are reloaded
+# only when their collection's version moves, and rendered bodies are kept
+# per ETag, so unconditional repeats are cheap too.
+#
+#   GET /standings
+#   GET /players
+#   GET /players/<name>              career hitting and pitching
+#   GET /players/<name>/games        hitting and pitching game logs
+#   GET /matchups?player1=<a>&player2=<b>
+#   GET /games[?year=<yyyy>]
+#   GET /games/<game_id>             box score
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+import arrow_fetch
+import stats
+from data_version import collection_version, game_version, get_versions
+from database import COLUMNAR_SCHEMAS, FETCH_PATH, get_db
+
+DEFAULT_PORT = int(os.getenv("STATS_API_PORT", "8502"))
+# Rendered bodies kept for repeat requests, keyed by ETag
+CACHED_BODIES = 256
+# Smaller bodies aren't worth compressing
+GZIP_MIN_BYTES = 1024
+
+logger = logging.getLogger("wiffle.api")
+
+_frames = {}
+_frames_lock = threading.Lock()
+_bodies = OrderedDict()
+_bodies_lock = threading.Lock()
+
+
+class NotFound(Exception):
+    pass
+
+
+# ---- Data ----
+def _fetch(db, name):
+    collection = db[name]
+    if FETCH_PATH == "columnar" and name in COLUMNAR_SCHEMAS:
+        return arrow_fetch.fetch_frame(collection, schema=COLUMNAR_SCHEMAS[name])
+    return pd.DataFrame(list(collection.find()))
+
+
+def frames(db, versions, *names):
+    # The named collections at the given versions; a collection is only
+    # fetched again once its version has moved
+    with _frames_lock:
+        for name in names:
+            version = collection_version(versions, name)
+            if name not in _frames or _frames[name][0] != version:
+                _frames[name] = (version, _fetch(db, name))
+        return [_frames[name][1] for name in names]
+
+
+def records(frame):
+    # NaN -> null, numpy scalars -> numbers, dates -> ISO strings
+    if frame.empty:
+        return []
+    return json.loads(frame.drop(columns=["_id"], errors="ignore").to_json(orient="records", date_format="iso"))
+
+
+def _plain(value):
+    # Summaries hold numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _player_names(players):
+    return players["name"].dropna().tolist() if "name" in players.columns else []
+
+
+def _require_player(players, name):
+    if name not in _player_names(players):
+        raise NotFound(f"No player named '{name}'")
+
+
+# ---- Endpoints ----
+# Each route names the collections its response depends on (for the ETag)
+# and a handler(db, versions, params, *path_parts) returning the payload.
+def standings(db, versions, params):
+    players, atbats = frames(db, versions, "players", "atbats")
+    return {"standings": records(stats.standings_leaderboard(players, atbats))}
+
+
+def player_list(db, versions, params):
+    players, = frames(db, versions, "players")
+    return {"players": _player_names(players)}
+
+
+def player_career(db, versions, params, name):
+    players, atbats = frames(db, versions, "players", "atbats")
+    _require_player(players, name)
+    return {
+        "player": name,
+        "hitting": stats.hitting_summary(atbats[atbats["batter"] == name]),
+        "pitching": stats.pitching_summary(atbats[atbats["pitcher"] == name]),
+    }
+
+
+def player_games(db, versions, params, name):
+    players, atbats, games = frames(db, versions, "players", "atbats", "games")
+    _require_player(players, name)
+    return {
+        "player": name,
+        "hitting": records(stats.hitting_game_log(atbats[atbats["batter"] == name], games)),
+        "pitching": records(stats.pitching_game_log(atbats[atbats["pitcher"] == name], games)),
+    }
+
+
+def matchups(db, versions, params):
+    player1 = params.get("player1", [None])[0]
+    player2 = params.get("player2", [None])[0]
+    if not player1 or not player2:
+        raise ValueError("Both player1 and player2 are required")
+    players, atbats = frames(db, versions, "players", "atbats")
+    _require_player(players, player1)
+    _require_player(players, player2)
+    player1_hitting, player1_pitching, player2_hitting, player2_pitching = stats.head_to_head(atbats, player1, player2)
+    return {
+        "player1": {
+            "name": player1,
+            "hitting": stats.hitting_summary(player1_hitting),
+            "pitching": stats.pitching_summary(player1_pitching),
+        },
+        "player2": {
+            "name": player2,
+            "hitting": stats.hitting_summary(player2_hitting),
+            "pitching": stats.pitching_summary(player2_pitching),
+        },
+    }
+
+
+GAME_FIELDS = ["game_id", "date", "status", "team1", "team2", "team1_score", "team2_score"]
+
+
+def game_list(db, versions, params):
+    games, = frames(db, versions, "games")
+    games = games.reindex(columns=GAME_FIELDS)
+    year = params.get("year", [None])[0]
+    if year:
+        games = games[pd.to_datetime(games["date"], errors="coerce").dt.year == int(year)]
+    return {"games": records(games)}
+
+
+def box_score(db, versions, params, game_id):
+    atbats, games = frames(db, versions, "atbats", "games")
+    matches = games[games["game_id"] == game_id]
+    if matches.empty:
+        raise NotFound(f"No game '{game_id}'")
+    game = matches.iloc[0]
+    game_atbats = atbats[atbats["game_id"] == game_id]
+    return {
+        "game": records(matches.reindex(columns=GAME_FIELDS))[0],
+        "batting": [
+            dict(player=batter, **stats.hitting_summary(group))
+            for batter, group in game_atbats.groupby("batter", sort=True)
+        ],
+        "pitching": [
+            dict(player=pitcher, **stats.pitching_summary(group))
+            for pitcher, group in game_atbats.groupby("pitcher", sort=True)
+        ],
+        "scoring_plays": records(stats.scoring_plays(atbats, game)),
+        "atbats": records(game_atbats),
+    }
+
+
+ROUTES = {
+    ("standings",): (("players", "atbats"), standings),
+    ("players",): (("players",), player_list),
+    ("players", None): (("players", "atbats"), player_career),
+    ("players", None, "games"): (("players", "atbats", "games"), player_games),
+    ("matchups",): (("players", "atbats"), matchups),
+    ("games",): (("games",), game_list),
+    ("games", None): (None, box_score),
+}
+
+
+def route(path):
+    # (dependencies, handler, path arguments) or None; None in a route
+    # pattern matches any single path segment
+    parts = tuple(unquote(part) for part in path.strip("/").split("/") if part)
+    for pattern, (depends, handler) in ROUTES.items():
+        if len(pattern) == len(parts) and all(p is None or p == part for p, part in zip(pattern, parts)):
+            return depends, handler, [part for p, part in zip(pattern, parts) if p is None]
+    return None
+
+
+def etag_for(db, versions, depends, path, query, args):
+    # A box score only changes with its own game's version (and the league
+    # reset, which also moves the players version)
+    if depends is None:
+        data_key = f"game:{game_version(db, args[0])},players:{collection_version(versions, 'players')}"
+    else:
+        data_key = ",".join(f"{name}:{collection_version(versions, name)}" for name in depends)
+    digest = hashlib.sha1(f"{path}?{query}|{data_key}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _remember(etag, body):
+    with _bodies_lock:
+        _bodies[etag] = body
+        _bodies.move_to_end(etag)
+        while len(_bodies) > CACHED_BODIES:
+            _bodies.popitem(last=False)
+
+
+def _cached(etag):
+    with _bodies_lock:
+        body = _bodies.get(etag)
+        if body is not None:
+            _bodies.move_to_end(etag)
+        return body
+
+
+def _matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+# ---- Server ----
+class StatsHandler(BaseHTTPRequestHandler):
+    server_version = "WiffleStats/1.0"
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        found = route(url.path)
+        if found is None:
+            return self._error(HTTPStatus.NOT_FOUND, "Unknown endpoint", send_body)
+        depends, handler, args = found
+        try:
+            db = get_db()
+            versions = get_versions(db)
+            etag = etag_for(db, versions, depends, url.path, url.query, args)
+            if _matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self._cache_headers(etag)
+                self.end_headers()
+                return
+            body = _cached(etag)
+            if body is None:
+                payload = handler(db, versions, parse_qs(url.query), *args)
+                raw = json.dumps(payload, default=_plain, separators=(",", ":")).encode()
+                body = (raw, gzip.compress(raw) if len(raw) >= GZIP_MIN_BYTES else None)
+                _remember(etag, body)
+        except NotFound as exc:
+            return self._error(HTTPStatus.NOT_FOUND, str(exc), send_body)
+        except ValueError as exc:
+            return self._error(HTTPStatus.BAD_REQUEST, str(exc), send_body)
+        except Exception as exc:
+            logger.exception("API request failed: %s", self.path)
+            return self._error(HTTPStatus.INTERNAL_SERVER_ERROR, str(exc), send_body)
+
+        raw, compressed = body
+        use_gzip = compressed is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        content = compressed if use_gzip else raw
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self._cache_headers(etag)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(content)
+
+    def _cache_headers(self, etag):
+        # Clients may keep the body but must revalidate it each time
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "public, no-cache")
+
+    def _error(self, status, message, send_body):
+        content = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT):
+    return ThreadingHTTPServer((host, port), StatsHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve league stats as JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    server = make_server(args.host, args.port)
+    logger.info("Serving stats on http://%s:%d", args.host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Deterministic synthetic league data.
+#
+# Builds players, games and at-bats shaped exactly like the documents Home.py
+# writes, from a seed, so benchmarks and local runs (MONGO_URI=memory://) can
+# work against a league of any size. Games are played through GameState, so
+# innings, outs and scores follow the same rules as live scoring.
+import random
+from datetime import date, timedelta
+
+import counters
+import player_ids
+from game_state import GameState
+
+# Same list (and order) as the Outcome selectbox in Home.py, weighted roughly
+# like a season of recorded wiffle ball
+OUTCOME_WEIGHTS = {
+    "Single": 16,
+    "Double": 6,
+    "Triple": 1,
+    "Home Run": 4,
+    "Ground Out": 16,
+    "Pop Out": 14,
+    "Line Out": 7,
+    "Strike Out": 22,
+    "Walk": 7,
+    "Fielder's Choice": 3,
+    "Sacrifice Fly": 1,
+    "Double Play": 2,
+    "Triple Play": 1,
+}
+
+# Mirrors the outs/RBI rules in Home.py's at-bat form
+ONE_OUT_OUTCOMES = ["Ground Out", "Pop Out", "Line Out", "Strike Out", "Fielder's Choice", "Sacrifice Fly"]
+RBI_OUTCOMES = ["Single", "Double", "Triple", "Home Run", "Sacrifice Fly", "Fielder's Choice", "Walk", "Ground Out"]
+
+
+def outs_for(outcome):
+    if outcome in ONE_OUT_OUTCOMES:
+        return 1
+    if outcome == "Double Play":
+        return 2
+    if outcome == "Triple Play":
+        return 3
+    return 0
+
+
+def _rbi_for(rng, outcome, runners_on):
+    if outcome == "Home Run":
+        return 1 + runners_on
+    if outcome not in RBI_OUTCOMES or not runners_on:
+        return 0
+    return rng.randint(0, runners_on)
+
+
+def make_players(count):
+    return [{"player_id": i + 1, "name": f"Player {i + 1}", "team": ""} for i in range(count)]
+
+
+def make_league(players=40, games=100, atbats_per_game=60, team_size=3,
+                outcome_weights=None, seed=7, start_date=date(2024, 4, 1)):
+    # Returns (players, games, atbats) as lists of documents. The same
+    # arguments always produce the same league.
+    rng = random.Random(seed)
+    weights = outcome_weights or OUTCOME_WEIGHTS
+    outcomes = list(weights)
+    cumulative = []
+    total = 0
+    for outcome in outcomes:
+        total += weights[outcome]
+        cumulative.append(total)
+
+    player_docs = make_players(players)
+    names = [player["name"] for player in player_docs]
+    ids = {player["name"]: player["player_id"] for player in player_docs}
+    game_docs = []
+    atbat_docs = []
+
+    for number in range(1, games + 1):
+        game_id = f"Game_{number}"
+        roster = rng.sample(names, min(len(names), team_size * 2))
+        team1, team2 = roster[:len(roster) // 2], roster[len(roster) // 2:]
+        state = GameState(game_id=game_id, team1=team1, team2=team2)
+
+        for index in range(atbats_per_game):
+            batter = state.next_batter()
+            pitcher = rng.choice(state.roster(state.fielding_team))
+            outcome = rng.choices(outcomes, cum_weights=cumulative)[0]
+            runners_on = rng.randint(0, 3)
+            atbat = {
+                "atbat_id": f"{game_id}-{index + 1}",
+                "game_id": game_id,
+                "inning": state.inning_label,
+                "batter": batter,
+                "pitcher": pitcher,
+                "batter_id": ids[batter],
+                "pitcher_id": ids[pitcher],
+                "strikes": 3 if outcome == "Strike Out" else rng.randint(0, 2),
+                "balls": 4 if outcome == "Walk" else rng.randint(0, 3),
+                "runners_on": runners_on,
+                "outcome": outcome,
+                "outs_recorded": outs_for(outcome),
+                "rbi": _rbi_for(rng, outcome, runners_on),
+            }
+            state.record_atbat(atbat)
+            atbat_docs.append(atbat)
+        state.end_game()
+
+        game_docs.append({
+            "game_id": game_id,
+            "date": str(start_date + timedelta(days=number - 1)),
+            **player_ids.roster_fields(team1, team2, ids),
+            "status": state.status,
+            "team1_score": state.team1_score,
+            "team2_score": state.team2_score,
+            "ended_innings": list(state.ended_innings),
+            "state": state.to_snapshot(),
+            "rev": 0,
+        })
+
+    return player_docs, game_docs, atbat_docs
+
+
+def seed_database(db, batch_size=10000, **league):
+    # Replaces players, games and at-bats with a synthetic league. Only for
+    # scratch databases (the in-memory store or a benchmark database).
+    player_docs, game_docs, atbat_docs = make_league(**league)
+    for name, documents in (("players", player_docs), ("games", game_docs), ("atbats", atbat_docs)):
+        collection = db[name]
+        collection.drop()
+        for start in range(0, len(documents), batch_size):
+            collection.insert_many(documents[start:start + batch_size])
+    counters.reset_counter(db, player_ids.PLAYER_COUNTER)
+    counters.seed_counter(db, player_ids.PLAYER_COUNTER, len(player_docs))
+    return {"players": len(player_docs), "games": len(game_docs), "atbats": len(atbat_docs)}
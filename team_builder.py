@@ -0,0 +1,217 @@
+# Balanced team splits.
+#
+# Splits the players at a game into two teams of (near) equal size with the
+# smallest possible gap in total strength. A player's strength is how far
+# their career OPS and ERA are from the league's, each shrunk toward the
+# league average by how little they've played, so newcomers count as average.
+#
+# Constraints ("keep apart", "keep together") link players into groups whose
+# members must sit on fixed sides relative to each other. Each group can
+# then only be placed one way round or the other, so a split is one choice
+# per group and constraints never need checking during the search:
+#   - up to EXACT_GROUPS groups: exact branch-and-bound over those choices,
+#     pruned by the largest gap change the remaining groups could still make
+#   - more: greedy placement, then flipping the best pair of groups until no
+#     flip narrows the gap (every pair scored at once with NumPy)
+import numpy as np
+import pandas as pd
+
+from stats import HIT_OUTCOMES
+
+# Plate appearances and outs of league-average play blended into each line
+PRIOR_PA = 20
+PRIOR_OUTS = 30
+EXACT_GROUPS = 20
+# Search nodes before the exact search settles for its best split so far
+EXACT_NODES = 300000
+MAX_FLIPS = 200
+BASES = {"Single": 1, "Double": 2, "Triple": 3, "Home Run": 4}
+
+
+# ---- Strength ----
+def player_strength(atbats):
+    # Player, PA, OPS, Outs, ERA, Strength (z-scores of shrunk OPS minus ERA)
+    columns = ["Player", "PA", "OPS", "Outs", "ERA", "Strength"]
+    if atbats.empty:
+        return pd.DataFrame(columns=columns)
+    outcome = atbats["outcome"]
+    batting = pd.DataFrame({
+        "pa": 1,
+        "walks": outcome.eq("Walk").astype(int),
+        "on_base": (outcome.isin(HIT_OUTCOMES) | outcome.eq("Walk")).astype(int),
+        "bases": outcome.map(BASES).fillna(0),
+    }).groupby(atbats["batter"]).sum()
+    pitching = pd.DataFrame({
+        "outs": pd.to_numeric(atbats["outs_recorded"], errors="coerce").fillna(0),
+        "runs": pd.to_numeric(atbats["rbi"], errors="coerce").fillna(0),
+    }).groupby(atbats["pitcher"]).sum()
+
+    # The stats pages' definitions: OBP over PA + walks, SLG over PA
+    league_obp = batting["on_base"].sum() / (batting["pa"].sum() + batting["walks"].sum())
+    league_slg = batting["bases"].sum() / batting["pa"].sum()
+    league_runs = pitching["runs"].sum() / max(pitching["outs"].sum(), 1)
+    obp = (batting["on_base"] + PRIOR_PA * league_obp) / (batting["pa"] + batting["walks"] + PRIOR_PA)
+    slg = (batting["bases"] + PRIOR_PA * league_slg) / (batting["pa"] + PRIOR_PA)
+    era = (pitching["runs"] + PRIOR_OUTS * league_runs) / (pitching["outs"] + PRIOR_OUTS) * 27
+
+    board = pd.DataFrame({"PA": batting["pa"], "OPS": obp + slg, "Outs": pitching["outs"], "ERA": era})
+    board["PA"] = board["PA"].fillna(0).astype(int)
+    board["Outs"] = board["Outs"].fillna(0).astype(int)
+    board["OPS"] = board["OPS"].fillna(league_obp + league_slg)
+    board["ERA"] = board["ERA"].fillna(league_runs * 27)
+
+    def z(values):
+        spread = values.std()
+        return (values - values.mean()) / spread if spread > 0 else values * 0
+
+    board["Strength"] = (z(board["OPS"]) - z(board["ERA"])).round(3)
+    board = board.round({"OPS": 3, "ERA": 2})
+    return board.rename_axis("Player").reset_index()[columns]
+
+
+# ---- Groups ----
+def _groups(players, apart, together):
+    # Connected groups of constrained players, each split into the members
+    # on one side and those on the other; ValueError if the constraints
+    # contradict each other
+    index = {name: i for i, name in enumerate(players)}
+    links = [[] for _ in players]
+    for pairs, same in ((apart, False), (together, True)):
+        for first, second in pairs:
+            if first not in index or second not in index:
+                continue
+            if first == second:
+                if not same:
+                    raise ValueError(f"{first} can't be kept apart from themselves")
+                continue
+            links[index[first]].append((index[second], same))
+            links[index[second]].append((index[first], same))
+
+    side = [None] * len(players)
+    groups = []
+    for start in range(len(players)):
+        if side[start] is not None:
+            continue
+        side[start] = 0
+        members, stack = [start], [start]
+        while stack:
+            player = stack.pop()
+            for other, same in links[player]:
+                wanted = side[player] if same else 1 - side[player]
+                if side[other] is None:
+                    side[other] = wanted
+                    members.append(other)
+                    stack.append(other)
+                elif side[other] != wanted:
+                    raise ValueError(f"The constraints on {players[start]} and {players[other]} can't all be met")
+        groups.append(([players[i] for i in members if side[i] == 0], [players[i] for i in members if side[i] == 1]))
+    return groups
+
+
+# ---- Search ----
+def _exact(gaps, sizes, allowed):
+    # Signs (+1 keeps a group's first side on team 1) minimizing |gap| with
+    # |size difference| <= allowed; groups come largest gap first
+    count = len(gaps)
+    gap_left = np.concatenate([np.cumsum(np.abs(gaps)[::-1])[::-1], [0]]).tolist()
+    size_left = np.concatenate([np.cumsum(np.abs(sizes)[::-1])[::-1], [0]]).tolist()
+    gaps, sizes = gaps.tolist(), sizes.tolist()
+    best = {"gap": float("inf"), "signs": None}
+    signs = [1] * count
+    nodes = [0]
+
+    def search(i, gap, size):
+        nodes[0] += 1
+        if i == count:
+            if abs(size) <= allowed and abs(gap) < best["gap"]:
+                best["gap"], best["signs"] = abs(gap), list(signs)
+            return
+        if abs(size) - size_left[i] > allowed or abs(gap) - gap_left[i] >= best["gap"]:
+            return
+        if nodes[0] > EXACT_NODES or best["gap"] < 1e-9:
+            return
+        # Try the sign that narrows the gap first; group 0 stays on team 1
+        # since swapping every group just swaps the team names
+        order = (1,) if i == 0 else ((-1, 1) if gap * gaps[i] > 0 else (1, -1))
+        for sign in order:
+            signs[i] = sign
+            search(i + 1, gap + sign * gaps[i], size + sign * sizes[i])
+
+    search(0, 0.0, 0)
+    return best["signs"], nodes[0] <= EXACT_NODES
+
+
+def _greedy(gaps, sizes, allowed):
+    signs = np.ones(len(gaps), dtype=int)
+    size_left = np.concatenate([np.cumsum(np.abs(sizes)[::-1])[::-1], [0]])
+    gap, size = 0.0, 0
+    for i in range(len(gaps)):
+        # Narrow the gap unless that would leave the sizes unfixable
+        choices = sorted((1, -1), key=lambda sign: abs(gap + sign * gaps[i]))
+        for sign in choices:
+            if abs(size + sign * sizes[i]) - size_left[i + 1] <= allowed:
+                break
+        signs[i] = sign
+        gap += sign * gaps[i]
+        size += sign * sizes[i]
+    return _improve(signs, gaps, sizes, allowed)
+
+
+def _improve(signs, gaps, sizes, allowed):
+    # Flip the single group or pair of groups that narrows the gap most,
+    # keeping the sizes balanced, until nothing helps
+    for _ in range(MAX_FLIPS):
+        gap = float(signs @ gaps)
+        size = int(signs @ sizes)
+        move_gap = -2 * signs * gaps
+        move_size = -2 * signs * sizes
+        pair_gap = np.abs(gap + move_gap[:, None] + move_gap[None, :])
+        pair_ok = np.abs(size + move_size[:, None] + move_size[None, :]) <= allowed
+        np.fill_diagonal(pair_ok, False)
+        single_gap = np.abs(gap + move_gap)
+        single_ok = np.abs(size + move_size) <= allowed
+
+        pair_gap = np.where(pair_ok, pair_gap, np.inf)
+        single_gap = np.where(single_ok, single_gap, np.inf)
+        i, j = np.unravel_index(np.argmin(pair_gap), pair_gap.shape)
+        k = int(np.argmin(single_gap))
+        if min(pair_gap[i, j], single_gap[k]) >= abs(gap) - 1e-9:
+            break
+        if single_gap[k] <= pair_gap[i, j]:
+            signs[k] = -signs[k]
+        else:
+            signs[i], signs[j] = -signs[i], -signs[j]
+    return signs
+
+
+def split_teams(strengths, apart=(), together=()):
+    # strengths: {player: strength}. Returns (team1, team2, gap) where gap is
+    # team 1's total strength minus team 2's.
+    players = list(strengths)
+    if len(players) < 2:
+        raise ValueError("Pick at least two players to split")
+    groups = _groups(players, apart, together)
+    gaps = np.array([sum(strengths[p] for p in first) - sum(strengths[p] for p in second) for first, second in groups], dtype=float)
+    sizes = np.array([len(first) - len(second) for first, second in groups])
+    allowed = len(players) % 2
+
+    order = np.argsort(-np.abs(gaps), kind="stable")
+    gaps, sizes = gaps[order], sizes[order]
+    groups = [groups[i] for i in order]
+    signs, finished = _exact(gaps, sizes, allowed) if len(groups) <= EXACT_GROUPS else (None, False)
+    if signs is None:
+        signs = _greedy(gaps, sizes, allowed)
+    elif not finished:
+        signs = _improve(np.array(signs), gaps, sizes, allowed)
+    signs = np.asarray(signs)
+    if abs(int(signs @ sizes)) > allowed:
+        raise ValueError("The constraints leave no way to make the teams even")
+
+    team1, team2 = [], []
+    for (first, second), sign in zip(groups, signs):
+        team1 += first if sign > 0 else second
+        team2 += second if sign > 0 else first
+    # Stronger players first, as a batting order
+    team1.sort(key=lambda p: -strengths[p])
+    team2.sort(key=lambda p: -strengths[p])
+    return team1, team2, round(float(signs @ gaps), 3)
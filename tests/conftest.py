@@ -0,0 +1,18 @@
+# Shared fixtures. Every test gets its own empty in-memory database from
+# local_store, so the suite needs no MongoDB server:
+#
+#   python -m pytest
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URI", "memory://")
+
+from local_store import LocalClient
+
+
+@pytest.fixture
+def db():
+    return LocalClient()["test"]
@@ -0,0 +1,32 @@
+# Game id allocation and the duplicate-id cleanup in migrate.py.
+import counters
+import game_journal
+
+
+def game(game_id, team1, team2):
+    return {"game_id": game_id, "team1": team1, "team2": team2}
+
+
+def test_insert_game_skips_ids_already_taken(db):
+    counters.ensure_indexes(db)
+    db["games"].insert_one(game("Game_2", "A", "B"))
+    counters.seed_counter(db, counters.GAME_COUNTER, 1)
+    assert counters.insert_game(db, game(None, "C", "D")) == "Game_3"
+
+
+def test_duplicate_game_ids_are_renumbered_and_the_index_built(db):
+    db["games"].insert_many([game("Game_1", "Ann, Bo", "Cy, Di"), game("Game_1", "Ed, Fay", "Gus, Hal")])
+    db["atbats"].insert_many([
+        {"game_id": "Game_1", "batter": "Ann", "pitcher": "Cy"},
+        {"game_id": "Game_1", "batter": "Ed", "pitcher": "Gus"},
+    ])
+    db[game_journal.EVENTS_COLLECTION].insert_one({"game_id": "Game_1", "seq": 1})
+    assert not counters.ensure_indexes(db)
+
+    assert counters.dedupe_game_ids(db) == 1
+    assert sorted(db["games"].distinct("game_id")) == ["Game_1", "Game_2"]
+    assert db["atbats"].find_one({"batter": "Ed"})["game_id"] == "Game_2"
+    assert db["atbats"].find_one({"batter": "Ann"})["game_id"] == "Game_1"
+    assert db[game_journal.EVENTS_COLLECTION].count_documents({}) == 0
+    assert counters.ensure_indexes(db)
+    assert counters.dedupe_game_ids(db) == 0
@@ -0,0 +1,134 @@
+# Journal appends, undo/redo, compare-and-set, snapshots and legacy imports.
+import pytest
+from bson import ObjectId
+
+import game_journal
+from game_state import GameConflict, migrate_ended_innings
+
+TEAM1 = ["Ann", "Bo"]
+TEAM2 = ["Cy", "Di"]
+
+
+@pytest.fixture(autouse=True)
+def indexes(db):
+    # The unique (game_id, seq) and (game_id, key) indexes are what make
+    # appends compare-and-set and imports idempotent
+    game_journal.ensure_indexes(db)
+
+
+def atbat(batter="Ann", pitcher="Cy", outcome="Single", outs=0, rbi=0, inning="Top 1"):
+    return {
+        "_id": ObjectId(), "atbat_id": ObjectId().binary.hex(), "game_id": "Game_1", "inning": inning,
+        "batter": batter, "pitcher": pitcher, "outcome": outcome, "outs_recorded": outs, "rbi": rbi,
+    }
+
+
+def record_atbat(db, play, expected_seq=None):
+    db["atbats"].insert_one(dict(play))
+    return game_journal.record(
+        db, "Game_1", TEAM1, TEAM2, game_journal.ATBAT, play, key=game_journal.atbat_key(play), expected_seq=expected_seq
+    )
+
+
+def test_undo_and_redo_move_the_state_and_the_atbats(db):
+    record_atbat(db, atbat(outcome="Home Run", rbi=1))
+    history = record_atbat(db, atbat(batter="Bo", outcome="Strike Out", outs=1))
+    assert history["state"].score() == (1, 0)
+    assert history["state"].outs == 1
+
+    undone, history = game_journal.undo(db, "Game_1", TEAM1, TEAM2)
+    assert [event["payload"]["batter"] for event in undone] == ["Bo"]
+    assert history["state"].outs == 0
+    assert db["atbats"].count_documents({}) == 1
+
+    redone, history = game_journal.redo(db, "Game_1", TEAM1, TEAM2)
+    assert [event["payload"]["batter"] for event in redone] == ["Bo"]
+    assert history["state"].outs == 1
+    assert db["atbats"].count_documents({}) == 2
+
+
+def test_a_new_event_clears_redo(db):
+    record_atbat(db, atbat())
+    game_journal.undo(db, "Game_1", TEAM1, TEAM2)
+    history = record_atbat(db, atbat(batter="Bo"))
+    assert history["redo"] == []
+
+
+def test_appends_are_idempotent_by_key(db):
+    play = atbat()
+    first = game_journal.append_event(db, "Game_1", game_journal.ATBAT, play, key="k1")
+    second = game_journal.append_event(db, "Game_1", game_journal.ATBAT, play, key="k1")
+    assert first == second == 1
+    assert db[game_journal.EVENTS_COLLECTION].count_documents({}) == 1
+
+
+def test_stale_writers_get_a_conflict(db):
+    history = record_atbat(db, atbat())
+    seen = history["head"]
+    record_atbat(db, atbat(batter="Bo"))
+    with pytest.raises(GameConflict):
+        record_atbat(db, atbat(batter="Ann"), expected_seq=seen + 1)
+    with pytest.raises(GameConflict):
+        game_journal.undo(db, "Game_1", TEAM1, TEAM2, expected_head=seen)
+
+
+def test_correction_applies_and_undoes(db):
+    history = record_atbat(db, atbat(outcome="Single", rbi=0))
+    event = game_journal.last_effective_event(db, "Game_1", history)
+    history = game_journal.correct_atbat(db, "Game_1", TEAM1, TEAM2, history, event, {"outcome": "Home Run", "rbi": 1})
+    assert history["state"].score() == (1, 0)
+    assert db["atbats"].find_one({})["outcome"] == "Home Run"
+
+    _, history = game_journal.undo(db, "Game_1", TEAM1, TEAM2)
+    assert history["state"].score() == (0, 0)
+    assert db["atbats"].find_one({})["outcome"] == "Single"
+
+
+def test_snapshot_is_taken_even_when_a_multiple_is_skipped(db):
+    for _ in range(game_journal.SNAPSHOT_EVERY - 1):
+        record_atbat(db, atbat())
+    # Another writer's plain appends carry the head past the multiple
+    for _ in range(2):
+        game_journal.append_event(db, "Game_1", game_journal.ATBAT, atbat())
+    assert db[game_journal.SNAPSHOTS_COLLECTION].count_documents({}) == 0
+
+    history = record_atbat(db, atbat())
+    snapshot = db[game_journal.SNAPSHOTS_COLLECTION].find_one({})
+    assert snapshot["seq"] == history["head"] == game_journal.SNAPSHOT_EVERY + 2
+    # The next load starts from it and agrees with a full replay
+    assert game_journal.load_history(db, "Game_1", TEAM1, TEAM2)["state"] == history["state"]
+
+
+def test_legacy_import_is_deduplicated_and_snapshotted(db, monkeypatch):
+    plays = [atbat(outs=1), atbat(batter="Bo", outs=1), atbat(outs=1)]
+    db["atbats"].insert_many([dict(play) for play in plays])
+    assert game_journal.ensure_journal(db, "Game_1", TEAM1, TEAM2, plays, ["Top 1"])
+
+    # A second writer that checked before the first one finished
+    monkeypatch.setattr(game_journal, "latest_event", lambda db, game_id: None)
+    game_journal.ensure_journal(db, "Game_1", TEAM1, TEAM2, plays, ["Top 1"])
+    monkeypatch.undo()
+
+    events = list(db[game_journal.EVENTS_COLLECTION].find({}).sort("seq", 1))
+    assert [event["type"] for event in events] == [game_journal.ATBAT] * 3 + [game_journal.END_INNING]
+    snapshot = db[game_journal.SNAPSHOTS_COLLECTION].find_one({}, sort=[("seq", -1)])
+    assert snapshot["seq"] == 4
+    assert snapshot["state"]["half"] == "Bottom"
+
+
+def test_import_legacy_games_skips_journaled_games(db):
+    db["games"].insert_one({"game_id": "Game_1", "team1": "Ann, Bo", "team2": "Cy, Di", "ended_innings": "Top 1"})
+    db["atbats"].insert_many([atbat(outs=1), atbat(batter="Bo", outs=2)])
+    assert game_journal.import_legacy_games(db) == 1
+    assert game_journal.import_legacy_games(db) == 0
+    assert db[game_journal.EVENTS_COLLECTION].count_documents({}) == 3
+
+
+def test_legacy_ended_innings_become_a_list(db):
+    db["games"].insert_many([
+        {"game_id": "Game_1", "ended_innings": "Top 1;Bottom 1"},
+        {"game_id": "Game_2", "ended_innings": ["Top 1"]},
+    ])
+    assert migrate_ended_innings(db) == 1
+    assert migrate_ended_innings(db) == 0
+    assert db["games"].find_one({"game_id": "Game_1"})["ended_innings"] == ["Top 1", "Bottom 1"]
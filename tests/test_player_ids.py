@@ -0,0 +1,77 @@
+# Player ids: the migration, renames and interrupted renames.
+import pytest
+
+import game_journal
+import player_ids
+
+
+@pytest.fixture(autouse=True)
+def indexes(db):
+    player_ids.ensure_indexes(db)
+
+
+def legacy_league(db):
+    # Shaped like data from before ids existed
+    db["players"].insert_many([{"name": "Ann"}, {"name": "Bo"}])
+    db["games"].insert_one({"game_id": "Game_1", "team1": "Ann", "team2": "Bo, Cy"})
+    db["atbats"].insert_one({"game_id": "Game_1", "batter": "Ann", "pitcher": "Cy", "outcome": "Single"})
+
+
+def test_migrate_gives_everything_ids_once(db):
+    legacy_league(db)
+    assert player_ids.migrate(db) > 0
+    ids = {player["name"]: player["player_id"] for player in db["players"].find({})}
+    assert sorted(ids) == ["Ann", "Bo", "Cy"]
+    atbat = db["atbats"].find_one({})
+    assert (atbat["batter_id"], atbat["pitcher_id"]) == (ids["Ann"], ids["Cy"])
+    game = db["games"].find_one({})
+    assert game["team2_players"] == ["Bo", "Cy"]
+    assert game["player_ids"] == [ids["Ann"], ids["Bo"], ids["Cy"]]
+    assert player_ids.migrate(db) == 0
+
+
+def test_ids_for_fills_in_missing_ids(db):
+    db["players"].insert_one({"name": "Ann"})
+    ids = player_ids.ids_for(db, ["Ann", "Bo"])
+    assert db["players"].find_one({"name": "Ann"})["player_id"] == ids["Ann"]
+    assert db["players"].find_one({"name": "Bo"})["player_id"] == ids["Bo"]
+    assert player_ids.ids_for(db, ["Ann", "Bo"]) == ids
+
+
+def test_rename_rewrites_every_copy_of_the_name(db):
+    legacy_league(db)
+    player_ids.migrate(db)
+    ann = db["players"].find_one({"name": "Ann"})["player_id"]
+    db[game_journal.EVENTS_COLLECTION].insert_one(
+        {"game_id": "Game_1", "seq": 1, "payload": {"batter": "Ann", "batter_id": ann}})
+
+    player_ids.rename_player(db, ann, " Annie ")
+    assert db["players"].find_one({"player_id": ann})["name"] == "Annie"
+    assert "renamed_from" not in db["players"].find_one({"player_id": ann})
+    assert db["atbats"].find_one({})["batter"] == "Annie"
+    assert db[game_journal.EVENTS_COLLECTION].find_one({})["payload"]["batter"] == "Annie"
+    game = db["games"].find_one({})
+    assert (game["team1"], game["team1_players"]) == ("Annie", ["Annie"])
+
+
+def test_rename_rejects_taken_and_empty_names(db):
+    legacy_league(db)
+    player_ids.migrate(db)
+    ann = db["players"].find_one({"name": "Ann"})["player_id"]
+    with pytest.raises(ValueError):
+        player_ids.rename_player(db, ann, "Bo")
+    with pytest.raises(ValueError):
+        player_ids.rename_player(db, ann, "  ")
+
+
+def test_an_interrupted_rename_is_finished(db):
+    legacy_league(db)
+    player_ids.migrate(db)
+    ann = db["players"].find_one({"name": "Ann"})["player_id"]
+    # As if the process died right after the player document changed
+    db["players"].update_one({"player_id": ann}, {"$set": {"name": "Annie", "renamed_from": "Ann"}})
+
+    assert player_ids.finish_renames(db) == 1
+    assert db["atbats"].find_one({})["batter"] == "Annie"
+    assert db["games"].find_one({})["team1_players"] == ["Annie"]
+    assert player_ids.finish_renames(db) == 0
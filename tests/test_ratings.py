@@ -0,0 +1,100 @@
+# Elo ratings: the formula, incremental rating, undoing it, and the replay.
+import math
+
+import pandas as pd
+import pytest
+
+import player_ids
+import ratings
+from game_state import GameState
+
+
+@pytest.fixture(autouse=True)
+def league(db):
+    ratings.ensure_indexes(db)
+    player_ids.ensure_indexes(db)
+    for name in ("Ann", "Bo", "Cy", "Di"):
+        player_ids.insert_player(db, name)
+    db["games"].insert_many([
+        {"game_id": "Game_1", "date": "2025-05-01", "team1": "Ann, Bo", "team2": "Cy, Di", "status": "completed"},
+        {"game_id": "Game_2", "date": "2025-05-02", "team1": "Ann, Cy", "team2": "Bo, Di", "status": "completed"},
+    ])
+
+
+def rating(db, name):
+    return db["players"].find_one({"name": name})["rating"]
+
+
+def test_even_teams_split_the_points_of_a_one_run_game():
+    # K * ln(margin + 1) * (result - expected)
+    change = ratings.team_change(1500, 1500, 2, 1)
+    assert change == pytest.approx(ratings.K_FACTOR * math.log(2) * 0.5)
+    assert ratings.team_change(1500, 1500, 1, 2) == pytest.approx(-change)
+    assert ratings.team_change(1500, 1500, 3, 3) == 0
+
+
+def test_upsets_move_more_than_expected_wins():
+    assert ratings.team_change(1400, 1600, 2, 1) > ratings.team_change(1600, 1400, 2, 1)
+    assert ratings.expected(1600, 1400) == pytest.approx(1 / (1 + 10 ** -0.5))
+
+
+def test_recording_a_game_moves_both_teams_and_marks_it_rated(db):
+    changes = ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    assert changes["Ann"] == changes["Bo"] == -changes["Cy"] > 0
+    assert rating(db, "Ann") == pytest.approx(ratings.INITIAL_RATING + changes["Ann"], abs=0.01)
+    assert db["games"].find_one({"game_id": "Game_1"})["rated"] is True
+    assert ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2) is None
+
+
+def test_a_retried_write_lands_on_the_same_ratings(db):
+    ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    first = {name: rating(db, name) for name in ("Ann", "Bo", "Cy", "Di")}
+    # As if the process died before the flag was written
+    db["games"].update_one({"game_id": "Game_1"}, {"$unset": {"rated": ""}})
+    ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    assert {name: rating(db, name) for name in first} == first
+    assert db[ratings.HISTORY_COLLECTION].count_documents({"game_id": "Game_1"}) == 4
+    assert db["players"].find_one({"name": "Ann"})["rating_games"] == 1
+
+
+def test_undoing_the_end_of_a_game_takes_its_changes_back(db):
+    ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    changes = ratings.record_game(db, "Game_2", "2025-05-02", "Ann, Cy", "Bo, Di", 1, 4)
+    assert ratings.unrate_game(db, "Game_1") == 4
+    assert rating(db, "Ann") == pytest.approx(ratings.INITIAL_RATING + changes["Ann"], abs=0.01)
+    assert db["players"].find_one({"name": "Ann"})["rating_games"] == 1
+    assert "rated" not in db["games"].find_one({"game_id": "Game_1"})
+    assert ratings.unrate_game(db, "Game_1") == 0
+
+
+def test_sync_follows_the_game_status(db):
+    state = GameState("Game_1", ["Ann", "Bo"], ["Cy", "Di"], status="completed", team1_score=3, team2_score=1)
+    assert ratings.sync_game(db, "Game_1", "2025-05-01", state)["Ann"] > 0
+    state.status = "active"
+    ratings.sync_game(db, "Game_1", "2025-05-01", state)
+    assert rating(db, "Ann") == ratings.INITIAL_RATING
+    assert db[ratings.HISTORY_COLLECTION].count_documents({}) == 0
+
+
+def test_ratings_follow_a_renamed_player(db):
+    ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    player_id = db["players"].find_one({"name": "Ann"})["player_id"]
+    player_ids.rename_player(db, player_id, "Annie")
+    ratings.record_game(db, "Game_2", "2025-05-02", "Annie, Cy", "Bo, Di", 5, 2)
+    assert db["players"].find_one({"name": "Annie"})["rating_games"] == 2
+    assert set(db[ratings.HISTORY_COLLECTION].distinct("player", {"player_id": player_id})) == {"Annie"}
+
+
+def test_replay_matches_rating_games_one_at_a_time(db):
+    ratings.record_game(db, "Game_1", "2025-05-01", "Ann, Bo", "Cy, Di", 5, 2)
+    ratings.record_game(db, "Game_2", "2025-05-02", "Ann, Cy", "Bo, Di", 1, 4)
+    incremental = {name: rating(db, name) for name in ("Ann", "Bo", "Cy", "Di")}
+
+    games = pd.DataFrame(list(db["games"].find({}, {"_id": 0})))
+    games["team1_score"] = [5, 1]
+    games["team2_score"] = [2, 4]
+    replayed, history = ratings.replay(games)
+    ratings.save_replay(db, replayed, history)
+    for name, value in incremental.items():
+        assert rating(db, name) == pytest.approx(value, abs=0.02)
+    assert db[ratings.HISTORY_COLLECTION].count_documents({"player_id": None}) == 0
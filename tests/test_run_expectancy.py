@@ -0,0 +1,55 @@
+# Run expectancy table and RE24.
+import pandas as pd
+
+import run_expectancy
+
+
+def half_inning(game_id="Game_1", inning="Top 1"):
+    # Single, two-run homer, then three strikeouts
+    plays = [("Ann", "Single", 0, 0, 0), ("Bo", "Home Run", 1, 0, 2),
+             ("Cy", "Strike Out", 0, 1, 0), ("Ann", "Strike Out", 0, 1, 0), ("Bo", "Strike Out", 0, 1, 0)]
+    return [{"game_id": game_id, "inning": inning, "batter": batter, "pitcher": "Di", "outcome": outcome,
+             "runners_on": runners, "outs_recorded": outs, "rbi": rbi} for batter, outcome, runners, outs, rbi in plays]
+
+
+def test_states_and_runs_to_the_end_of_the_inning():
+    plays = run_expectancy.play_states(pd.DataFrame(half_inning()))
+    assert plays["outs"].tolist() == [0, 0, 0, 1, 2]
+    assert plays["runs_to_end"].tolist() == [2, 2, 0, 0, 0]
+    assert plays["ends_inning"].tolist() == [False, False, False, False, True]
+    assert plays["complete"].all()
+
+
+def test_expectancy_averages_runs_from_each_state():
+    table = run_expectancy.expectancy_table(run_expectancy.play_states(pd.DataFrame(half_inning())))
+    grid = run_expectancy.matrix(table)
+    assert grid.loc["0 on", "0 out"] == 1.0
+    assert grid.loc["1 on", "0 out"] == 2.0
+    assert grid.loc["0 on", "2 out"] == 0.0
+    # Never seen, so no runs expected
+    assert grid.loc["3 on", "2 out"] == 0.0
+
+
+def test_re24_credits_batters_and_charges_pitchers():
+    board = run_expectancy.re24_leaderboard(pd.DataFrame(half_inning())).set_index("Player")
+    # Single +1, homer 1 - 2 + 2, strikeouts -1, 0, 0
+    assert board.loc["Ann", "RE24"] == 1.0
+    assert board.loc["Bo", "RE24"] == 1.0
+    assert board.loc["Cy", "RE24"] == -1.0
+    assert board.loc["Ann", "PA"] == 2
+    assert board.loc["Di", "RE24_P"] == -1.0
+
+
+def test_incomplete_half_innings_are_left_out_of_the_table():
+    atbats = pd.DataFrame(half_inning() + half_inning("Game_2")[:2])
+    table = run_expectancy.expectancy_table(run_expectancy.play_states(atbats))
+    assert table.set_index(["season", "runners", "outs"]).loc[(run_expectancy.NO_SEASON, 0, 0), "plays"] == 2
+
+
+def test_each_season_gets_its_own_table():
+    atbats = pd.DataFrame(half_inning("Game_1") + half_inning("Game_2")[2:])
+    games = pd.DataFrame([{"game_id": "Game_1", "date": "2024-05-01"}, {"game_id": "Game_2", "date": "2025-05-01"}])
+    table = run_expectancy.expectancy_table(run_expectancy.play_states(atbats, games))
+    assert set(table["season"]) == {run_expectancy.NO_SEASON, 2024, 2025}
+    assert run_expectancy.matrix(table, 2024).loc["0 on", "0 out"] == 1.0
+    assert run_expectancy.matrix(table, 2025).loc["0 on", "0 out"] == 0.0
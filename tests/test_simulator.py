@@ -0,0 +1,54 @@
+# Monte Carlo game projections.
+import pandas as pd
+
+import simulator
+
+
+def matchups(rows):
+    return pd.DataFrame(rows, columns=["batter", "pitcher", "outcome", "count"])
+
+
+def no_runs():
+    return pd.DataFrame(columns=["outcome", "runners_on", "rbi", "count"])
+
+
+def test_results_add_up_and_repeat_for_a_seed():
+    model = simulator.build_model(matchups([]), no_runs(), "Ann, Bo", "Cy, Di")
+    first = simulator.simulate(model, games=2000, seed=7)
+    assert first == simulator.simulate(model, games=2000, seed=7)
+    assert first["games"] == 2000
+    assert abs(first["team1_win"] + first["team2_win"] + first["tie"] - 1) < 1e-9
+
+
+def test_worker_count_does_not_change_the_projection(monkeypatch):
+    monkeypatch.setattr(simulator, "BATCH_GAMES", 500)
+    model = simulator.build_model(matchups([]), no_runs(), "Ann, Bo", "Cy, Di")
+    assert simulator.simulate(model, games=1500, seed=3, workers=1) == simulator.simulate(model, games=1500, seed=3, workers=2)
+
+
+def test_sluggers_beat_a_team_that_always_strikes_out():
+    rows = []
+    for pitcher in ("Ann", "Bo", "Cy", "Di"):
+        rows += [("Ann", pitcher, "Home Run", 1000), ("Bo", pitcher, "Home Run", 1000),
+                 ("Cy", pitcher, "Strike Out", 1000), ("Di", pitcher, "Strike Out", 1000)]
+    model = simulator.build_model(matchups(rows), no_runs(), "Ann, Bo", "Cy, Di")
+    result = simulator.simulate(model, games=1000, seed=1)
+    assert result["team1_win"] > 0.95
+    assert result["team1_runs"] > result["team2_runs"]
+
+
+def test_default_runs_clear_the_bases_on_a_home_run():
+    runs = simulator._default_runs()
+    assert runs[simulator.HOME_RUN, 3].argmax() == 4
+    assert runs[simulator.OUTCOMES.index("Walk"), 3].argmax() == 1
+    assert runs[simulator.OUTCOMES.index("Walk"), 2].argmax() == 0
+
+
+def test_counts_ignore_unknown_outcomes():
+    atbats = pd.DataFrame([
+        {"batter": "Ann", "pitcher": "Cy", "outcome": "Single", "runners_on": 0, "rbi": 0},
+        {"batter": "Ann", "pitcher": "Cy", "outcome": "Single", "runners_on": 1, "rbi": 1},
+        {"batter": "Ann", "pitcher": "Cy", "outcome": "Balk", "runners_on": 0, "rbi": 0},
+    ])
+    assert simulator.matchup_counts(atbats)["count"].tolist() == [2]
+    assert simulator.run_counts(atbats)["count"].sum() == 2
@@ -0,0 +1,26 @@
+# Page stat calculations.
+import pandas as pd
+
+import stats
+
+
+def test_player_records_put_draws_and_losses_in_their_columns():
+    games = pd.DataFrame([
+        {"team1_players": "Ann", "team2_players": "Bo", "team1_score": 3, "team2_score": 1, "status": "completed"},
+        {"team1_players": "Ann", "team2_players": "Bo", "team1_score": 2, "team2_score": 2, "status": "completed"},
+        {"team1_players": "Bo", "team2_players": "Ann", "team1_score": 0, "team2_score": 5, "status": "completed"},
+    ])
+    records = stats.player_records(games).set_index("Player")
+    assert records.loc["Ann", ["Wins", "Draws", "Losses"]].tolist() == [2, 1, 0]
+    assert records.loc["Bo", ["Wins", "Draws", "Losses"]].tolist() == [0, 1, 2]
+    assert records.loc["Ann", "Win %"] == 1.0
+
+
+def test_player_records_skip_games_still_in_progress():
+    games = pd.DataFrame([
+        {"team1_players": "Ann", "team2_players": "Bo", "team1_score": 3, "team2_score": 1, "status": "completed"},
+        {"team1_players": "Bo", "team2_players": "Ann", "team1_score": 4, "team2_score": 0, "status": "active"},
+    ])
+    records = stats.player_records(games).set_index("Player")
+    assert records.loc["Ann", ["Wins", "Draws", "Losses"]].tolist() == [1, 0, 0]
+    assert records.loc["Bo", ["Wins", "Draws", "Losses"]].tolist() == [0, 0, 1]
@@ -0,0 +1,121 @@
+# JSON stats API: conditional requests, ETags that follow the data, box
+# scores and error statuses, served from the in-memory store.
+import http.client
+import json
+import threading
+from collections import OrderedDict
+
+import pytest
+
+import stats_api
+from data_version import bump_version
+
+TEAM1 = "Ann, Bo"
+TEAM2 = "Cy, Di"
+
+
+def atbat(batter, pitcher, outcome, rbi=0, outs=0, inning="Top 1"):
+    return {"game_id": "Game_1", "inning": inning, "batter": batter, "pitcher": pitcher,
+            "outcome": outcome, "rbi": rbi, "outs_recorded": outs, "strikes": 1, "balls": 0}
+
+
+@pytest.fixture(autouse=True)
+def league(db, monkeypatch):
+    monkeypatch.setattr(stats_api, "get_db", lambda: db)
+    monkeypatch.setattr(stats_api, "_frames", {})
+    monkeypatch.setattr(stats_api, "_bodies", OrderedDict())
+    db["players"].insert_many([{"name": name} for name in ("Ann", "Bo", "Cy", "Di")])
+    db["games"].insert_one({"game_id": "Game_1", "date": "2025-06-01", "status": "completed",
+                            "team1": TEAM1, "team2": TEAM2, "team1_players": ["Ann", "Bo"],
+                            "team2_players": ["Cy", "Di"], "team1_score": 2, "team2_score": 0})
+    db["atbats"].insert_many([
+        atbat("Ann", "Cy", "Home Run", rbi=1),
+        atbat("Bo", "Cy", "Single", rbi=1),
+        atbat("Ann", "Di", "Strikeout", outs=1),
+    ])
+    bump_version(db, "players", "games", "atbats", game_id="Game_1")
+
+
+@pytest.fixture
+def api():
+    server = stats_api.make_server(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path, **headers):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, json.loads(body) if body else None
+
+    yield get
+    server.shutdown()
+    server.server_close()
+
+
+def test_a_matching_etag_gets_not_modified(api):
+    response, payload = api("/standings")
+    assert response.status == 200
+    etag = response.getheader("ETag")
+    assert payload["standings"]
+
+    response, payload = api("/standings", **{"If-None-Match": etag})
+    assert response.status == 304
+    assert payload is None
+    assert response.getheader("ETag") == etag
+
+
+def test_the_etag_moves_when_the_players_version_does(db, api):
+    response, _ = api("/players")
+    etag = response.getheader("ETag")
+
+    db["players"].insert_one({"name": "Ed"})
+    bump_version(db, "players")
+    response, payload = api("/players", **{"If-None-Match": etag})
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+    assert "Ed" in payload["players"]
+
+
+def test_a_box_score_follows_its_own_game_version(db, api):
+    response, _ = api("/games/Game_1")
+    etag = response.getheader("ETag")
+
+    # Another game's writes leave this box score alone
+    bump_version(db, "atbats", game_id="Game_2")
+    assert api("/games/Game_1", **{"If-None-Match": etag})[0].status == 304
+
+    db["atbats"].insert_one(atbat("Bo", "Di", "Double"))
+    bump_version(db, "atbats", game_id="Game_1")
+    response, payload = api("/games/Game_1", **{"If-None-Match": etag})
+    assert response.status == 200
+    assert len(payload["atbats"]) == 4
+
+
+def test_box_score_contents(api):
+    response, payload = api("/games/Game_1")
+    assert response.status == 200
+    assert payload["game"]["team1"] == TEAM1
+    assert (payload["game"]["team1_score"], payload["game"]["team2_score"]) == (2, 0)
+    assert [line["player"] for line in payload["batting"]] == ["Ann", "Bo"]
+    assert [line["player"] for line in payload["pitching"]] == ["Cy", "Di"]
+    assert [play["Score"] for play in payload["scoring_plays"]] == ["1-0", "2-0"]
+    assert len(payload["atbats"]) == 3
+    assert all("_id" not in play for play in payload["atbats"])
+
+
+def test_unknown_games_and_players_are_not_found(api):
+    response, payload = api("/games/Game_9")
+    assert response.status == 404
+    assert "Game_9" in payload["error"]
+    assert api("/players/Zed")[0].status == 404
+    assert api("/nowhere")[0].status == 404
+
+
+def test_bad_parameters_are_bad_requests(api):
+    response, payload = api("/matchups?player1=Ann")
+    assert response.status == 400
+    assert "player2" in payload["error"]
+    assert api("/games?year=soon")[0].status == 400
@@ -0,0 +1,50 @@
+# Balanced team splits and their constraints.
+import pytest
+
+import team_builder
+
+
+def test_split_finds_the_even_teams():
+    team1, team2, gap = team_builder.split_teams({"a": 3.0, "b": 2.0, "c": 1.0, "d": 0.0})
+    assert gap == 0
+    assert sorted(map(sorted, (team1, team2))) == [["a", "d"], ["b", "c"]]
+
+
+def test_odd_rosters_differ_by_one_player():
+    team1, team2, _ = team_builder.split_teams({name: float(i) for i, name in enumerate("abcde")})
+    assert sorted([len(team1), len(team2)]) == [2, 3]
+
+
+def test_teams_bat_strongest_first():
+    team1, team2, _ = team_builder.split_teams({"a": 3.0, "b": 2.0, "c": 1.0, "d": 0.0})
+    assert team1 in (["a", "d"], ["b", "c"])
+    assert team2 in (["a", "d"], ["b", "c"])
+
+
+def test_apart_and_together_are_respected():
+    strengths = {"a": 3.0, "b": 2.0, "c": 1.0, "d": 0.0}
+    team1, team2, _ = team_builder.split_teams(strengths, apart=[("b", "c")], together=[("a", "b")])
+    first, second = (team1, team2) if "a" in team1 else (team2, team1)
+    assert "b" in first and "c" in second
+
+
+def test_contradictory_constraints_are_rejected():
+    strengths = {"a": 1.0, "b": 1.0, "c": 1.0}
+    with pytest.raises(ValueError):
+        team_builder.split_teams(strengths, apart=[("a", "b")], together=[("a", "b")])
+    with pytest.raises(ValueError):
+        team_builder.split_teams({"a": 1.0})
+
+
+def test_constraints_that_force_uneven_teams_are_rejected():
+    strengths = {"a": 1.0, "b": 1.0, "c": 1.0, "d": 1.0}
+    with pytest.raises(ValueError):
+        team_builder.split_teams(strengths, together=[("a", "b"), ("b", "c")])
+
+
+def test_large_rosters_use_the_greedy_search():
+    strengths = {f"p{i}": float(i % 7) for i in range(team_builder.EXACT_GROUPS + 10)}
+    team1, team2, gap = team_builder.split_teams(strengths)
+    assert len(team1) == len(team2)
+    assert abs(gap) <= 1
+    assert abs(sum(strengths[p] for p in team1) - sum(strengths[p] for p in team2) - gap) < 1e-9
@@ -0,0 +1,95 @@
+# Win probability table, lookups and game curves.
+import numpy as np
+import pandas as pd
+
+import win_probability
+from game_state import GameState
+
+
+def atbat(game_id, inning, batter, outcome, outs=0, rbi=0, runners=0):
+    return {"game_id": game_id, "inning": inning, "batter": batter, "pitcher": "P", "outcome": outcome,
+            "outs_recorded": outs, "rbi": rbi, "runners_on": runners}
+
+
+def history(games=20):
+    # Team 1 scores in the first and wins every game
+    atbats, rows = [], []
+    for number in range(games):
+        game_id = f"Game_{number}"
+        atbats += [atbat(game_id, "Top 1", "Ann", "Home Run", rbi=1), atbat(game_id, "Top 1", "Bo", "Strike Out", outs=3),
+                   atbat(game_id, "Bottom 1", "Cy", "Strike Out", outs=3)]
+        rows.append({"game_id": game_id, "status": "completed", "team1_score": 1, "team2_score": 0})
+    return pd.DataFrame(atbats), pd.DataFrame(rows)
+
+
+def empty_table():
+    return win_probability.build_table(pd.DataFrame(), pd.DataFrame(columns=["game_id", "status", "team1_score", "team2_score"]))
+
+
+def test_without_history_a_tie_is_even_and_a_lead_helps():
+    table = empty_table()
+    assert table.shape == win_probability.SHAPE
+    assert win_probability.lookup(table, 1, "Top", 0, 0, 0) == 0.5
+    assert win_probability.lookup(table, 3, "Bottom", 1, 0, 2) > 0.5
+    assert win_probability.lookup(table, 3, "Bottom", 1, 0, -2) < 0.5
+    assert ((table > 0) & (table < 1)).all()
+
+
+def test_history_pulls_states_toward_how_games_ended():
+    table = win_probability.build_table(*history())
+    chance = win_probability.lookup(table, 1, "Top", 1, 0, 1)
+    assert win_probability.lookup(empty_table(), 1, "Top", 1, 0, 1) < chance < 1
+
+
+def test_lookups_clamp_to_the_table_edges():
+    table = empty_table()
+    assert win_probability.lookup(table, 12, "Top", 5, 9, 40) == win_probability.lookup(
+        table, win_probability.INNINGS, "Top", 2, 3, win_probability.MAX_LEAD)
+
+
+def test_a_finished_game_is_decided():
+    table = empty_table()
+    state = GameState("Game_1", ["Ann"], ["Bo"], status="completed", team1_score=4, team2_score=2)
+    assert win_probability.live_probability(table, state) == 1.0
+    state.team1_score = 2
+    assert win_probability.live_probability(table, state) == 0.5
+
+
+def test_game_curve_has_a_point_per_at_bat_ending_at_the_result():
+    atbats, games = history(1)
+    game = games.iloc[0].to_dict()
+    curve = win_probability.game_curve(empty_table(), atbats, game)
+    assert len(curve) == len(atbats) + 1
+    assert curve["Team 1 Win %"].iloc[0] == 50.0
+    assert curve["Team 1 Win %"].iloc[-1] == 100.0
+    assert curve["Batter"].tolist()[1:] == ["Ann", "Bo", "Cy"]
+
+
+def test_tables_round_trip_through_the_database(db):
+    table = win_probability.build_table(*history())
+    win_probability.save_table(db, table, games_used=20)
+    assert np.allclose(win_probability.load_table(db), table, atol=1e-4)
+    db[win_probability.TABLE_COLLECTION].update_one({"_id": win_probability.TABLE_ID}, {"$set": {"shape": [1]}})
+    assert win_probability.load_table(db) is None
+
+
+def test_rebuilding_stores_the_table_from_completed_games(db):
+    atbats, games = history(5)
+    games = pd.concat([games, pd.DataFrame([{"game_id": "Game_9", "status": "active"}])])
+    assert win_probability.rebuild_table(db, atbats, games) == 5
+    assert db[win_probability.TABLE_COLLECTION].find_one({"_id": win_probability.TABLE_ID})["games"] == 5
+    assert win_probability.load_table(db) is not None
+
+
+def test_a_background_rebuild_stores_the_table(db):
+    atbats, games = history(5)
+    db["atbats"].insert_many(atbats.to_dict("records"))
+    db["games"].insert_many(games.to_dict("records"))
+    win_probability.rebuild_in_background(db).join(timeout=30)
+    assert db[win_probability.TABLE_COLLECTION].find_one({"_id": win_probability.TABLE_ID})["games"] == 5
+    assert win_probability.load_table(db)[0, 0, 1, 0, win_probability.MAX_LEAD + 1] > 0.5
+
+
+def test_no_games_build_the_prior_table():
+    table = win_probability.build_table(pd.DataFrame(), pd.DataFrame())
+    assert win_probability.lookup(table, 1, "Top", 0, 0, 0) == 0.5
@@ -0,0 +1,170 @@
+# Write-behind queue: replay into MongoDB, idempotent retries, transient
+# errors and dead-lettering.
+import pytest
+from pymongo.errors import AutoReconnect
+
+import atbat_writes
+import data_version
+import game_journal
+import player_ids
+import write_queue
+
+TEAM1 = ["Ann", "Bo"]
+TEAM2 = ["Cy", "Di"]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return write_queue.WriteQueue(str(tmp_path / "queue.sqlite3"))
+
+
+@pytest.fixture(autouse=True)
+def games(db):
+    atbat_writes.ensure_indexes(db)
+    game_journal.ensure_indexes(db)
+    for game_id in ("Game_1", "Game_2"):
+        db["games"].insert_one({"game_id": game_id, "team1": "Ann, Bo", "team2": "Cy, Di", "status": "active"})
+
+
+def item(game_id="Game_1", batter="Ann", outs=0, rbi=0, end_inning=False):
+    atbat = {"atbat_id": f"{game_id}-{batter}-{outs}-{rbi}", "game_id": game_id, "inning": "Top 1",
+             "batter": batter, "pitcher": "Cy", "outcome": "Single", "outs_recorded": outs, "rbi": rbi}
+    return write_queue.new_item(game_id, "Top 1", TEAM1, TEAM2, atbat=atbat, end_inning=end_inning)
+
+
+def test_queued_items_replay_in_order(db, queue):
+    for queued in (item(rbi=1), item(batter="Bo", outs=1), item(batter="Ann", outs=2, end_inning=True)):
+        queue.enqueue("Game_1", queued)
+    assert write_queue.flush(db, queue) == 3
+    assert queue.count() == 0
+
+    game = db["games"].find_one({"game_id": "Game_1"})
+    assert game["team1_score"] == 1
+    assert game["state"]["half"] == "Bottom"
+    assert game["rev"] == db[game_journal.EVENTS_COLLECTION].count_documents({"game_id": "Game_1"})
+    assert [a["batter"] for a in db["atbats"].find({}).sort("_id", 1)] == ["Ann", "Bo", "Ann"]
+
+
+def test_a_batch_on_a_new_game_is_journaled_in_queue_order(db, queue):
+    top = item(batter="Ann", outs=3)
+    bottom = item(batter="Cy", outs=1, rbi=2)
+    bottom["atbat"]["inning"] = bottom["inning"] = "Bottom 1"
+    queue.enqueue("Game_1", top)
+    queue.enqueue("Game_1", bottom)
+    assert write_queue.flush(db, queue) == 2
+
+    events = db[game_journal.EVENTS_COLLECTION].find({"game_id": "Game_1"}).sort("seq", 1)
+    assert [event["payload"]["inning"] for event in events] == ["Top 1", "Bottom 1"]
+    game = db["games"].find_one({"game_id": "Game_1"})
+    assert (game["state"]["half"], game["state"]["outs"]) == ("Bottom", 1)
+    assert game["team2_score"] == 2
+
+
+def test_replaying_the_same_items_writes_nothing_twice(db, queue):
+    queued = [item(rbi=1), item(batter="Bo", outs=1, end_inning=True)]
+    for _ in range(2):
+        for entry in queued:
+            queue.enqueue("Game_1", entry)
+        write_queue.flush(db, queue)
+    assert db["atbats"].count_documents({}) == 2
+    assert db[game_journal.EVENTS_COLLECTION].count_documents({}) == 3
+    assert db["games"].find_one({"game_id": "Game_1"})["team1_score"] == 1
+
+
+def test_connection_errors_keep_everything_queued(db, queue, monkeypatch):
+    queue.enqueue("Game_1", item())
+
+    def offline(db, atbats):
+        raise AutoReconnect("offline")
+
+    monkeypatch.setattr(write_queue, "bulk_upsert_atbats", offline)
+    for _ in range(write_queue.MAX_ATTEMPTS + 1):
+        with pytest.raises(AutoReconnect):
+            write_queue.flush(db, queue)
+    [row] = queue.peek()
+    assert row["attempts"] == 0
+    assert row["last_error"] == "offline"
+    assert queue.dead_count() == 0
+
+    monkeypatch.undo()
+    assert write_queue.flush(db, queue) == 1
+
+
+def test_a_failing_item_is_dead_lettered_and_the_rest_continue(db, queue, monkeypatch):
+    poison = item(batter="Bo")
+    queue.enqueue("Game_1", poison)
+    queue.enqueue("Game_1", item(batter="Ann", outs=1))
+    queue.enqueue("Game_2", item(game_id="Game_2"))
+    apply_item = write_queue.apply_item
+
+    def failing(db, queued, *args, **kwargs):
+        if queued["key"] == poison["key"]:
+            raise ValueError("bad item")
+        return apply_item(db, queued, *args, **kwargs)
+
+    monkeypatch.setattr(write_queue, "apply_item", failing)
+    # Other games go through; the poisoned game waits behind its item
+    with pytest.raises(ValueError):
+        write_queue.flush(db, queue)
+    assert [row["game_id"] for row in queue.peek()] == ["Game_1", "Game_1"]
+    for _ in range(write_queue.MAX_ATTEMPTS - 2):
+        with pytest.raises(ValueError):
+            write_queue.flush(db, queue)
+
+    # The last attempt sets it aside and the game's next item uploads
+    assert write_queue.flush(db, queue) == 1
+    assert queue.count() == 0
+    [dead] = queue.dead_letters()
+    assert dead["item"]["key"] == poison["key"]
+    assert dead["attempts"] == write_queue.MAX_ATTEMPTS
+    assert dead["last_error"] == "bad item"
+
+    monkeypatch.undo()
+    queue.requeue([dead["id"]])
+    assert queue.dead_count() == 0
+    assert write_queue.flush(db, queue) == 1
+    assert db["atbats"].count_documents({"game_id": "Game_1"}) == 2
+
+
+def test_discarded_dead_letters_are_gone(queue):
+    row_id = queue.enqueue("Game_1", item())
+    queue.dead_letter([row_id])
+    assert queue.count() == 0
+    queue.discard([row_id])
+    assert queue.dead_count() == 0
+
+
+def test_discarding_a_dead_letter_removes_its_at_bat(db, queue, monkeypatch):
+    queue.enqueue("Game_1", item(rbi=1))
+    assert write_queue.flush(db, queue) == 1
+    queue.enqueue("Game_1", item(batter="Bo"))
+
+    def failing(db, queued, *args, **kwargs):
+        raise ValueError("bad item")
+
+    monkeypatch.setattr(write_queue, "apply_item", failing)
+    for _ in range(write_queue.MAX_ATTEMPTS):
+        try:
+            write_queue.flush(db, queue)
+        except ValueError:
+            pass
+    # The batch's bulk upsert stored the at-bat before its journal write failed
+    assert db["atbats"].count_documents({"batter": "Bo"}) == 1
+
+    version = data_version.game_version(db, "Game_1")
+    write_queue.discard(db, queue, queue.dead_letters())
+    assert queue.dead_count() == 0
+    assert [a["batter"] for a in db["atbats"].find({})] == ["Ann"]
+    assert data_version.game_version(db, "Game_1") > version
+
+
+def test_queued_at_bats_pick_up_a_rename(db, queue):
+    ann = player_ids.insert_player(db, "Ann")
+    queued = item()
+    queued["atbat"]["batter_id"] = ann
+    queue.enqueue("Game_1", queued)
+    player_ids.rename_player(db, ann, "Annie")
+
+    write_queue.flush(db, queue)
+    assert db["atbats"].find_one({})["batter"] == "Annie"
+    assert db[game_journal.EVENTS_COLLECTION].find_one({"type": game_journal.ATBAT})["payload"]["batter"] == "Annie"
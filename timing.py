@@ -0,0 +1,144 @@
+# Per-rerun timing for the pages.
+#
+# A page calls start_rerun() at the top, then phase() as it moves between
+# fetching, building frames, computing stats, building figures and
+# rendering; the time between marks is charged to the phase being left, so
+# phases never overlap and add up to the rerun. end_rerun() records it
+# (pages call it before st.stop() too). Totals are kept per page and phase
+# for the Diagnostics page. When timing is off (PAGE_TIMING=0, or switched
+# off on the Diagnostics page) every call returns after one flag check.
+# The rerun boundaries are also handed to mongo_monitor, which charges
+# MongoDB commands to the rerun that issued them.
+import csv
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import mongo_monitor
+
+# "setup" covers everything before a page's first mark (connect, page config)
+PHASES = ("setup", "fetch", "frame", "compute", "figure", "render")
+SAMPLES_PER_PHASE = 500
+RECENT_RERUNS = 200
+
+_enabled = os.getenv("PAGE_TIMING", "1") != "0"
+_local = threading.local()
+_phases = {}
+_reruns = deque(maxlen=RECENT_RERUNS)
+_lock = threading.Lock()
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    global _enabled
+    _enabled = bool(flag)
+
+
+# ---- Marks ----
+def start_rerun(page):
+    mongo_monitor.start_rerun(page)
+    if not _enabled:
+        _local.rerun = None
+        return
+    now = time.perf_counter()
+    _local.rerun = {"page": page, "at": time.time(), "started": now, "phase": "setup", "mark": now, "phases": {}}
+
+
+def phase(name):
+    rerun = getattr(_local, "rerun", None) if _enabled else None
+    if rerun is None:
+        return
+    now = time.perf_counter()
+    _close_phase(rerun, now)
+    rerun["phase"] = name
+    rerun["mark"] = now
+
+
+def end_rerun():
+    mongo_monitor.end_rerun()
+    rerun = getattr(_local, "rerun", None) if _enabled else None
+    if rerun is None:
+        return
+    _local.rerun = None
+    now = time.perf_counter()
+    _close_phase(rerun, now)
+    phases = dict(rerun["phases"], total=now - rerun["started"])
+    with _lock:
+        for name, seconds in phases.items():
+            _add(rerun["page"], name, seconds)
+        _reruns.append({
+            "page": rerun["page"],
+            "at": rerun["at"],
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in phases.items()},
+        })
+
+
+def _close_phase(rerun, now):
+    name = rerun["phase"]
+    rerun["phases"][name] = rerun["phases"].get(name, 0.0) + now - rerun["mark"]
+
+
+def _add(page, name, seconds):
+    stats = _phases.get((page, name))
+    if stats is None:
+        stats = _phases[(page, name)] = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=SAMPLES_PER_PHASE)}
+    stats["count"] += 1
+    stats["total"] += seconds
+    stats["max"] = max(stats["max"], seconds)
+    stats["samples"].append(seconds)
+
+
+# ---- Reports ----
+def _percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summary():
+    # One row per page and phase, plus each page's "total"; percentiles
+    # cover the most recent SAMPLES_PER_PHASE reruns
+    order = {name: i for i, name in enumerate(PHASES + ("total",))}
+    rows = []
+    with _lock:
+        items = [(key, dict(stats, samples=sorted(stats["samples"]))) for key, stats in _phases.items()]
+    for (page, name), stats in sorted(items, key=lambda item: (item[0][0], order.get(item[0][1], len(order)))):
+        rows.append({
+            "page": page,
+            "phase": name,
+            "reruns": stats["count"],
+            "mean_ms": round(stats["total"] / stats["count"] * 1000, 2),
+            "p50_ms": round(_percentile(stats["samples"], 50) * 1000, 2),
+            "p95_ms": round(_percentile(stats["samples"], 95) * 1000, 2),
+            "max_ms": round(stats["max"] * 1000, 2),
+            "total_seconds": round(stats["total"], 3),
+        })
+    return rows
+
+
+def recent_reruns(limit=50):
+    with _lock:
+        return list(_reruns)[-limit:]
+
+
+def reset():
+    with _lock:
+        _phases.clear()
+        _reruns.clear()
+
+
+def export_json():
+    return json.dumps({"summary": summary(), "reruns": recent_reruns(RECENT_RERUNS)}, indent=2)
+
+
+def export_csv():
+    rows = summary()
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(rows[0]) if rows else ["page", "phase"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
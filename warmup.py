@@ -0,0 +1,94 @@
+# Cold-start warm-up and import-time diagnostics.
+#
+# The first visitor after a deploy used to pay for the MongoDB handshake,
+# index checks, every collection load and the plotly import in their own
+# request. The first script run now starts a background warm-up (once per
+# process) that does all of that while the visitor's page renders, and
+# records how long each step took for the Diagnostics page.
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import streamlit as st
+
+from database import ensure_indexes, get_db, load_frames
+
+WARMUP_COLLECTIONS = ("players", "games", "atbats")
+# Chart libraries are only imported by the pages that draw charts; warming
+# them here keeps that import off the first chart page's request
+WARMUP_IMPORTS = ("plotly.express",)
+IMPORT_REPORT_MODULES = ("streamlit", "pandas", "numpy", "pymongo", "plotly.express", "database")
+
+_report = {"started_at": None, "finished_at": None, "steps": []}
+_report_lock = threading.Lock()
+
+
+def _step(name, call):
+    start = time.perf_counter()
+    error = None
+    try:
+        call()
+    except Exception as exc:
+        # A failed step (e.g. Atlas unreachable) just leaves that cache cold
+        error = str(exc)
+    with _report_lock:
+        _report["steps"].append({
+            "step": name,
+            "seconds": round(time.perf_counter() - start, 4),
+            "error": error,
+        })
+
+
+def _warm_up():
+    _report["started_at"] = time.time()
+    _step("connect", lambda: get_db().command("ping"))
+    _step("indexes", ensure_indexes)
+    _step(f"load {', '.join(WARMUP_COLLECTIONS)}", lambda: load_frames(*WARMUP_COLLECTIONS))
+    for module in WARMUP_IMPORTS:
+        _step(f"import {module}", lambda module=module: importlib.import_module(module))
+    _report["finished_at"] = time.time()
+
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    # Runs once per process, from whichever page is visited first. The thread
+    # gets no script run context of its own or borrowed from that visitor's
+    # session: everything it warms is a process-wide st.cache_resource, which
+    # needs none, and a borrowed context would tie it to a session that may
+    # have ended.
+    thread = threading.Thread(target=_warm_up, name="wiffle-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_report():
+    with _report_lock:
+        return dict(_report, steps=list(_report["steps"]))
+
+
+def import_time_report(modules=IMPORT_REPORT_MODULES, top=30):
+    # Same numbers as `python -X importtime`, measured in a fresh interpreter
+    # so modules already loaded in this process don't hide their cost
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        timeout=120,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:top]
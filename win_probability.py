@@ -0,0 +1,305 @@
+# Win probability by game state.
+#
+#   python win_probability.py          # rebuild the table from history
+#
+# The table holds Team 1's chance of winning from every (inning, half, outs,
+# runners, score differential) state, measured over completed games: each
+# at-bat's state is credited with how its game ended (ties count half). Thin
+# cells are shrunk toward the same inning, half and score, and those toward
+# the score alone, so a state seen twice doesn't read as 0% or 100%.
+#
+# It is stored as one document, rebuilt offline and in a background thread
+# whenever a game is ended on Home.py; the app keeps it in memory as a dense
+# array, so a lookup is a single index no matter how much history went into
+# it. Pages only ever read the stored table: until one exists they get the
+# no-history table (score alone) and a background build is started.
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_version import bump_version, collection_version, game_version, get_versions
+from game_state import OUTS_PER_HALF_INNING, REGULATION_INNINGS
+from simulator import OUTCOMES, REACHES_BASE, RUNNERS_OUT
+
+TABLE_COLLECTION = "win_probability"
+TABLE_ID = "table"
+HALVES = ("Top", "Bottom")
+# Extra innings share the last inning's row
+INNINGS = REGULATION_INNINGS + 1
+# Leads beyond this share the largest one
+MAX_LEAD = 10
+SHAPE = (INNINGS, len(HALVES), OUTS_PER_HALF_INNING, 4, 2 * MAX_LEAD + 1)
+# Games' worth of the broader estimate blended into each cell
+PRIOR_GAMES = 10
+# Runs of lead worth about 73% when there's no history at all
+LEAD_SCALE = 2.0
+# Game curves kept per process
+CURVES = 64
+
+_rebuild_lock = threading.Lock()
+_rebuild = {"thread": None, "again": False}
+
+
+# ---- States ----
+def _index(inning, half, outs, runners, lead):
+    # Positions in the table, clamped to its edges (works on arrays too)
+    return (
+        np.clip(inning, 1, INNINGS) - 1,
+        half,
+        np.clip(outs, 0, OUTS_PER_HALF_INNING - 1),
+        np.clip(runners, 0, 3),
+        np.clip(lead, -MAX_LEAD, MAX_LEAD) + MAX_LEAD,
+    )
+
+
+def _states(atbats):
+    # The state before each at-bat, in stored order within each game. lead
+    # is Team 1's runs minus Team 2's; Team 1 bats in the top half.
+    label = atbats["inning"].fillna("Top 1").astype(str).str.split(" ", n=1)
+    half = (label.str[0] == "Bottom").astype(int)
+    inning = pd.to_numeric(label.str[1], errors="coerce").fillna(1).astype(int)
+    runs = pd.to_numeric(atbats["rbi"], errors="coerce").fillna(0)
+    outs_made = pd.to_numeric(atbats["outs_recorded"], errors="coerce").fillna(0)
+    signed = runs.where(half == 0, -runs)
+
+    plays = pd.DataFrame({"game_id": atbats["game_id"], "inning": inning, "half": half})
+    plays["lead"] = (signed.groupby(atbats["game_id"]).cumsum() - signed).astype(int)
+    plays["outs"] = (outs_made.groupby([atbats["game_id"], atbats["inning"]]).cumsum() - outs_made).astype(int)
+    plays["runners"] = pd.to_numeric(atbats["runners_on"], errors="coerce").fillna(0).astype(int)
+    plays["runs"] = runs.astype(int)
+    plays["outs_made"] = outs_made.astype(int)
+    return plays
+
+
+def play_states(atbats):
+    # Plays recorded after the third out belong to no state
+    plays = _states(atbats)
+    return plays[plays["outs"] < OUTS_PER_HALF_INNING]
+
+
+def runners_after(atbat):
+    # Runners left on by an at-bat, from its runner count, outcome and runs
+    if atbat.get("outcome") not in OUTCOMES:
+        return 0
+    outcome = OUTCOMES.index(atbat["outcome"])
+    runners = int(atbat.get("runners_on") or 0) + REACHES_BASE[outcome] - RUNNERS_OUT[outcome] - int(atbat.get("rbi") or 0)
+    return int(min(max(runners, 0), 3))
+
+
+def _state_after(atbat, before):
+    # (inning, half, outs, runners, lead) once a game's latest at-bat is in
+    inning, half, outs = before["inning"], before["half"], before["outs"] + before["outs_made"]
+    lead = before["lead"] + (before["runs"] if half == 0 else -before["runs"])
+    if outs >= OUTS_PER_HALF_INNING:
+        return inning + half, 1 - half, 0, 0, lead
+    return inning, half, outs, runners_after(atbat), lead
+
+
+# ---- Table ----
+def _shrink(wins, games, prior):
+    return (wins + PRIOR_GAMES * prior) / (games + PRIOR_GAMES)
+
+
+def build_table(atbats, games):
+    # Team 1 win probability for every state, as a SHAPE array
+    games = games.reindex(columns=["game_id", "status", "team1_score", "team2_score"])
+    finished = games[games["status"] == "completed"]
+    margin = pd.to_numeric(finished["team1_score"], errors="coerce") - pd.to_numeric(finished["team2_score"], errors="coerce")
+    result = pd.Series(np.sign(margin.to_numpy()) / 2 + 0.5, index=finished["game_id"].to_numpy()).dropna()
+    result = result[~result.index.duplicated()]
+
+    plays = play_states(atbats[atbats["game_id"].isin(result.index)]) if not atbats.empty else pd.DataFrame()
+    if plays.empty:
+        wins = counts = np.zeros(SHAPE)
+    else:
+        cells = np.ravel_multi_index(
+            _index(plays["inning"].to_numpy(), plays["half"].to_numpy(), plays["outs"].to_numpy(),
+                   plays["runners"].to_numpy(), plays["lead"].to_numpy()),
+            SHAPE
+        )
+        size = int(np.prod(SHAPE))
+        wins = np.bincount(cells, weights=plays["game_id"].map(result).to_numpy(), minlength=size).reshape(SHAPE)
+        counts = np.bincount(cells, minlength=size).reshape(SHAPE)
+
+    leads = np.arange(-MAX_LEAD, MAX_LEAD + 1)
+    by_lead = _shrink(wins.sum(axis=(0, 1, 2, 3)), counts.sum(axis=(0, 1, 2, 3)), 1 / (1 + np.exp(-leads / LEAD_SCALE)))
+    by_inning = _shrink(wins.sum(axis=(2, 3)), counts.sum(axis=(2, 3)), by_lead)
+    return _shrink(wins, counts, by_inning[:, :, None, None, :])
+
+
+def save_table(db, table, games_used):
+    db[TABLE_COLLECTION].replace_one(
+        {"_id": TABLE_ID},
+        {"_id": TABLE_ID, "shape": list(table.shape), "values": table.ravel().round(4).tolist(),
+         "games": games_used, "built_at": time.time()},
+        upsert=True
+    )
+    bump_version(db, TABLE_COLLECTION)
+
+
+def load_table(db):
+    doc = db[TABLE_COLLECTION].find_one({"_id": TABLE_ID})
+    if not doc or tuple(doc["shape"]) != SHAPE:
+        # Missing, or built for a different layout
+        return None
+    return np.asarray(doc["values"], dtype=float).reshape(SHAPE)
+
+
+def rebuild_table(db, atbats, games):
+    # Builds the table from this history and stores it; returns how many
+    # completed games went into it
+    games_used = int(games.reindex(columns=["status"])["status"].eq("completed").sum())
+    save_table(db, build_table(atbats, games), games_used)
+    return games_used
+
+
+def _history(db):
+    # Only the fields the table is built from, straight from the database
+    import arrow_fetch
+
+    games = pd.DataFrame(list(db["games"].find({}, {"game_id": 1, "status": 1, "team1_score": 1, "team2_score": 1, "_id": 0})))
+    return arrow_fetch.fetch_frame(db["atbats"]), games
+
+
+def _rebuild_until_current(db):
+    while True:
+        with _rebuild_lock:
+            if not _rebuild["again"]:
+                _rebuild["thread"] = None
+                return
+            _rebuild["again"] = False
+        try:
+            rebuild_table(db, *_history(db))
+        except Exception:
+            # A failed rebuild (e.g. Atlas unreachable) keeps the stored
+            # table; the next ended game asks again
+            pass
+
+
+def rebuild_in_background(db):
+    # Off the scorer's rerun: one rebuild runs at a time, and a request made
+    # while it runs gets one more pass so the game just ended is included
+    with _rebuild_lock:
+        _rebuild["again"] = True
+        if _rebuild["thread"] is None:
+            _rebuild["thread"] = threading.Thread(
+                target=_rebuild_until_current, args=(db,), name="wiffle-win-probability", daemon=True
+            )
+            _rebuild["thread"].start()
+        return _rebuild["thread"]
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _stored_table(version):
+    from database import get_db
+
+    return load_table(get_db())
+
+
+@st.cache_resource(show_spinner=False)
+def _prior_table():
+    return build_table(pd.DataFrame(), pd.DataFrame())
+
+
+def _current(db):
+    # (key, table): the key names the table version the lookups come from
+    versions = get_versions(db)
+    key = ("stored", collection_version(versions, TABLE_COLLECTION))
+    table = _stored_table(key[1])
+    if table is None:
+        rebuild_in_background(db)
+        return ("prior",), _prior_table()
+    return key, table
+
+
+def current_table(db):
+    return _current(db)[1]
+
+
+# ---- Lookups ----
+def _clamp(value, low, high):
+    return min(max(int(value), low), high)
+
+
+def lookup(table, inning, half, outs, runners, lead):
+    # Plain-int indexing; np.clip on scalars would cost more than the lookup
+    return float(table[
+        _clamp(inning, 1, INNINGS) - 1,
+        HALVES.index(half),
+        _clamp(outs, 0, OUTS_PER_HALF_INNING - 1),
+        _clamp(runners, 0, 3),
+        _clamp(lead, -MAX_LEAD, MAX_LEAD) + MAX_LEAD,
+    ])
+
+
+def live_probability(table, state, last_atbat=None):
+    # Team 1's chance from a GameState; runners carry over from the last
+    # at-bat only while its half-inning is still going
+    if state.status == "completed":
+        return float(np.sign(state.team1_score - state.team2_score) / 2 + 0.5)
+    runners = 0
+    if last_atbat is not None and last_atbat.get("inning") == state.inning_label:
+        runners = runners_after(last_atbat)
+    return lookup(table, state.inning, state.half, state.outs, runners, state.team1_score - state.team2_score)
+
+
+def game_curve(table, game_atbats, game):
+    # Team 1's chance before the first pitch and after every at-bat
+    columns = ["At-Bat", "Inning", "Batter", "Outcome", "Team 1 Win %"]
+    chances = [lookup(table, 1, "Top", 0, 0, 0)]
+    if not game_atbats.empty:
+        # After an at-bat the game is in the state the next one started in
+        plays = _states(game_atbats)
+        before = table[_index(plays["inning"].to_numpy(), plays["half"].to_numpy(), plays["outs"].to_numpy(),
+                              plays["runners"].to_numpy(), plays["lead"].to_numpy())]
+        chances += list(before[1:])
+        if game.get("status") == "completed":
+            margin = pd.to_numeric(game.get("team1_score"), errors="coerce") - pd.to_numeric(game.get("team2_score"), errors="coerce")
+            chances.append(float(np.sign(margin) / 2 + 0.5) if margin == margin else 0.5)
+        else:
+            inning, half, outs, runners, lead = _state_after(game_atbats.iloc[-1], plays.iloc[-1])
+            chances.append(float(table[_index(inning, half, outs, runners, lead)]))
+
+    rows = [{"Inning": "Top 1", "Batter": "", "Outcome": ""}] + game_atbats.reindex(columns=["inning", "batter", "outcome"]) \
+        .rename(columns=str.title).to_dict("records")
+    frame = pd.DataFrame(rows)
+    frame.insert(0, "At-Bat", range(len(frame)))
+    frame["Team 1 Win %"] = (np.asarray(chances) * 100).round(1)
+    return frame[columns]
+
+
+@st.cache_data(show_spinner=False, max_entries=CURVES)
+def _cached_curve(game_id, version, table_key, _table, _game, _game_atbats):
+    return game_curve(_table, _game_atbats, _game)
+
+
+def current_curve(db, game_id):
+    # One game's curve, computed once per version of that game and of the
+    # table, from just that game's at-bats
+    from database import fetch_game
+
+    table_key, table = _current(db)
+    version = game_version(db, game_id)
+    game, game_atbats = fetch_game(game_id, version)
+    return _cached_curve(game_id, version, table_key, table, game or {}, game_atbats)
+
+
+def main():
+    from database import get_db
+
+    db = get_db()
+    start = time.perf_counter()
+    atbats, games = _history(db)
+    if games.empty:
+        print("No games recorded yet")
+        return
+    games_used = rebuild_table(db, atbats, games)
+    print(f"Built the win probability table from {games_used} completed games "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+# Write-behind queue for at-bat recording.
+#
+# "Record At-Bat" commits the at-bat to a local SQLite queue and returns
+# immediately. A background worker flushes queued at-bats to MongoDB in
+# batches, retrying with exponential backoff while the connection is down,
+# so the scorer never waits on Atlas and nothing is lost when Wi-Fi drops.
+#
+# Connection errors are retried for as long as the outage lasts. Any other
+# error is counted against the item; after MAX_ATTEMPTS it is moved to the
+# dead-letter table, shown on Home for a retry or discard, and the items
+# queued behind it carry on.
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from bson import ObjectId, json_util
+from pymongo.errors import ConnectionFailure
+
+import game_journal
+import player_ids
+from atbat_writes import atbat_key, bulk_upsert_atbats, delete_atbat, upsert_atbat
+from data_version import bump_version
+from game_state import parse_ended_innings, save_game_state
+
+QUEUE_PATH = os.getenv("WRITE_QUEUE_PATH", ".wiffle_write_queue.sqlite3")
+BATCH_SIZE = 50
+POLL_SECONDS = 0.5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+MAX_ATTEMPTS = int(os.getenv("WRITE_QUEUE_MAX_ATTEMPTS", "5"))
+# Errors that say nothing about the item itself (Atlas or the Wi-Fi is down)
+TRANSIENT_ERRORS = (ConnectionFailure,)
+
+
+class WriteQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_id TEXT NOT NULL,
+                item TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                id INTEGER PRIMARY KEY,
+                game_id TEXT NOT NULL,
+                item TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                failed_at REAL NOT NULL
+            )
+        """)
+
+    def enqueue(self, game_id, item):
+        # Durable once this returns: the row is fsynced before the UI confirms
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO pending (game_id, item, created_at) VALUES (?, ?, ?)",
+                (game_id, json_util.dumps(item), time.time())
+            )
+            return cursor.lastrowid
+
+    def peek(self, limit=BATCH_SIZE, game_id=None):
+        query = "SELECT id, game_id, item, attempts, last_error, created_at FROM pending"
+        params = []
+        if game_id is not None:
+            query += " WHERE game_id = ?"
+            params.append(game_id)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {"id": row[0], "game_id": row[1], "item": json_util.loads(row[2]),
+             "attempts": row[3], "last_error": row[4], "created_at": row[5]}
+            for row in rows
+        ]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def remove(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM pending WHERE id = ?", [(i,) for i in ids])
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM pending")
+            self._conn.execute("DELETE FROM dead_letter")
+
+    def mark_failed(self, ids, error, count=True):
+        # Returns the attempt count of each row; transient errors (count=False)
+        # are noted without counting against the item
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE pending SET attempts = attempts + ?, last_error = ? WHERE id = ?",
+                [(int(count), str(error), i) for i in ids]
+            )
+            marks = ", ".join("?" for _ in ids)
+            return dict(self._conn.execute(f"SELECT id, attempts FROM pending WHERE id IN ({marks})", list(ids)).fetchall())
+
+    # ---- Dead letters ----
+    def dead_letter(self, ids):
+        # Out of the way of the items queued behind them, kept for the scorer
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for i in ids:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_letter (id, game_id, item, attempts, last_error, created_at, failed_at) "
+                    "SELECT id, game_id, item, attempts, last_error, created_at, ? FROM pending WHERE id = ?",
+                    (time.time(), i)
+                )
+                self._conn.execute("DELETE FROM pending WHERE id = ?", (i,))
+            self._conn.execute("COMMIT")
+
+    def dead_letters(self, limit=100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, game_id, item, attempts, last_error, created_at, failed_at FROM dead_letter ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"id": row[0], "game_id": row[1], "item": json_util.loads(row[2]), "attempts": row[3],
+             "last_error": row[4], "created_at": row[5], "failed_at": row[6]}
+            for row in rows
+        ]
+
+    def dead_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def requeue(self, ids):
+        # Back into the queue with a fresh attempt count, at its old position
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for i in ids:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO pending (id, game_id, item, attempts, last_error, created_at) "
+                    "SELECT id, game_id, item, 0, NULL, created_at FROM dead_letter WHERE id = ?",
+                    (i,)
+                )
+                self._conn.execute("DELETE FROM dead_letter WHERE id = ?", (i,))
+            self._conn.execute("COMMIT")
+
+    def discard(self, ids):
+        with self._lock:
+            self._conn.executemany("DELETE FROM dead_letter WHERE id = ?", [(i,) for i in ids])
+
+
+def new_item(game_id, inning, team1, team2, atbat=None, end_inning=False):
+    # Keys are assigned locally (the at-bat's own atbat_id when there is one),
+    # so a flush that is retried after a partial failure never writes twice
+    key = str(ObjectId())
+    if atbat is not None:
+        atbat = dict(atbat)
+        atbat.setdefault("_id", ObjectId())
+        key = atbat_key(atbat)
+    return {
+        "key": key,
+        "game_id": game_id,
+        "inning": inning,
+        "atbat": atbat,
+        "team1": list(team1),
+        "team2": list(team2),
+        "end_inning": bool(end_inning),
+    }
+
+
+def _current_names(db, rows):
+    # A player renamed while their at-bats sat in the queue: queued at-bats
+    # carry player ids, so their names (and the rosters queued with them) are
+    # brought up to date before anything is written
+    atbats = [row["item"]["atbat"] for row in rows if row["item"]["atbat"] is not None]
+    fields = player_ids.NAME_FIELDS["atbats"]
+    ids = {atbat.get(id_field) for atbat in atbats for _, id_field in fields} - {None}
+    if not ids:
+        return
+    names = {player["player_id"]: player["name"]
+             for player in db["players"].find({"player_id": {"$in": list(ids)}}, {"player_id": 1, "name": 1})}
+    renamed = {}
+    for atbat in atbats:
+        for name_field, id_field in fields:
+            name = names.get(atbat.get(id_field))
+            if name is not None and name != atbat.get(name_field):
+                renamed[atbat.get(name_field)] = name
+                atbat[name_field] = name
+    if renamed:
+        for row in rows:
+            for team in ("team1", "team2"):
+                row["item"][team] = [renamed.get(name, name) for name in row["item"][team]]
+
+
+def apply_item(db, item, atbat_written=False, batch=()):
+    game_id = item["game_id"]
+    team1, team2 = item["team1"], item["team2"]
+    atbat = item["atbat"]
+
+    # Games from before the journal existed are imported first (once). The
+    # import leaves out this at-bat and any other queued ones (already bulk
+    # upserted by flush); they are recorded in queue order after it.
+    if game_journal.latest_event(db, game_id) is None:
+        game = db["games"].find_one({"game_id": game_id}, {"ended_innings": 1}) or {}
+        ended = parse_ended_innings(game.get("ended_innings"))
+        queued = list(batch) + ([atbat] if atbat is not None else [])
+        query = {"game_id": game_id}
+        if queued:
+            query["_id"] = {"$nin": [queued_atbat["_id"] for queued_atbat in queued]}
+            query["atbat_id"] = {"$nin": [queued_atbat["atbat_id"] for queued_atbat in queued if queued_atbat.get("atbat_id")]}
+        game_journal.ensure_journal(db, game_id, team1, team2, list(db["atbats"].find(query)), ended)
+
+    history = None
+    if atbat is not None:
+        if not atbat_written:
+            upsert_atbat(db, atbat)
+        history = game_journal.record(db, game_id, team1, team2, game_journal.ATBAT, atbat, key=atbat_key(atbat))
+    if item["end_inning"] and (history is None or history["state"].inning_label == item["inning"]):
+        history = game_journal.record(
+            db, game_id, team1, team2, game_journal.END_INNING,
+            {"inning": item["inning"]}, key=f"{item['key']}:end_inning"
+        )
+    save_game_state(db, history["state"], "atbats", rev=history["head"])
+    return history["state"]
+
+
+def flush(db, queue, limit=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    # All queued at-bats in the batch go up in one bulk upsert, then the
+    # journal and game state are advanced in queue order. Everything is
+    # idempotent, so a retry just repeats it. A connection error stops the
+    # batch; an item that fails on its own holds back only the later items
+    # of its game (their order matters) until it is dead-lettered. Raises
+    # after the batch if anything is still held back, so the worker backs off.
+    rows = queue.peek(limit)
+    if not rows:
+        return 0
+    batches = {}
+    for row in rows:
+        if row["item"]["atbat"] is not None:
+            batches.setdefault(row["game_id"], []).append(row["item"]["atbat"])
+    written = True
+    try:
+        _current_names(db, rows)
+        bulk_upsert_atbats(db, [row["item"]["atbat"] for row in rows if row["item"]["atbat"] is not None])
+    except TRANSIENT_ERRORS as exc:
+        queue.mark_failed([row["id"] for row in rows], exc, count=False)
+        raise
+    except Exception:
+        # One bad at-bat fails the whole bulk write; upsert them one by one
+        # below so it is the only one held back
+        written = False
+
+    flushed = 0
+    failure = None
+    held = set()
+    for row in rows:
+        if row["game_id"] in held:
+            continue
+        try:
+            apply_item(db, row["item"], atbat_written=written, batch=batches.get(row["game_id"], ()))
+        except TRANSIENT_ERRORS as exc:
+            queue.mark_failed([row["id"]], exc, count=False)
+            raise
+        except Exception as exc:
+            failure = exc
+            if queue.mark_failed([row["id"]], exc).get(row["id"], 0) >= max_attempts:
+                queue.dead_letter([row["id"]])
+            else:
+                held.add(row["game_id"])
+            continue
+        queue.remove([row["id"]])
+        flushed += 1
+    if held:
+        raise failure
+    return flushed
+
+
+def discard(db, queue, rows):
+    # A dead letter's at-bat can already be stored by its batch's bulk upsert.
+    # Unless the journal recorded it after all, it is deleted with the queue
+    # row so it doesn't count in the stats.
+    games = set()
+    for row in rows:
+        atbat = row["item"]["atbat"]
+        if atbat is None:
+            continue
+        recorded = db[game_journal.EVENTS_COLLECTION].find_one(
+            {"game_id": row["game_id"], "key": atbat_key(atbat)}, {"_id": 1}
+        )
+        if recorded is None and delete_atbat(db, atbat):
+            games.add(row["game_id"])
+    if games:
+        bump_version(db, "atbats", game_ids=sorted(games))
+    queue.discard([row["id"] for row in rows])
+
+
+class FlushWorker(threading.Thread):
+    def __init__(self, db, queue):
+        super().__init__(name="wiffle-write-behind", daemon=True)
+        self.db = db
+        self.queue = queue
+        self.failures = 0
+        self.last_error = None
+        self.last_flush = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+
+    def backoff_seconds(self):
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, self.failures - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def run(self):
+        while not self._stopping.is_set():
+            wait = POLL_SECONDS
+            try:
+                while flush(self.db, self.queue):
+                    self.last_flush = time.time()
+                self.failures = 0
+                self.last_error = None
+            except Exception as exc:
+                # Connection errors and anything unexpected both back off and retry
+                self.failures += 1
+                self.last_error = str(exc)
+                wait = self.backoff_seconds()
+            self._wake.wait(wait)
+            self._wake.clear()
+
+
+def pending_items(queue, game_id):
+    return [row["item"] for row in queue.peek(limit=1000, game_id=game_id)]
+
+
+def apply_pending(state, items, recorded_ids):
+    # Overlay queued at-bats that have not reached MongoDB yet on the live state
+    seen = set()
+    for item in items:
+        if item["key"] in seen:
+            continue
+        seen.add(item["key"])
+        atbat = item["atbat"]
+        if atbat is not None:
+            if atbat["_id"] in recorded_ids:
+                continue
+            state.record_atbat(atbat)
+        if item["end_inning"] and state.inning_label == item["inning"]:
+            state.end_half_inning()
+    return state